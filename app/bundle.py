@@ -0,0 +1,68 @@
+"""
+Streaming archive writer for package bundles.
+
+iter_archive() turns an iterable of (name, bytes) members into tar, gzipped
+tar or zip data. It yields chunks as each member is written, so memory use
+is bounded by the largest member rather than the whole archive.
+"""
+
+import io
+import time
+import tarfile
+import zipfile
+
+FORMATS = {
+    'tar': ('application/x-tar', '.tar'),
+    'tgz': ('application/gzip', '.tar.gz'),
+    'zip': ('application/zip', '.zip'),
+}
+
+
+class _Sink(io.RawIOBase):
+    """Write-only, non-seekable buffer drained after every member."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_archive(members, fmt: str = 'tar'):
+    """Yield archive bytes for (name, data) members in the given format."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown archive format: {fmt}")
+    sink = _Sink()
+    mtime = time.time()
+
+    if fmt == 'zip':
+        archive = zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED)
+        for name, data in members:
+            info = zipfile.ZipInfo(name, date_time=time.localtime(mtime)[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.external_attr = 0o644 << 16
+            archive.writestr(info, data)
+            yield sink.drain()
+    else:
+        archive = tarfile.open(fileobj=sink, mode='w|gz' if fmt == 'tgz' else 'w|')
+        for name, data in members:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = mtime
+            info.mode = 0o644
+            archive.addfile(info, io.BytesIO(data))
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+
+    archive.close()
+    yield sink.drain()
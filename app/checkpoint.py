@@ -0,0 +1,170 @@
+"""
+Registry snapshots tied to a replay log offset.
+
+A checkpoint copies every registry table, all from one REPEATABLE READ
+transaction, and records the first replay log segment that the copy
+does not already include:
+
+    replay/snapshots/
+        00000042/                 <- replay log offset (segment number)
+            manifest.json         offset, time taken, row count per table
+            owners.copy.gz        COPY ... TO STDOUT output, gzipped
+            parameters.copy.gz
+            ...
+
+Recovery restores the newest snapshot and replays only the segments from
+its offset on. Recovery time then depends on the writes since the last
+checkpoint, not on the whole history. Only the newest `keep` snapshots
+are retained. The log segments before the oldest of them are no longer
+needed by any snapshot and can be compacted away. Configured from the
+environment:
+
+    REPLAY_SNAPSHOT_DIR     snapshot directory (default: snapshots/ in the replay log directory)
+    REPLAY_SNAPSHOTS_KEEP   snapshots to retain (default 2)
+
+Restoring loads the tables with triggers disabled (session_replication_role
+= replica, which needs a superuser). The snapshot already holds the
+derived tables (search documents, counters, dependency closures)
+exactly as they were.
+"""
+
+import os
+import gzip
+import json
+import shutil
+import time
+from pathlib import Path
+from datetime import datetime, timezone
+
+# Every table with registry state; restored in this order
+SNAPSHOT_TABLES = (
+    'owners',
+    'file_types',
+    'blobs',
+    'parameters',
+    'files',
+    'parameter_versions',
+    'parameter_version_files',
+    'parameter_version_dependencies',
+    'parameter_version_closure',
+    'parameter_search',
+    'registry_counters',
+    'load_manifest',
+)
+
+MANIFEST = 'manifest.json'
+
+
+class SnapshotStore:
+    """Directory of registry snapshots, one subdirectory per log offset."""
+
+    def __init__(self, directory: Path, keep: int = 2):
+        self.directory = Path(directory)
+        self.keep = max(keep, 1)
+
+    def snapshots(self) -> list:
+        """Complete snapshot directories, oldest first."""
+        if not self.directory.is_dir():
+            return []
+        return sorted(
+            p for p in self.directory.iterdir()
+            if p.is_dir() and p.name.isdigit() and (p / MANIFEST).is_file()
+        )
+
+    def manifest(self, snapshot: Path) -> dict:
+        return json.loads((snapshot / MANIFEST).read_text())
+
+    def latest(self) -> Path | None:
+        snapshots = self.snapshots()
+        return snapshots[-1] if snapshots else None
+
+    def write(self, conn, offset: int) -> dict:
+        """
+        Copy the registry tables into a snapshot for replay log `offset`.
+        conn must be inside the transaction whose view is to be saved; it is
+        only read from. The snapshot becomes visible once fully written.
+        """
+        final = self.directory / f"{offset:08d}"
+        partial = self.directory / f".{offset:08d}.partial"
+        shutil.rmtree(partial, ignore_errors=True)
+        partial.mkdir(parents=True)
+
+        start = time.perf_counter()
+        rows = {}
+        with conn.cursor() as cur:
+            for table in SNAPSHOT_TABLES:
+                with gzip.open(partial / f"{table}.copy.gz", 'wb', compresslevel=1) as f:
+                    cur.copy_expert(f"COPY {table} TO STDOUT", f)
+                rows[table] = cur.rowcount
+
+        manifest = {
+            'offset': offset,
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'seconds': round(time.perf_counter() - start, 3),
+            'bytes': sum(p.stat().st_size for p in partial.iterdir()),
+            'rows': rows,
+        }
+        (partial / MANIFEST).write_text(json.dumps(manifest, indent=2))
+        shutil.rmtree(final, ignore_errors=True)
+        partial.rename(final)
+        return manifest
+
+    def restore(self, conn, snapshot: Path) -> dict:
+        """
+        Replace the registry tables with a snapshot's contents in conn's
+        transaction and move the id sequences past the restored rows.
+        The caller commits.
+        """
+        manifest = self.manifest(snapshot)
+        with conn.cursor() as cur:
+            cur.execute("SET LOCAL session_replication_role = replica")
+            cur.execute(f"TRUNCATE {', '.join(SNAPSHOT_TABLES)}")
+            for table in SNAPSHOT_TABLES:
+                if table not in manifest['rows']:
+                    # Snapshot predates the table; it is left empty
+                    continue
+                with gzip.open(snapshot / f"{table}.copy.gz", 'rb') as f:
+                    cur.copy_expert(f"COPY {table} FROM STDIN", f)
+
+            cur.execute("""
+                SELECT c.relname AS table_name, a.attname AS column_name,
+                       pg_get_serial_sequence(quote_ident(c.relname), a.attname) AS sequence
+                FROM pg_class c
+                JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+                WHERE c.relname = ANY(%s) AND c.relnamespace = 'public'::regnamespace
+            """, (list(SNAPSHOT_TABLES),))
+            for seq in [r for r in cur.fetchall() if r['sequence']]:
+                cur.execute(
+                    f"SELECT setval(%s, COALESCE(MAX({seq['column_name']}), 0) + 1, FALSE) FROM {seq['table_name']}",
+                    (seq['sequence'],)
+                )
+        return manifest
+
+    def prune(self) -> int | None:
+        """
+        Delete all but the newest `keep` snapshots. Returns the offset of the
+        oldest one kept: log segments before it are no longer needed.
+        """
+        snapshots = self.snapshots()
+        for old in snapshots[:-self.keep]:
+            shutil.rmtree(old)
+        kept = snapshots[-self.keep:]
+        return int(kept[0].name) if kept else None
+
+    def stats(self) -> dict:
+        snapshots = self.snapshots()
+        latest = self.manifest(snapshots[-1]) if snapshots else None
+        return {
+            'directory': str(self.directory),
+            'keep': self.keep,
+            'snapshots': [int(p.name) for p in snapshots],
+            'latest': latest,
+        }
+
+
+def create_store(log_directory: Path) -> SnapshotStore:
+    """Build the snapshot store from REPLAY_SNAPSHOT_* environment variables."""
+    return SnapshotStore(
+        Path(os.environ.get('REPLAY_SNAPSHOT_DIR', Path(log_directory) / 'snapshots')),
+        keep=int(os.environ.get('REPLAY_SNAPSHOTS_KEEP', '2')),
+    )
@@ -0,0 +1,181 @@
+"""
+Database access helpers for the Parameter Registry API.
+
+Holds the connection settings shared by the API and a small thread-safe
+connection pool. The pool is created by the FastAPI lifespan hook and is
+configured from the environment:
+
+    DB_POOL_MIN      connections opened at startup and kept warm (default 2)
+    DB_POOL_MAX      hard cap on open connections (default 10, 0 disables pooling)
+    DB_POOL_TIMEOUT  seconds to wait for a free connection (default 5)
+"""
+
+import os
+import time
+import threading
+from collections import deque
+
+import psycopg2
+import psycopg2.extensions
+from psycopg2.extras import RealDictCursor
+
+
+def connection_params() -> dict:
+    """Connection keyword arguments built from the POSTGRES_* environment."""
+    return {
+        'host': os.environ.get('POSTGRES_HOST', 'db'),
+        'port': os.environ.get('POSTGRES_PORT', '5432'),
+        'dbname': os.environ.get('POSTGRES_DB', 'mydb'),
+        'user': os.environ.get('POSTGRES_USER', 'anfro'),
+        'password': os.environ.get('POSTGRES_PASSWORD', 'password'),
+        'cursor_factory': RealDictCursor,
+    }
+
+
+def connect():
+    """Open a new, unpooled database connection."""
+    return psycopg2.connect(**connection_params())
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection becomes free within the acquire timeout."""
+
+
+class ConnectionPool:
+    """
+    Fixed-ceiling pool of psycopg2 connections.
+
+    Connections are opened lazily up to `maxconn` and every returned connection
+    is kept idle for reuse (psycopg2's own pools close anything above `minconn`).
+    Callers that cannot get a connection within `timeout` seconds get PoolTimeout.
+    """
+
+    def __init__(self, minconn: int, maxconn: int, timeout: float, **connect_kwargs):
+        if maxconn < 1 or minconn < 0 or minconn > maxconn:
+            raise ValueError(f"Invalid pool size: min={minconn}, max={maxconn}")
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self._connect_kwargs = connect_kwargs
+        self._idle: deque = deque()
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._closed = False
+
+        # Statistics
+        self._opened = 0
+        self._in_use = 0
+        self._acquired = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._wait_seconds = 0.0
+
+    def prewarm(self):
+        """Open `minconn` idle connections up front."""
+        with self._lock:
+            missing = self.minconn - len(self._idle) - self._in_use
+        for _ in range(max(missing, 0)):
+            conn = self._open()
+            with self._lock:
+                self._idle.append(conn)
+
+    def _open(self):
+        conn = psycopg2.connect(**self._connect_kwargs)
+        with self._lock:
+            self._opened += 1
+        return conn
+
+    def getconn(self, timeout: float | None = None):
+        """Borrow a connection, waiting up to `timeout` seconds for a free slot."""
+        if self._closed:
+            raise PoolTimeout("Connection pool is closed")
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._waits += 1
+            if not self._slots.acquire(timeout=timeout):
+                with self._lock:
+                    self._timeouts += 1
+                raise PoolTimeout(f"No database connection available within {timeout:g}s")
+
+        try:
+            conn = None
+            with self._lock:
+                while self._idle and conn is None:
+                    candidate = self._idle.popleft()
+                    if candidate.closed:
+                        self._opened -= 1
+                    else:
+                        conn = candidate
+            if conn is None:
+                conn = self._open()
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._in_use += 1
+            self._acquired += 1
+            self._wait_seconds += time.monotonic() - start
+        return conn
+
+    def putconn(self, conn):
+        """Return a borrowed connection, resetting any open transaction."""
+        keep = not conn.closed and not self._closed
+        if keep:
+            try:
+                status = conn.info.transaction_status
+                if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+                    keep = False
+                elif status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                keep = False
+
+        with self._lock:
+            self._in_use -= 1
+            if keep:
+                self._idle.append(conn)
+            else:
+                self._opened -= 1
+        if not keep and not conn.closed:
+            conn.close()
+        self._slots.release()
+
+    def close(self):
+        """Close every idle connection and refuse further checkouts."""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._opened -= len(idle)
+        for conn in idle:
+            conn.close()
+
+    def stats(self) -> dict:
+        """Point-in-time pool statistics."""
+        with self._lock:
+            return {
+                'min_size': self.minconn,
+                'max_size': self.maxconn,
+                'acquire_timeout': self.timeout,
+                'open': self._opened,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'acquired_total': self._acquired,
+                'waits_total': self._waits,
+                'timeouts_total': self._timeouts,
+                'avg_acquire_ms': round(1000 * self._wait_seconds / self._acquired, 3)
+                                  if self._acquired else 0.0,
+            }
+
+
+def create_pool() -> ConnectionPool | None:
+    """Build a pool from the DB_POOL_* environment; None when pooling is disabled."""
+    maxconn = int(os.environ.get('DB_POOL_MAX', '10'))
+    if maxconn <= 0:
+        return None
+    minconn = min(int(os.environ.get('DB_POOL_MIN', '2')), maxconn)
+    timeout = float(os.environ.get('DB_POOL_TIMEOUT', '5'))
+    return ConnectionPool(minconn, maxconn, timeout, **connection_params())
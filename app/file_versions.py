@@ -0,0 +1,195 @@
+"""
+Dev channel file versions.
+
+Every write to a parameter's files adds a new file version instead of
+changing an existing one: the next version number for its (parameter,
+file type), with the path of the previous version. The parameter's dev
+version, created on first use, is pointed at the new versions.
+publish_parameter() later freezes the dev map into a stable version.
+
+A batch of files is written with one statement, whatever its size, and
+file type ids come from an in-process map instead of a lookup per file.
+
+Writers of one parameter's versions (these writes and publish) first take
+lock_parameter(), so concurrent writers queue instead of racing for the
+same next version number. A writer that waits longer than
+PARAMETER_LOCK_TIMEOUT_MS (default 2000) gets ParameterBusy and may retry
+in a new transaction.
+Shared by POST /parameters/{owner}/{name}/file-versions and the
+incremental loader (load_parameters_incremental).
+"""
+
+import os
+import threading
+from typing import Iterable, NamedTuple, Optional
+
+import psycopg2.errors
+from psycopg2.extras import RealDictCursor
+
+PARAMETER_LOCK_TIMEOUT_MS = int(os.environ.get('PARAMETER_LOCK_TIMEOUT_MS', '2000'))
+
+
+class UnknownFileType(ValueError):
+    """Raised for a file type that is not in file_types."""
+
+
+class ParameterBusy(Exception):
+    """Raised when a parameter's write lock is not granted within the lock timeout."""
+
+
+class NewFile(NamedTuple):
+    file_type: str
+    content: str
+    change_note: Optional[str] = None
+    path: Optional[str] = None    # used only for a file type's first version
+
+
+class FileTypeIds:
+    """
+    In-process file type name -> id map. File types are only ever added,
+    so the map is reloaded only when a name is missing from it.
+    """
+
+    def __init__(self):
+        self._ids: dict = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, cur, names: Iterable[str]) -> dict:
+        """name -> id for the given names; raises UnknownFileType for the first unknown one."""
+        names = list(names)
+        with self._lock:
+            ids = self._ids
+        if not ids.keys() >= set(names):
+            cur.execute("""
+                SELECT name, id, pg_current_xact_id_if_assigned() IS NULL AS read_only
+                FROM file_types
+            """)
+            rows = cur.fetchall()
+            ids = {row['name']: row['id'] for row in rows}
+            # A transaction that has written may see a file type it added
+            # itself and may still roll back; only cache committed rows
+            if rows and rows[0]['read_only']:
+                with self._lock:
+                    self._ids = ids
+        for name in names:
+            if name not in ids:
+                raise UnknownFileType(f"Unknown file type: '{name}'")
+        return ids
+
+    def clear(self):
+        with self._lock:
+            self._ids = {}
+
+
+file_type_ids = FileTypeIds()
+
+
+def lock_parameter(cur, parameter_id: int):
+    """
+    Take the parameter's write lock for the rest of the transaction. Later
+    statements see every version committed by the writers before it.
+    FOR NO KEY UPDATE leaves the foreign key checks of other inserts
+    referencing the parameter unblocked.
+    """
+    try:
+        cur.execute("""
+            SET LOCAL lock_timeout = %s;
+            SELECT 1 FROM parameters WHERE id = %s FOR NO KEY UPDATE;
+            SET LOCAL lock_timeout TO DEFAULT;
+        """, (PARAMETER_LOCK_TIMEOUT_MS, parameter_id))
+    except psycopg2.errors.LockNotAvailable:
+        raise ParameterBusy("Parameter is busy with another write; try again")
+
+
+# One statement for a whole batch: number the new versions of each file
+# type after its highest existing one, insert them, create the dev version
+# if there is none and point it at the highest new version of each type.
+# Rows come back in batch order.
+WRITE_DEV_FILE_VERSIONS = """
+    WITH batch AS (
+        SELECT b.ord, b.file_type_id, b.content, b.change_note,
+               row_number() OVER w AS n,
+               first_value(b.path) OVER w AS path
+        FROM unnest(%(file_type_ids)s::int[], %(contents)s::text[],
+                    %(change_notes)s::text[], %(paths)s::text[])
+             WITH ORDINALITY AS b(file_type_id, content, change_note, path, ord)
+        WINDOW w AS (PARTITION BY b.file_type_id ORDER BY b.ord)
+    ),
+    latest AS (
+        SELECT DISTINCT ON (f.file_type_id) f.file_type_id, f.version, f.path
+        FROM files f
+        WHERE f.parameter_id = %(parameter_id)s
+          AND f.file_type_id = ANY(%(file_type_ids)s::int[])
+        ORDER BY f.file_type_id, f.version DESC
+    ),
+    versions AS (
+        SELECT b.ord, b.file_type_id, b.content, b.change_note,
+               COALESCE(l.version, 0) + b.n AS version,
+               COALESCE(l.path, b.path) AS path
+        FROM batch b
+        LEFT JOIN latest l ON l.file_type_id = b.file_type_id
+    ),
+    new_dev AS (
+        INSERT INTO parameter_versions (parameter_id, is_dev)
+        SELECT %(parameter_id)s, TRUE
+        WHERE NOT EXISTS (
+            SELECT 1 FROM parameter_versions
+            WHERE parameter_id = %(parameter_id)s AND is_dev = TRUE
+        )
+        RETURNING id
+    ),
+    dev AS (
+        SELECT id FROM new_dev
+        UNION ALL
+        SELECT id FROM parameter_versions
+        WHERE parameter_id = %(parameter_id)s AND is_dev = TRUE
+    ),
+    inserted AS (
+        -- Content is stored deduplicated
+        INSERT INTO files (parameter_id, file_type_id, version, path, content_hash, change_note)
+        SELECT %(parameter_id)s, file_type_id, version, path, store_blob(content), change_note
+        FROM versions
+        ORDER BY ord
+        RETURNING file_type_id, version
+    ),
+    mapped AS (
+        INSERT INTO parameter_version_files (parameter_version_id, file_type_id, file_version)
+        SELECT dev.id, i.file_type_id, MAX(i.version)
+        FROM inserted i CROSS JOIN dev
+        GROUP BY dev.id, i.file_type_id
+        ON CONFLICT (parameter_version_id, file_type_id)
+        DO UPDATE SET file_version = EXCLUDED.file_version
+    )
+    SELECT version, path FROM versions ORDER BY ord
+"""
+
+
+def create_dev_file_versions(conn, parameter_id: int, files: Iterable[NewFile]) -> list:
+    """
+    Add a new version of each file and map it into the dev version, in
+    conn's transaction. Raises UnknownFileType before writing anything and
+    ParameterBusy if the parameter's lock is not granted in time.
+    Returns one entry per file created, in order.
+    """
+    files = list(files)
+    if not files:
+        return []
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        ids = file_type_ids.lookup(cur, (file.file_type for file in files))
+        lock_parameter(cur, parameter_id)
+        cur.execute(WRITE_DEV_FILE_VERSIONS, {
+            'parameter_id': parameter_id,
+            'file_type_ids': [ids[file.file_type] for file in files],
+            'contents': [file.content for file in files],
+            'change_notes': [file.change_note for file in files],
+            'paths': [file.path or file.file_type for file in files],
+        })
+        return [
+            {
+                "file_type": file.file_type,
+                "new_version": row['version'],
+                "path": row['path'],
+                "change_note": file.change_note
+            }
+            for file, row in zip(files, cur.fetchall())
+        ]
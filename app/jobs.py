@@ -0,0 +1,175 @@
+"""
+Background jobs for long-running API work (POST /load).
+
+A job runs a blocking function on the runner's own threads, so it holds
+neither the event loop nor a database executor worker, and the request
+that started it returns at once with the job's id. The function reports
+progress through two callbacks it is passed as keyword arguments:
+
+    progress(phase, processed, total)   e.g. ('reading', 120, 5000)
+    log(message)                        warnings and other notes
+
+A job's status, progress, messages and result (or error) stay readable
+while it runs and after it ends. Only one job of a kind may be queued or
+running at a time; submitting another raises JobConflict. The runner is
+configured from the environment:
+
+    JOB_WORKERS  threads running jobs (default 2)
+    JOBS_KEEP    finished jobs remembered for status queries (default 100)
+
+Jobs live in this process only and are lost on restart.
+"""
+
+import os
+import uuid
+import threading
+from typing import Callable
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+MAX_MESSAGES = 1000
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class JobConflict(Exception):
+    """Raised when a job of the same kind is already queued or running."""
+
+    def __init__(self, job: 'Job'):
+        super().__init__(f"A {job.kind} job is already {job.status}: {job.id}")
+        self.job = job
+
+
+class Job:
+    """One submitted unit of work and its progress."""
+
+    def __init__(self, kind: str, params: dict | None = None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params or {}
+        self.status = 'queued'        # queued -> running -> succeeded | failed
+        self.phase = None
+        self.processed = 0
+        self.total = None
+        self.messages: list = []
+        self.result = None
+        self.error = None
+        self.created_at = _now()
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> bool:
+        return self.status in ('queued', 'running')
+
+    # --- callbacks handed to the job function ------------------------------
+
+    def progress(self, phase: str, processed: int, total: int | None = None):
+        with self._lock:
+            self.phase = phase
+            self.processed = processed
+            self.total = total
+
+    def log(self, message: str):
+        with self._lock:
+            if len(self.messages) < MAX_MESSAGES:
+                self.messages.append(message)
+
+    # --- lifecycle ---------------------------------------------------------
+
+    def _start(self):
+        with self._lock:
+            self.status = 'running'
+            self.started_at = _now()
+
+    def _finish(self, result=None, error: BaseException | None = None):
+        with self._lock:
+            self.status = 'failed' if error is not None else 'succeeded'
+            self.result = result
+            self.error = str(error) if error is not None else None
+            self.finished_at = _now()
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            end = self.finished_at or _now()
+            return {
+                'id': self.id,
+                'kind': self.kind,
+                'params': self.params,
+                'status': self.status,
+                'phase': self.phase,
+                'processed': self.processed,
+                'total': self.total,
+                'messages': list(self.messages),
+                'result': self.result,
+                'error': self.error,
+                'created_at': self.created_at.isoformat(),
+                'started_at': self.started_at.isoformat() if self.started_at else None,
+                'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+                'elapsed_seconds': round((end - self.started_at).total_seconds(), 3) if self.started_at else None,
+            }
+
+
+class JobRunner:
+    """Runs jobs on a small thread pool and remembers the recent ones."""
+
+    def __init__(self, workers: int = 2, keep: int = 100):
+        self.keep = max(keep, 1)
+        self._executor = ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix='job')
+        self._jobs: OrderedDict = OrderedDict()    # id -> Job, oldest first
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, fn: Callable, *args, params: dict | None = None) -> Job:
+        """
+        Queue fn(*args, progress=..., log=...) as a new job of this kind.
+        Raises JobConflict if one is already queued or running.
+        """
+        with self._lock:
+            for job in self._jobs.values():
+                if job.kind == kind and job.active:
+                    raise JobConflict(job)
+            job = Job(kind, params)
+            self._jobs[job.id] = job
+            self._prune()
+        self._executor.submit(self._run, job, fn, args)
+        return job
+
+    def _run(self, job: Job, fn: Callable, args: tuple):
+        job._start()
+        try:
+            result = fn(*args, progress=job.progress, log=job.log)
+        except Exception as e:
+            job._finish(error=e)
+        else:
+            job._finish(result)
+
+    def _prune(self):
+        # Caller holds self._lock; forget the oldest finished jobs
+        finished = [job_id for job_id, job in self._jobs.items() if not job.active]
+        for job_id in finished[:max(len(finished) - self.keep, 0)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> list:
+        """Known jobs, newest first."""
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def shutdown(self):
+        """Wait for running jobs; queued ones that never started are dropped."""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+def create_runner() -> JobRunner:
+    """Build the job runner from JOB_WORKERS and JOBS_KEEP."""
+    return JobRunner(
+        workers=int(os.environ.get('JOB_WORKERS', '2')),
+        keep=int(os.environ.get('JOBS_KEEP', '100')),
+    )
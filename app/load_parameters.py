@@ -5,17 +5,42 @@ Parameter Loader - Populates the database from the Parameters folder.
 This script reads the Parameters folder structure and populates the PostgreSQL
 database with owners, parameters, files, and versions.
 
+Two load paths publish the same rows for new parameters, as version 1:
+
+  - load_parameters_bulk (default): reads the parameter directories on a
+    thread pool, streams the rows into temporary staging tables with COPY,
+    and merges them into the registry tables with one set-based statement
+    per table, all in one transaction.
+  - load_parameters (--row-by-row): one insert per parameter, file,
+    version link and dependency.
+
+Neither rewrites a published version. The bulk loader records each
+changed file of an existing parameter as a new dev file version; the
+row-by-row loader leaves existing parameters alone.
+load_parameters_incremental (--incremental) does the same as the bulk
+loader, but keeps a manifest of what it loaded (the load_manifest table)
+and skips directories whose files are unchanged on disk. Both can report
+what they wrote to each parameter as a replay log body, which
+apply_load_entry writes again on replay.
+
 Usage:
-    python load_parameters.py [--parameters-dir PATH] [--owner OWNER]
+    python load_parameters.py [--parameters-dir PATH] [--owner OWNER] [--workers N]
+                              [--row-by-row | --incremental]
 """
 
+import io
 import os
 import sys
 import base64
+import hashlib
 import argparse
+import graphlib
 import psycopg2
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+
+import file_versions
 
 # Load .env file if present
 from dotenv import load_dotenv
@@ -41,7 +66,7 @@ def get_file_type(param_name: str, filename: str) -> str | None:
     return KNOWN_FILES.get(filename)
 
 
-def get_db_connection():
+def get_db_connection(log: Callable[[str], None] = print):
     """Create database connection using environment variables."""
     host = os.environ.get('POSTGRES_HOST', 'db')
     port = os.environ.get('POSTGRES_PORT', '5432')
@@ -49,7 +74,7 @@ def get_db_connection():
     user = os.environ.get('POSTGRES_USER', 'anfro')
     password = os.environ.get('POSTGRES_PASSWORD', 'password')
 
-    print(f"Connecting to: host={host}, port={port}, dbname={dbname}, user={user}")
+    log(f"Connecting to: host={host}, port={port}, dbname={dbname}, user={user}")
 
     return psycopg2.connect(
         host=host,
@@ -60,9 +85,14 @@ def get_db_connection():
     )
 
 
+# Helpers that replay (apply_load_entry) also runs, on the API's pooled
+# connections, ask for tuple rows rather than relying on the default
+TupleCursor = psycopg2.extensions.cursor
+
+
 def ensure_owner(conn, username: str) -> int:
     """Ensure owner exists and return ID."""
-    with conn.cursor() as cur:
+    with conn.cursor(cursor_factory=TupleCursor) as cur:
         cur.execute(
             "INSERT INTO owners (username) VALUES (%s) "
             "ON CONFLICT (username) DO UPDATE SET username = EXCLUDED.username "
@@ -72,9 +102,33 @@ def ensure_owner(conn, username: str) -> int:
         return cur.fetchone()[0]
 
 
+# progress(phase, processed, total) and log(message) callbacks; the
+# command line prints, POST /load reports through its job (see jobs.py)
+Progress = Optional[Callable[[str, int, int], None]]
+Log = Callable[[str], None]
+# written(parameter name, body) for each parameter an incremental load
+# writes; POST /load logs the bodies for replay (see apply_load_entry)
+Written = Optional[Callable[[str, dict], None]]
+
+
+class LoadInProgress(RuntimeError):
+    """Raised when another load holds the load lock."""
+
+
+def lock_loads(conn):
+    """
+    Take the load lock for conn's transaction, so that loads from several
+    API processes or the command line never interleave.
+    """
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_try_advisory_xact_lock(hashtext('load_parameters'))")
+        if not cur.fetchone()[0]:
+            raise LoadInProgress("Another load is in progress")
+
+
 def ensure_file_type(conn, type_name: str) -> int:
     """Ensure file type exists and return ID."""
-    with conn.cursor() as cur:
+    with conn.cursor(cursor_factory=TupleCursor) as cur:
         cur.execute(
             "INSERT INTO file_types (name) VALUES (%s) "
             "ON CONFLICT (name) DO UPDATE SET name = EXCLUDED.name "
@@ -107,10 +161,10 @@ def create_file(conn, parameter_id: int, file_type_id: int, version: int, path:
     """Create a file entry and return its ID."""
     with conn.cursor() as cur:
         cur.execute(
-            "INSERT INTO files (parameter_id, file_type_id, version, path, content) "
-            "VALUES (%s, %s, %s, %s, %s) "
+            "INSERT INTO files (parameter_id, file_type_id, version, path, content_hash) "
+            "VALUES (%s, %s, %s, %s, store_blob(%s)) "
             "ON CONFLICT (parameter_id, file_type_id, version) DO UPDATE "
-            "SET path = EXCLUDED.path, content = EXCLUDED.content "
+            "SET path = EXCLUDED.path, content_hash = EXCLUDED.content_hash "
             "RETURNING id",
             (parameter_id, file_type_id, version, path, content)
         )
@@ -236,18 +290,29 @@ def create_dependency(conn, parameter_version_id: int, depends_on_parameter_id:
         )
 
 
-def load_parameters(parameters_dir: Path, default_owner: str = 'evezor'):
-    """Load all parameters from the given directory."""
-    conn = get_db_connection()
-    conn.autocommit = False
+def load_parameters(parameters_dir: Path, default_owner: str = 'evezor', conn=None,
+                    progress: Progress = None, log: Log = print):
+    """
+    Load all parameters from the given directory, one row at a time.
+    If conn is given, the caller owns the transaction; otherwise a new
+    connection is opened and the load committed.
+    """
+    owns_conn = conn is None
+    if owns_conn:
+        conn = get_db_connection(log)
+        conn.autocommit = False
 
     try:
+        lock_loads(conn)
         # Ensure owner exists
         owner_id = ensure_owner(conn, default_owner)
-        print(f"Using owner '{default_owner}' (id={owner_id})")
+        log(f"Using owner '{default_owner}' (id={owner_id})")
 
         # Get file types
         file_types = get_file_types(conn)
+        with conn.cursor() as cur:
+            cur.execute("SELECT name, id FROM parameters WHERE owner_id = %s", (owner_id,))
+            existing = dict(cur.fetchall())
 
         # Track created parameters for dependency resolution
         param_name_to_id: Dict[str, int] = {}
@@ -255,12 +320,17 @@ def load_parameters(parameters_dir: Path, default_owner: str = 'evezor'):
         param_dependencies: Dict[str, List[str]] = {}
 
         # First pass: Create all parameters and files
-        for param_dir in sorted(parameters_dir.iterdir()):
-            if not param_dir.is_dir():
-                continue
-
+        param_dirs = sorted(p for p in parameters_dir.iterdir() if p.is_dir())
+        for done, param_dir in enumerate(param_dirs):
+            if progress:
+                progress('loading', done, len(param_dirs))
             param_name = param_dir.name
-            print(f"\nProcessing parameter: {param_name}")
+            log(f"\nProcessing parameter: {param_name}")
+            if param_name in existing:
+                # Published versions are never rewritten
+                param_name_to_id[param_name] = existing[param_name]
+                log("  - Exists, left as it is")
+                continue
 
             # Create parameter
             parameter_id = create_parameter(conn, owner_id, param_name)
@@ -286,7 +356,7 @@ def load_parameters(parameters_dir: Path, default_owner: str = 'evezor'):
 
                 # Link version to file
                 link_version_to_file(conn, version_id, file_type_id, 1)
-                print(f"  - Added {file_type}: {filename}")
+                log(f"  - Added {file_type}: {filename}")
 
             # Read dependencies
             deps_file = param_dir / 'dependencies.txt'
@@ -295,10 +365,12 @@ def load_parameters(parameters_dir: Path, default_owner: str = 'evezor'):
                 deps = parse_dependencies(deps_content)
                 if deps:
                     param_dependencies[param_name] = deps
-                    print(f"  - Dependencies: {deps}")
+                    log(f"  - Dependencies: {deps}")
 
         # Second pass: Create dependency links
-        print("\n\nCreating dependency links...")
+        if progress:
+            progress('linking', len(param_dirs), len(param_dirs))
+        log("\n\nCreating dependency links...")
         for param_name, deps in param_dependencies.items():
             version_id = param_name_to_version_id.get(param_name)
             if not version_id:
@@ -318,19 +390,638 @@ def load_parameters(parameters_dir: Path, default_owner: str = 'evezor'):
                         depends_on_is_dev=False,
                         original_selector='1'
                     )
-                    print(f"  {param_name} -> {dep_param_name}")
+                    log(f"  {param_name} -> {dep_param_name}")
                 else:
-                    print(f"  WARNING: {param_name} depends on unknown parameter: {dep_param_name}")
+                    log(f"  WARNING: {param_name} depends on unknown parameter: {dep_param_name}")
+
+        if owns_conn:
+            conn.commit()
+        log("\n\nDone! All parameters loaded successfully.")
+
+    except Exception as e:
+        if owns_conn:
+            conn.rollback()
+        log(f"Error: {e}")
+        raise
+    finally:
+        if owns_conn:
+            conn.close()
+
+
+# ---------------------------------------------------------------------------
+# Bulk load
+# ---------------------------------------------------------------------------
+
+class ParameterDir(NamedTuple):
+    """Everything the bulk loader needs from one parameter directory."""
+    name: str
+    files: List[Tuple[str, str, str]]   # (file_type, filename, content hash)
+    blobs: Dict[str, str]               # content hash -> content
+    dependencies: List[str]             # names of parameters depended on
+
+
+def content_hash(content: str) -> str:
+    """Hex SHA-256 of the UTF-8 bytes, the same key store_blob() computes."""
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def read_parameter_dir(param_dir: Path) -> ParameterDir:
+    """Read, encode and hash one parameter directory (runs on the reader pool)."""
+    files, blobs = [], {}
+    dependencies: List[str] = []
+    for file_type, (filename, content) in collect_files(param_dir).items():
+        h = content_hash(content)
+        files.append((file_type, filename, h))
+        blobs[h] = content
+        if file_type == 'dependencies':
+            # Same normalisation as the row-by-row loader: assume same owner
+            dependencies = [d.split('/')[-1].split(':')[0] for d in parse_dependencies(content)]
+    return ParameterDir(param_dir.name, files, blobs, dependencies)
+
+
+def _copy_field(value) -> str:
+    if value is None:
+        return '\\N'
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+class CopyRows(io.TextIOBase):
+    """Read-only file object serving rows in COPY text format, built lazily."""
+
+    def __init__(self, rows: Iterable[tuple]):
+        self._rows = iter(rows)
+        self._buffer = ''
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> str:
+        chunks = [self._buffer]
+        buffered = len(self._buffer)
+        while size < 0 or buffered < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            line = '\t'.join(_copy_field(v) for v in row) + '\n'
+            chunks.append(line)
+            buffered += len(line)
+        data = ''.join(chunks)
+        if size < 0:
+            self._buffer = ''
+            return data
+        self._buffer = data[size:]
+        return data[:size]
+
+
+STAGING_TABLES = """
+    CREATE TEMP TABLE load_parameter (name TEXT NOT NULL);
+    CREATE TEMP TABLE load_file (parameter TEXT NOT NULL, file_type TEXT NOT NULL,
+                                 path TEXT NOT NULL, content_hash TEXT NOT NULL);
+    CREATE TEMP TABLE load_blob (hash TEXT NOT NULL, content TEXT NOT NULL, size INTEGER NOT NULL);
+    CREATE TEMP TABLE load_dependency (parameter TEXT NOT NULL, depends_on TEXT NOT NULL);
+    CREATE TEMP TABLE load_target (name TEXT NOT NULL);
+"""
+
+# A large first load leaves the planner with statistics from before it,
+# which estimate one row for the new owner's parameters and nest loops
+# over the staging tables below
+ANALYZE_MERGED = "ANALYZE parameters, parameter_versions"
+
+# Staged rows -> registry tables. Each statement is one set-based insert
+# with the same effect as the row-by-row loader's. Rows already there are
+# left alone, so a merge never rewrites a published version; loaders only
+# merge parameters that don't exist yet.
+MERGE_STATEMENTS = [
+    """
+    INSERT INTO file_types (name)
+    SELECT DISTINCT file_type FROM load_file
+    ON CONFLICT (name) DO NOTHING
+    """,
+    """
+    INSERT INTO blobs (hash, content, size)
+    SELECT hash, content, size FROM load_blob
+    ON CONFLICT (hash) DO NOTHING
+    """,
+    """
+    INSERT INTO parameters (owner_id, name, description)
+    SELECT %(owner_id)s, name, NULL FROM load_parameter
+    ON CONFLICT (owner_id, name) DO NOTHING
+    """,
+    """
+    INSERT INTO parameter_versions (parameter_id, version, is_dev)
+    SELECT p.id, 1, FALSE
+    FROM load_parameter l
+    JOIN parameters p ON p.owner_id = %(owner_id)s AND p.name = l.name
+    ON CONFLICT DO NOTHING
+    """,
+    ANALYZE_MERGED,
+    """
+    INSERT INTO files (parameter_id, file_type_id, version, path, content_hash)
+    SELECT p.id, ft.id, 1, f.path, f.content_hash
+    FROM load_file f
+    JOIN parameters p ON p.owner_id = %(owner_id)s AND p.name = f.parameter
+    JOIN file_types ft ON ft.name = f.file_type
+    ON CONFLICT (parameter_id, file_type_id, version) DO NOTHING
+    """,
+    """
+    INSERT INTO parameter_version_files (parameter_version_id, file_type_id, file_version)
+    SELECT pv.id, ft.id, 1
+    FROM load_file f
+    JOIN parameters p ON p.owner_id = %(owner_id)s AND p.name = f.parameter
+    JOIN parameter_versions pv ON pv.parameter_id = p.id AND pv.version = 1 AND pv.is_dev = FALSE
+    JOIN file_types ft ON ft.name = f.file_type
+    ON CONFLICT (parameter_version_id, file_type_id) DO NOTHING
+    """,
+    """
+    INSERT INTO parameter_version_dependencies
+        (parameter_version_id, depends_on_parameter_id, depends_on_version,
+         depends_on_is_dev, original_selector)
+    SELECT DISTINCT pv.id, dp.id, 1, FALSE, '1'
+    FROM load_dependency d
+    JOIN parameters p ON p.owner_id = %(owner_id)s AND p.name = d.parameter
+    JOIN parameter_versions pv ON pv.parameter_id = p.id AND pv.version = 1 AND pv.is_dev = FALSE
+    JOIN load_target t ON t.name = d.depends_on
+    JOIN parameters dp ON dp.owner_id = %(owner_id)s AND dp.name = d.depends_on
+    ON CONFLICT (parameter_version_id, depends_on_parameter_id) DO NOTHING
+    """,
+]
+
+# The per-row check_cyclic_dependency() trigger is skipped during the
+# merges (registry.defer_cycle_check); this checks every dependency of the
+# loaded parameters in one pass instead. Returns the parameters that can
+# reach themselves.
+CYCLE_CHECK = """
+    WITH RECURSIVE reach AS (
+        SELECT pv.parameter_id AS origin, pvd.depends_on_parameter_id AS param_id
+        FROM load_parameter l
+        JOIN parameters p ON p.owner_id = %(owner_id)s AND p.name = l.name
+        JOIN parameter_versions pv ON pv.parameter_id = p.id
+        JOIN parameter_version_dependencies pvd ON pvd.parameter_version_id = pv.id
+
+        UNION
+
+        SELECT r.origin, pvd.depends_on_parameter_id
+        FROM reach r
+        JOIN parameter_versions pv ON pv.parameter_id = r.param_id
+        JOIN parameter_version_dependencies pvd ON pvd.parameter_version_id = pv.id
+        WHERE r.param_id <> r.origin
+    )
+    SELECT p.name
+    FROM reach r
+    JOIN parameters p ON p.id = r.origin
+    WHERE r.param_id = r.origin
+    ORDER BY p.name
+"""
+
+# Builds the dependency closure of each loaded stable version and of every
+# stable version that reaches one (see materialize_dependency_closure).
+# The dependency trigger drops the closures a new link invalidates and
+# leaves rebuilding them to this while the cycle check is deferred;
+# relies on CYCLE_CHECK having passed.
+MATERIALIZE_CLOSURES = """
+    WITH RECURSIVE affected AS (
+        SELECT pv.id, pv.parameter_id, pv.version
+        FROM load_parameter l
+        JOIN parameters p ON p.owner_id = %(owner_id)s AND p.name = l.name
+        JOIN parameter_versions pv ON pv.parameter_id = p.id AND pv.version = 1 AND pv.is_dev = FALSE
+
+        UNION
+
+        SELECT pv.id, pv.parameter_id, pv.version
+        FROM affected a
+        JOIN parameter_version_dependencies pvd ON
+            pvd.depends_on_parameter_id = a.parameter_id
+            AND pvd.depends_on_version = a.version
+            AND pvd.depends_on_is_dev = FALSE
+        JOIN parameter_versions pv ON pv.id = pvd.parameter_version_id AND pv.is_dev = FALSE
+    )
+    SELECT COUNT(*) FILTER (WHERE materialize_dependency_closure(id))
+    FROM affected
+"""
+
+
+def merge_parameters(conn, owner_id: int, params: List[ParameterDir], targets: Iterable[str],
+                     analyze: bool = True):
+    """
+    Stage the given parameters with COPY and merge them into the registry
+    in conn's transaction. Dependencies are linked only to the parameters
+    named in targets. analyze=False skips refreshing the registry tables'
+    statistics midway, which a merge of a few parameters does not need.
+    """
+    blobs: Dict[str, str] = {}
+    for param in params:
+        blobs.update(param.blobs)
+
+    with conn.cursor(cursor_factory=TupleCursor) as cur:
+        cur.execute(STAGING_TABLES)
+        cur.copy_expert("COPY load_parameter FROM STDIN", CopyRows(
+            (param.name,) for param in params
+        ))
+        cur.copy_expert("COPY load_file FROM STDIN", CopyRows(
+            (param.name, file_type, filename, h)
+            for param in params for file_type, filename, h in param.files
+        ))
+        cur.copy_expert("COPY load_blob FROM STDIN", CopyRows(
+            (h, content, len(content.encode('utf-8'))) for h, content in blobs.items()
+        ))
+        cur.copy_expert("COPY load_dependency FROM STDIN", CopyRows(
+            (param.name, dep) for param in params for dep in param.dependencies
+        ))
+        cur.copy_expert("COPY load_target FROM STDIN", CopyRows((name,) for name in targets))
+        cur.execute("ANALYZE load_parameter, load_file, load_blob, load_dependency, load_target")
+
+        cur.execute("SET LOCAL registry.defer_cycle_check = on")
+        for statement in MERGE_STATEMENTS:
+            if statement is ANALYZE_MERGED and not analyze:
+                continue
+            cur.execute(statement, {'owner_id': owner_id})
+        cur.execute(CYCLE_CHECK, {'owner_id': owner_id})
+        cyclic = [row[0] for row in cur.fetchall()]
+        if cyclic:
+            raise ValueError(f"Cyclic dependency detected: {', '.join(cyclic)}")
+        cur.execute("SET LOCAL registry.defer_cycle_check = off")
+        cur.execute(MATERIALIZE_CLOSURES, {'owner_id': owner_id})
+
+        cur.execute("DROP TABLE load_parameter, load_file, load_blob, load_dependency, load_target")
+
+
+def manifest_rows(param: ParameterDir, stats: Dict[str, Tuple[int, int]]) -> List[list]:
+    """[filename, content hash, size, mtime_ns] for each file of param the manifest records."""
+    return [[filename, h, *stats[filename]] for _, filename, h in param.files if filename in stats]
+
+
+def created_entry_body(param: ParameterDir, targets: set, manifest: List[list]) -> dict:
+    """Replay body for a parameter a load created (merged as v1)."""
+    return {
+        'created': True,
+        'files': [
+            {'file_type': file_type, 'path': filename, 'content': param.blobs[h]}
+            for file_type, filename, h in param.files
+        ],
+        # Only the links the merge made
+        'dependencies': [dep for dep in param.dependencies if dep in targets],
+        'manifest': manifest,
+    }
+
+
+def updated_entry_body(new_files: List[file_versions.NewFile], manifest: List[list]) -> dict:
+    """Replay body for the dev file versions a load added to a parameter."""
+    return {
+        'created': False,
+        'files': [
+            {'file_type': f.file_type, 'path': f.path, 'content': f.content, 'change_note': f.change_note}
+            for f in new_files
+        ],
+        'manifest': manifest,
+    }
+
+
+def dependency_order(params: List[ParameterDir]) -> List[ParameterDir]:
+    """params with each one after those of them it depends on."""
+    by_name = {param.name: param for param in params}
+    sorter = graphlib.TopologicalSorter({
+        param.name: [dep for dep in param.dependencies if dep in by_name] for param in params
+    })
+    return [by_name[name] for name in sorter.static_order()]
 
-        conn.commit()
-        print("\n\nDone! All parameters loaded successfully.")
+
+def apply_load_entry(conn, owner: str, name: str, body: dict) -> dict:
+    """
+    Write again what a load wrote to one parameter, from the body it
+    reported (created_entry_body or updated_entry_body), in conn's
+    transaction. The parameter's load manifest rows are replaced with the
+    ones the load recorded.
+    """
+    owner_id = ensure_owner(conn, owner)
+    files = body['files']
+    if 'manifest' in body:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM load_manifest WHERE owner_id = %s AND parameter = %s", (owner_id, name))
+            cur.copy_expert(
+                "COPY load_manifest (owner_id, parameter, path, content_hash, size, mtime_ns) FROM STDIN",
+                CopyRows((owner_id, name, *row) for row in body['manifest'])
+            )
+    if body.get('created'):
+        blobs = {content_hash(f['content']): f['content'] for f in files}
+        param = ParameterDir(
+            name,
+            [(f['file_type'], f['path'], content_hash(f['content'])) for f in files],
+            blobs,
+            list(body.get('dependencies') or []),
+        )
+        # ANALYZE would also queue replay workers on each other's transactions
+        merge_parameters(conn, owner_id, [param], set(param.dependencies), analyze=False)
+        return {'parameter': f"{owner}/{name}", 'created': True, 'files': len(files)}
+
+    with conn.cursor(cursor_factory=TupleCursor) as cur:
+        cur.execute("SELECT id FROM parameters WHERE owner_id = %s AND name = %s", (owner_id, name))
+        row = cur.fetchone()
+    if row is None:
+        raise ValueError(f"Parameter '{owner}/{name}' not found")
+    for file_type in {f['file_type'] for f in files}:
+        ensure_file_type(conn, file_type)
+    created = file_versions.create_dev_file_versions(conn, row[0], [
+        file_versions.NewFile(f['file_type'], f['content'], f.get('change_note'), f.get('path'))
+        for f in files
+    ])
+    return {'parameter': f"{owner}/{name}", 'created': created}
+
+
+def warn_unknown_dependencies(params: List[ParameterDir], targets: set, log: Log = print):
+    for param in params:
+        for dep in param.dependencies:
+            if dep not in targets:
+                log(f"  WARNING: {param.name} depends on unknown parameter: {dep}")
+
+
+def read_parameter_dirs(param_dirs: List[Path], workers: int, progress: Progress = None,
+                        phase: str = 'reading') -> List[ParameterDir]:
+    """read_parameter_dir over a thread pool, in order, reporting each one done."""
+    params = []
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        for param in pool.map(read_parameter_dir, param_dirs):
+            params.append(param)
+            if progress:
+                progress(phase, len(params), len(param_dirs))
+    return params
+
+
+def load_parameters_bulk(parameters_dir: Path, default_owner: str = 'evezor',
+                         workers: int = 8, conn=None,
+                         progress: Progress = None, log: Log = print,
+                         written: Written = None) -> Dict[str, object]:
+    """
+    Load all parameters from the given directory. Every directory is read;
+    new parameters are merged with COPY and set-based inserts (published
+    as v1), and existing ones are written like an incremental load, each
+    changed file as a new dev file version (see write_parameters). The
+    load manifest is rewritten for every directory.
+
+    If conn is given, the caller owns the transaction; otherwise a new
+    connection is opened and the load committed. written is called as by
+    load_parameters_incremental. Returns row counts and the names of the
+    parameters that were written.
+    """
+    param_dirs = sorted(p for p in parameters_dir.iterdir() if p.is_dir())
+    owns_conn = conn is None
+    if owns_conn:
+        conn = get_db_connection(log)
+        conn.autocommit = False
+
+    try:
+        lock_loads(conn)
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+            stats = dict(zip((d.name for d in param_dirs), pool.map(stat_parameter_dir, param_dirs)))
+        params = read_parameter_dirs(param_dirs, workers, progress)
+        loaded = {param.name for param in params}
+
+        if progress:
+            progress('merging', len(params), len(params))
+        owner_id = ensure_owner(conn, default_owner)
+        created, updated, versions = write_parameters(
+            conn, owner_id, params, loaded, stats, progress=progress, log=log, written=written
+        )
+        record_manifest(conn, owner_id, params, stats)
+
+        if owns_conn:
+            conn.commit()
+        counts = {
+            'parameters': len(params),
+            'files': sum(len(param.files) for param in params),
+            'blobs': len({h for param in params for h in param.blobs}),
+            'dependencies': sum(len(param.dependencies) for param in params),
+            'created': len(created),
+            'updated': len(updated),
+            'file_versions': versions,
+            'written': sorted([param.name for param in created] + updated),
+        }
+        log(f"Loaded {counts['parameters']} parameters ({counts['files']} files, "
+              f"{counts['blobs']} distinct contents) for owner '{default_owner}': "
+              f"{counts['created']} new, {counts['file_versions']} new dev file versions "
+              f"in {counts['updated']}")
+        return counts
 
     except Exception as e:
-        conn.rollback()
-        print(f"Error: {e}")
+        if owns_conn:
+            conn.rollback()
+        log(f"Error: {e}")
         raise
     finally:
-        conn.close()
+        if owns_conn:
+            conn.close()
+
+
+# ---------------------------------------------------------------------------
+# Incremental load
+# ---------------------------------------------------------------------------
+
+def stat_parameter_dir(param_dir: Path) -> Dict[str, Tuple[int, int]]:
+    """filename -> (size, mtime_ns) for the files a load would pick up."""
+    stats = {}
+    for file_path in param_dir.iterdir():
+        if file_path.is_file() and get_file_type(param_dir.name, file_path.name) is not None:
+            st = file_path.stat()
+            stats[file_path.name] = (st.st_size, st.st_mtime_ns)
+    return stats
+
+
+def get_load_manifest(conn, owner_id: int) -> Dict[str, Dict[str, Tuple[str, int, int]]]:
+    """parameter -> filename -> (content hash, size, mtime_ns) as last loaded."""
+    manifest: Dict[str, Dict[str, Tuple[str, int, int]]] = {}
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT parameter, path, content_hash, size, mtime_ns FROM load_manifest WHERE owner_id = %s",
+            (owner_id,)
+        )
+        for parameter, path, h, size, mtime_ns in cur.fetchall():
+            manifest.setdefault(parameter, {})[path] = (h, size, mtime_ns)
+    return manifest
+
+
+def get_current_hashes(conn, parameter_ids: List[int]) -> Dict[int, Dict[str, str]]:
+    """
+    parameter id -> file type -> content hash of what :dev resolves to
+    (the dev mapping where there is one, the latest stable otherwise).
+    """
+    current: Dict[int, Dict[str, str]] = {}
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT DISTINCT ON (pv.parameter_id, ft.name) pv.parameter_id, ft.name, f.content_hash
+            FROM parameter_versions pv
+            JOIN parameter_version_files pvf ON pvf.parameter_version_id = pv.id
+            JOIN file_types ft ON ft.id = pvf.file_type_id
+            JOIN files f ON f.parameter_id = pv.parameter_id
+                AND f.file_type_id = pvf.file_type_id
+                AND f.version = pvf.file_version
+            WHERE pv.parameter_id = ANY(%s)
+            ORDER BY pv.parameter_id, ft.name, pv.is_dev DESC, pv.version DESC
+        """, (parameter_ids,))
+        for parameter_id, file_type, h in cur.fetchall():
+            current.setdefault(parameter_id, {})[file_type] = h
+    return current
+
+
+def write_parameters(conn, owner_id: int, params: List[ParameterDir], targets: set,
+                     stats: Dict[str, Dict[str, Tuple[int, int]]],
+                     existing: Optional[Dict[str, int]] = None,
+                     manifest: Optional[Dict[str, Dict[str, Tuple[str, int, int]]]] = None,
+                     progress: Progress = None, log: Log = print,
+                     written: Written = None) -> Tuple[List[ParameterDir], List[str], int]:
+    """
+    Write the parameters a load read, without changing a published version.
+    Parameters that don't exist yet are merged and published as v1, with
+    dependencies linked to those named in targets. In an existing
+    parameter, each file whose content differs from what was last loaded
+    becomes a new dev file version, the same write as
+    POST .../file-versions; with no manifest record for a file, it is
+    compared with what :dev resolves to. Dependency links of existing
+    parameters are not re-derived.
+
+    existing (name -> id) and manifest are read from the database when not
+    given. written, if given, is called with a replay body for each
+    parameter written, created ones first and in dependency order; the
+    body carries the parameter's manifest rows, from stats.
+    Returns (created parameters, updated names, dev file versions written).
+    """
+    if existing is None:
+        with conn.cursor() as cur:
+            cur.execute("SELECT name, id FROM parameters WHERE owner_id = %s", (owner_id,))
+            existing = dict(cur.fetchall())
+    if manifest is None:
+        manifest = get_load_manifest(conn, owner_id)
+
+    created = [param for param in params if param.name not in existing]
+    if created:
+        merge_parameters(conn, owner_id, created, targets)
+        warn_unknown_dependencies(created, targets, log)
+        if written:
+            for param in dependency_order(created):
+                written(param.name, created_entry_body(param, targets, manifest_rows(param, stats[param.name])))
+
+    file_types = get_file_types(conn)
+    updated, versions = [], 0
+    changed = [param for param in params if param.name in existing]
+    current = get_current_hashes(conn, [existing[param.name] for param in changed])
+    for done, param in enumerate(changed):
+        if progress:
+            progress('writing', done, len(changed))
+        loaded = manifest.get(param.name, {})
+        recorded = current.get(existing[param.name], {})
+        new_files = []
+        for file_type, filename, h in param.files:
+            previous = loaded[filename][0] if filename in loaded else recorded.get(file_type)
+            if h == previous:
+                continue
+            if file_type not in file_types:
+                file_types[file_type] = ensure_file_type(conn, file_type)
+            new_files.append(file_versions.NewFile(
+                file_type, param.blobs[h], f"Loaded from {param.name}/{filename}", filename
+            ))
+        if new_files:
+            file_versions.create_dev_file_versions(conn, existing[param.name], new_files)
+            if written:
+                written(param.name, updated_entry_body(new_files, manifest_rows(param, stats[param.name])))
+            updated.append(param.name)
+            versions += len(new_files)
+            log(f"  {param.name}: new dev versions of {', '.join(f.file_type for f in new_files)}")
+    return created, updated, versions
+
+
+def record_manifest(conn, owner_id: int, params: List[ParameterDir],
+                    stats: Dict[str, Dict[str, Tuple[int, int]]]):
+    """Record what was read, including files that only had their mtime touched."""
+    with conn.cursor() as cur:
+        cur.execute(
+            "DELETE FROM load_manifest WHERE owner_id = %s AND parameter = ANY(%s)",
+            (owner_id, [param.name for param in params])
+        )
+        cur.copy_expert(
+            "COPY load_manifest (owner_id, parameter, path, content_hash, size, mtime_ns) FROM STDIN",
+            CopyRows(
+                (owner_id, param.name, *row)
+                for param in params for row in manifest_rows(param, stats[param.name])
+            )
+        )
+
+
+def load_parameters_incremental(parameters_dir: Path, default_owner: str = 'evezor',
+                                workers: int = 8, conn=None,
+                                progress: Progress = None, log: Log = print,
+                                written: Written = None) -> Dict[str, object]:
+    """
+    Load only what changed on disk since the last incremental load.
+
+    A directory is read only if it is new or a file in it was added,
+    removed, resized or touched since the load manifest was written. What
+    was read is written as by the bulk loader (see write_parameters): new
+    directories published as v1, changed files as new dev file versions
+    (a changed dependencies.txt too; links are not re-derived).
+
+    If conn is given, the caller owns the transaction; otherwise a new
+    connection is opened and the load committed. written, if given, is
+    called with a replay body for each parameter written, created ones
+    first and in dependency order. Returns counts and the names of the
+    parameters that were written.
+    """
+    param_dirs = sorted(p for p in parameters_dir.iterdir() if p.is_dir())
+    on_disk = {d.name for d in param_dirs}
+    owns_conn = conn is None
+    if owns_conn:
+        conn = get_db_connection(log)
+        conn.autocommit = False
+
+    try:
+        lock_loads(conn)
+        if progress:
+            progress('scanning', 0, len(param_dirs))
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+            stats = dict(zip((d.name for d in param_dirs), pool.map(stat_parameter_dir, param_dirs)))
+
+        owner_id = ensure_owner(conn, default_owner)
+        manifest = get_load_manifest(conn, owner_id)
+        with conn.cursor() as cur:
+            cur.execute("SELECT name, id FROM parameters WHERE owner_id = %s", (owner_id,))
+            existing = dict(cur.fetchall())
+
+        # Unchanged directories are skipped without reading a file
+        stale = [
+            d for d in param_dirs
+            if d.name not in existing
+            or {path: (size, mtime_ns) for path, (_, size, mtime_ns) in manifest.get(d.name, {}).items()}
+            != stats[d.name]
+        ]
+        params = read_parameter_dirs(stale, workers, progress)
+
+        created, updated, versions = write_parameters(
+            conn, owner_id, params, on_disk, stats, existing=existing, manifest=manifest,
+            progress=progress, log=log, written=written
+        )
+        record_manifest(conn, owner_id, params, stats)
+
+        if owns_conn:
+            conn.commit()
+        summary = {
+            'parameters': len(param_dirs),
+            'read': len(params),
+            'created': len(created),
+            'updated': len(updated),
+            'file_versions': versions,
+            'written': sorted([param.name for param in created] + updated),
+        }
+        log(f"Incremental load for owner '{default_owner}': {summary['read']} of "
+              f"{summary['parameters']} directories read, {summary['created']} new parameters, "
+              f"{summary['file_versions']} new dev file versions in {summary['updated']}")
+        return summary
+
+    except Exception as e:
+        if owns_conn:
+            conn.rollback()
+        log(f"Error: {e}")
+        raise
+    finally:
+        if owns_conn:
+            conn.close()
 
 
 def main():
@@ -347,6 +1038,23 @@ def main():
         default='evezor',
         help='Default owner for all parameters'
     )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=8,
+        help='Threads reading parameter directories (bulk load)'
+    )
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        '--row-by-row',
+        action='store_true',
+        help='Use the row-by-row loader instead of the bulk COPY loader'
+    )
+    mode.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Only load changed directories; changed files become dev file versions'
+    )
 
     args = parser.parse_args()
 
@@ -354,7 +1062,12 @@ def main():
         print(f"Error: Parameters directory not found: {args.parameters_dir}")
         sys.exit(1)
 
-    load_parameters(args.parameters_dir, args.owner)
+    if args.row_by_row:
+        load_parameters(args.parameters_dir, args.owner)
+    elif args.incremental:
+        load_parameters_incremental(args.parameters_dir, args.owner, workers=args.workers)
+    else:
+        load_parameters_bulk(args.parameters_dir, args.owner, workers=args.workers)
 
 
 if __name__ == '__main__':
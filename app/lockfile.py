@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Lockfiles - pin a parameter and its dependency closure to exact file contents.
+
+A lockfile records, for a root query (owner/parameter:selector[filetypes]),
+every package in its transitive dependency closure with the resolved
+version and the SHA-256 content hash of each file. Build tooling can keep it
+next to a board configuration and skip re-resolution while verify() reports
+the lock as up to date. Neither generating nor verifying a lockfile reads any
+file content.
+
+Usage:
+    python lockfile.py generate OWNER/PARAMETER[:SELECTOR][[TYPES]] [-o FILE]
+    python lockfile.py verify FILE
+"""
+
+import sys
+import json
+import hashlib
+import argparse
+from pathlib import Path
+from datetime import datetime, timezone
+
+LOCKFILE_VERSION = 1
+
+
+class LockfileError(ValueError):
+    """Raised for a malformed lockfile."""
+
+
+def closure_manifest(conn, owner: str, parameter: str, selector: str,
+                     file_types: list | None = None) -> list:
+    """Per-file rows of the root's dependency closure (see resolve_package_closure)."""
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT * FROM resolve_package_closure(%s, %s, %s, %s)",
+            (owner, parameter, selector, file_types)
+        )
+        return cur.fetchall()
+
+
+def build_packages(manifest: list) -> list:
+    """Group closure rows into lockfile package entries."""
+    packages = {}
+    for row in manifest:
+        ident = (row['owner'], row['parameter'], row['version'], row['is_dev'])
+        if ident not in packages:
+            packages[ident] = {
+                'owner': row['owner'],
+                'parameter': row['parameter'],
+                'version': row['version'],
+                'is_dev': row['is_dev'],
+                'depth': row['depth'],
+                'files': [],
+            }
+        packages[ident]['files'].append({
+            'file_type': row['file_type'],
+            'file_version': row['file_version'],
+            'path': row['path'],
+            'content_hash': row['content_hash'],
+        })
+    return list(packages.values())
+
+
+def _package_key(package: dict) -> tuple:
+    return (package['owner'], package['parameter'], package['version'], package['is_dev'])
+
+
+def _package_ref(package: dict) -> str:
+    selector = 'dev' if package['is_dev'] else package['version']
+    return f"{package['owner']}/{package['parameter']}:{selector}"
+
+
+def packages_digest(packages: list) -> str:
+    """Order-independent SHA-256 over the pinned packages and file hashes."""
+    canonical = sorted(
+        ([*_package_key(p),
+          sorted([f['file_type'], f['file_version'], f['path'], f['content_hash']] for f in p['files'])]
+         for p in packages),
+        # A dev package has no version; order it before the stable ones
+        key=lambda c: (c[0], c[1], c[2] or 0, c[3], c[4])
+    )
+    return hashlib.sha256(json.dumps(canonical, separators=(',', ':')).encode('utf-8')).hexdigest()
+
+
+def generate(conn, owner: str, parameter: str, selector: str = 'latest',
+             file_types: list | None = None) -> dict:
+    """Build a lockfile for a root query."""
+    packages = build_packages(closure_manifest(conn, owner, parameter, selector, file_types))
+    root = next((p for p in packages if p['depth'] == 0), None)
+    return {
+        'lockfile_version': LOCKFILE_VERSION,
+        'root': {
+            'owner': owner,
+            'parameter': parameter,
+            'selector': selector,
+            'file_types': file_types,
+            'version': root['version'] if root else None,
+            'is_dev': root['is_dev'] if root else selector == 'dev',
+        },
+        'generated_at': datetime.now(timezone.utc).isoformat(),
+        'digest': packages_digest(packages),
+        'packages': packages,
+    }
+
+
+def _is_text(value) -> bool:
+    # Postgres text cannot hold NUL
+    return isinstance(value, str) and '\x00' not in value
+
+
+def _is_version(value) -> bool:
+    # A positive Postgres INTEGER; bool is an int subclass, so exclude it
+    return isinstance(value, int) and not isinstance(value, bool) and 0 < value < 2 ** 31
+
+
+def _require(condition: bool, message: str):
+    if not condition:
+        raise LockfileError(f"Malformed lockfile: {message}")
+
+
+def _validate(lock: dict) -> tuple:
+    """Check a lockfile's shape and types; returns its root query and locked digest."""
+    if not isinstance(lock, dict) or lock.get('lockfile_version') != LOCKFILE_VERSION:
+        raise LockfileError(f"Unsupported lockfile (expected lockfile_version {LOCKFILE_VERSION})")
+    root = lock.get('root')
+    _require(isinstance(root, dict), "root must be an object")
+    for key in ('owner', 'parameter', 'selector'):
+        _require(_is_text(root.get(key)), f"root.{key} must be a string")
+    file_types = root.get('file_types')
+    _require(file_types is None or (isinstance(file_types, list) and all(_is_text(t) for t in file_types)),
+             "root.file_types must be null or a list of strings")
+
+    packages = lock.get('packages')
+    _require(isinstance(packages, list), "packages must be a list")
+    for i, package in enumerate(packages):
+        where = f"packages[{i}]"
+        _require(isinstance(package, dict), f"{where} must be an object")
+        for key in ('owner', 'parameter'):
+            _require(_is_text(package.get(key)), f"{where}.{key} must be a string")
+        _require(package.get('version') is None or _is_version(package.get('version')),
+                 f"{where}.version must be a positive integer or null")
+        _require(isinstance(package.get('is_dev'), bool), f"{where}.is_dev must be a boolean")
+        _require(isinstance(package.get('files'), list), f"{where}.files must be a list")
+        for j, file in enumerate(package['files']):
+            file_where = f"{where}.files[{j}]"
+            _require(isinstance(file, dict), f"{file_where} must be an object")
+            for key in ('file_type', 'path', 'content_hash'):
+                _require(_is_text(file.get(key)), f"{file_where}.{key} must be a string")
+            _require(_is_version(file.get('file_version')), f"{file_where}.file_version must be a positive integer")
+
+    query = (root['owner'], root['parameter'], root['selector'], file_types)
+    return query, packages_digest(packages)
+
+
+def _missing_files(conn, packages: list) -> list:
+    """Locked files whose pinned file version no longer has the locked content hash."""
+    pinned = [(p, f) for p in packages for f in p['files']]
+    if not pinned:
+        return []
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT q.idx, f.content_hash
+            FROM unnest(%s::TEXT[], %s::TEXT[], %s::TEXT[], %s::INTEGER[])
+                 WITH ORDINALITY AS q(owner, parameter, file_type, file_version, idx)
+            LEFT JOIN owners o ON o.username = q.owner
+            LEFT JOIN parameters p ON p.owner_id = o.id AND p.name = q.parameter
+            LEFT JOIN file_types ft ON ft.name = q.file_type
+            LEFT JOIN files f ON
+                f.parameter_id = p.id
+                AND f.file_type_id = ft.id
+                AND f.version = q.file_version
+            ORDER BY q.idx
+        """, (
+            [p['owner'] for p, _ in pinned],
+            [p['parameter'] for p, _ in pinned],
+            [f['file_type'] for _, f in pinned],
+            [f['file_version'] for _, f in pinned],
+        ))
+        actual = [row['content_hash'] for row in cur.fetchall()]
+
+    return [
+        {
+            'package': _package_ref(p),
+            'file_type': f['file_type'],
+            'file_version': f['file_version'],
+            'expected': f['content_hash'],
+            'actual': current,
+        }
+        for (p, f), current in zip(pinned, actual)
+        if current != f['content_hash']
+    ]
+
+
+def verify(conn, lock: dict) -> dict:
+    """
+    Check a lockfile against the registry using content hashes only.
+
+    `up_to_date` is True when the root query still resolves to exactly the
+    locked closure. Otherwise `changes` lists packages added, removed or
+    changed since the lock was written. `missing` lists locked files whose
+    pinned version no longer has the locked content, which means the lock
+    can no longer be reproduced.
+    """
+    query, locked_digest = _validate(lock)
+    current = build_packages(closure_manifest(conn, *query))
+    current_digest = packages_digest(current)
+
+    result = {
+        'up_to_date': current_digest == locked_digest,
+        'digest': current_digest,
+        'locked_digest': locked_digest,
+        'changes': [],
+        'missing': [],
+    }
+    if result['up_to_date']:
+        return result
+
+    locked = {_package_key(p): p for p in lock['packages']}
+    resolved = {_package_key(p): p for p in current}
+    for key, package in resolved.items():
+        if key not in locked:
+            result['changes'].append({'package': _package_ref(package), 'change': 'added'})
+        elif packages_digest([package]) != packages_digest([locked[key]]):
+            result['changes'].append({'package': _package_ref(package), 'change': 'changed'})
+    for key, package in locked.items():
+        if key not in resolved:
+            result['changes'].append({'package': _package_ref(package), 'change': 'removed'})
+
+    result['missing'] = _missing_files(conn, lock['packages'])
+    return result
+
+
+def _parse_query(query: str) -> tuple:
+    # owner/parameter[:selector][[types]], as accepted by GET /resolve
+    name, _, types = query.partition('[')
+    name, _, selector = name.partition(':')
+    owner, _, parameter = name.partition('/')
+    if not owner or not parameter:
+        raise SystemExit(f"Invalid package notation: {query}")
+    file_types = types.rstrip(']').split(',') if types and types.rstrip(']') != '*' else None
+    return owner, parameter, selector or 'latest', file_types
+
+
+def main():
+    import db
+
+    parser = argparse.ArgumentParser(description='Generate or verify a parameter lockfile')
+    commands = parser.add_subparsers(dest='command', required=True)
+    gen = commands.add_parser('generate', help='Write a lockfile for a root query')
+    gen.add_argument('query', help='owner/parameter[:selector][[types]]')
+    gen.add_argument('-o', '--output', type=Path, help='Output file (default: stdout)')
+    ver = commands.add_parser('verify', help='Check a lockfile against the registry')
+    ver.add_argument('lockfile', type=Path)
+    args = parser.parse_args()
+
+    conn = db.connect()
+    try:
+        if args.command == 'generate':
+            text = json.dumps(generate(conn, *_parse_query(args.query)), indent=2)
+            if args.output:
+                args.output.write_text(text + '\n')
+            else:
+                print(text)
+        else:
+            result = verify(conn, json.loads(args.lockfile.read_text()))
+            print(json.dumps(result, indent=2))
+            sys.exit(0 if result['up_to_date'] else 1)
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
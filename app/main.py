@@ -13,68 +13,262 @@ Endpoints:
 import os
 import re
 import json
+import time
+import heapq
+import base64
+import random
+import asyncio
+import hashlib
+import functools
+import itertools
+import threading
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, Iterable, List, Optional
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, contextmanager
 
 import psycopg2
+import db
 import load_parameters as load_params_module
-from psycopg2.extras import RealDictCursor
-from fastapi import FastAPI, HTTPException, Query, Request
+import file_versions
+import resolve_cache as resolve_cache_module
+import lockfile
+import bundle
+import replay_log as replay_log_module
+import checkpoint
+import jobs
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from pydantic import BaseModel
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 
-# Database connection pool
-db_pool = None
+# Database connection pool (created in lifespan; None means connect per request)
+db_pool: db.ConnectionPool | None = None
 
 
 def get_db_connection():
-    """Create database connection."""
-    return psycopg2.connect(
-        host=os.environ.get('POSTGRES_HOST', 'db'),
-        port=os.environ.get('POSTGRES_PORT', '5432'),
-        dbname=os.environ.get('POSTGRES_DB', 'mydb'),
-        user=os.environ.get('POSTGRES_USER', 'anfro'),
-        password=os.environ.get('POSTGRES_PASSWORD', 'password'),
-        cursor_factory=RealDictCursor
-    )
+    """Borrow a database connection from the pool."""
+    if db_pool is None:
+        return db.connect()
+    return db_pool.getconn()
+
+
+def release_db_connection(conn):
+    """Return a connection obtained from get_db_connection()."""
+    if db_pool is None:
+        conn.close()
+    else:
+        db_pool.putconn(conn)
+
+
+# Resolved package cache (see resolve_cache.py); writers must invalidate it
+resolve_cache = resolve_cache_module.create_cache()
+
+
+# Bounded executor for blocking database work (created in lifespan)
+db_executor: ThreadPoolExecutor | None = None
+db_executor_workers = 0
+
+# Background jobs such as POST /load (see jobs.py; created in lifespan)
+job_runner: jobs.JobRunner | None = None
+
+
+def _call_in_transaction(fn: Callable, *args):
+    conn = get_db_connection()
+    try:
+        result = fn(conn, *args)
+        conn.commit()
+        return result
+    except BaseException:
+        try:
+            conn.rollback()
+        except psycopg2.Error:
+            # Broken connection; close it so the pool discards it, and
+            # re-raise the error that got us here rather than this one
+            conn.close()
+        raise
+    finally:
+        release_db_connection(conn)
+
+
+async def run_blocking(fn: Callable, *args):
+    """Run a blocking call on the database executor so the event loop stays free."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, functools.partial(fn, *args))
+
+
+async def run_db(fn: Callable, *args):
+    """
+    Run fn(conn, *args) on the database executor with a pooled connection.
+    The transaction is committed when fn returns and rolled back if it raises.
+    """
+    return await run_blocking(_call_in_transaction, fn, *args)
+
+
+# Writers of one parameter queue on its row lock (file_versions.lock_parameter).
+# A write that times out waiting is retried in a new transaction after a
+# short randomised backoff, then answered with 503.
+PARAMETER_LOCK_RETRIES = int(os.environ.get('PARAMETER_LOCK_RETRIES', '3'))
+PARAMETER_LOCK_BACKOFF = float(os.environ.get('PARAMETER_LOCK_BACKOFF', '0.05'))
+
+
+async def run_db_locked(fn: Callable, *args):
+    """run_db for writes that take a parameter lock; retries ParameterBusy."""
+    for attempt in range(PARAMETER_LOCK_RETRIES + 1):
+        try:
+            return await run_db(fn, *args)
+        except file_versions.ParameterBusy as e:
+            if attempt == PARAMETER_LOCK_RETRIES:
+                raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+        await asyncio.sleep(random.uniform(0, PARAMETER_LOCK_BACKOFF * 2 ** attempt))
+
+
+# Append-only log of mutating requests (see replay_log.py)
+replay_log = replay_log_module.create_log()
+LEGACY_REPLAY_PATH = Path(__file__).parent / 'replay.json'
 
+# Registry snapshots tied to replay log offsets (see checkpoint.py)
+snapshot_store = checkpoint.create_store(replay_log.directory)
 
-REPLAY_PATH = Path(__file__).parent / 'replay.json'
-_replaying = False  # suppresses log_replay while replaying
 
+# Seconds between tries while another API process holds the write gate
+WRITE_GATE_POLL = float(os.environ.get('WRITE_GATE_POLL', '0.005'))
 
-def log_replay(method: str, path: str, body: dict | None = None):
-    """Append a replayable request record to replay.json."""
-    if _replaying:
-        return
-    entry = {
+
+class WriteGate:
+    """
+    Tracks logged writes in flight so a checkpoint can find a moment when
+    every committed write is also in the replay log. Writes run
+    concurrently; a checkpoint (or a restore and replay) closes the gate,
+    waits for those in flight to finish logging, and holds new ones back
+    until it reopens.
+
+    The gate spans every API process sharing the replay log: the process
+    holds the log's WriterLock shared while it has writes in flight, and a
+    closer takes it exclusive. Another process's hold is polled for, every
+    WRITE_GATE_POLL seconds.
+    """
+
+    def __init__(self, lock: replay_log_module.WriterLock):
+        self._lock = lock
+        self._active = 0
+        self._closed = False
+        self._changed = asyncio.Condition()
+
+    async def _enter(self) -> bool:
+        async with self._changed:
+            await self._changed.wait_for(lambda: not self._closed)
+            if not self._lock.pass_turnstile():
+                return False
+            if self._active == 0 and not self._lock.share():
+                return False
+            self._active += 1
+            return True
+
+    @asynccontextmanager
+    async def writing(self):
+        while not await self._enter():
+            await asyncio.sleep(WRITE_GATE_POLL)
+        try:
+            yield
+        finally:
+            async with self._changed:
+                self._active -= 1
+                if self._active == 0:
+                    self._lock.unshare()
+                self._changed.notify_all()
+
+    @contextmanager
+    def writing_from_thread(self, loop: asyncio.AbstractEventLoop):
+        """writing() for blocking code on another thread, such as a background job."""
+        writing = self.writing()
+        asyncio.run_coroutine_threadsafe(writing.__aenter__(), loop).result()
+        try:
+            yield
+        finally:
+            asyncio.run_coroutine_threadsafe(writing.__aexit__(None, None, None), loop).result()
+
+    @asynccontextmanager
+    async def closed(self):
+        async with self._changed:
+            await self._changed.wait_for(lambda: not self._closed)
+            self._closed = True
+            await self._changed.wait_for(lambda: self._active == 0)
+        try:
+            with self._lock.exclusive() as hold:
+                while not hold.try_acquire():
+                    await asyncio.sleep(WRITE_GATE_POLL)
+                yield
+        finally:
+            async with self._changed:
+                self._closed = False
+                self._changed.notify_all()
+
+write_gate = WriteGate(replay_log_module.WriterLock(replay_log.directory))
+
+
+def replay_entry(method: str, path: str, body: dict | None = None) -> dict:
+    return {
         "timestamp": datetime.now(timezone.utc).isoformat(),
         "method": method,
         "path": path,
         "body": body,
     }
 
-    # Load existing entries (treat missing or empty file as empty list)
-    try:
-        raw = REPLAY_PATH.read_text()
-        entries = json.loads(raw) if raw.strip() else []
-    except (FileNotFoundError, json.JSONDecodeError):
-        entries = []
 
-    entries.append(entry)
-    REPLAY_PATH.write_text(json.dumps(entries, indent=2))
+async def log_replay(method: str, path: str, body: dict | None = None):
+    """Append a replayable request record to the replay log."""
+    entry = replay_entry(method, path, body)
+    # Completes once the log's flusher thread has fsynced the entry, sharing
+    # the fsync with concurrent writers; no database executor thread waits on it
+    await asyncio.wrap_future(replay_log.submit(entry))
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    global db_pool, db_executor, db_executor_workers, job_runner
     # Startup
+    db_pool = db.create_pool()
+    # One worker per pooled connection, so queued work waits in the executor
+    # rather than holding a thread while blocked on the pool
+    db_executor_workers = int(os.environ.get(
+        'DB_EXECUTOR_WORKERS', db_pool.maxconn if db_pool is not None else 10
+    ))
+    db_executor = ThreadPoolExecutor(max_workers=db_executor_workers, thread_name_prefix='db')
+    job_runner = jobs.create_runner()
+    if db_pool is not None:
+        try:
+            db_pool.prewarm()
+        except psycopg2.OperationalError as e:
+            # Database not up yet; connections are opened lazily on first use
+            print(f"Connection pool prewarm skipped: {e}")
+    # Carry over entries from the replay.json used before the segmented log
+    imported = replay_log.import_legacy(LEGACY_REPLAY_PATH)
+    if imported:
+        print(f"Imported {imported} entries from {LEGACY_REPLAY_PATH} into {replay_log.directory}")
+    reconcile_task = None
+    if STATS_RECONCILE_INTERVAL > 0:
+        reconcile_task = asyncio.create_task(reconcile_stats_periodically(STATS_RECONCILE_INTERVAL))
+    checkpoint_task = None
+    if REPLAY_CHECKPOINT_INTERVAL > 0:
+        checkpoint_task = asyncio.create_task(checkpoint_periodically(REPLAY_CHECKPOINT_INTERVAL))
     yield
     # Shutdown
+    if reconcile_task is not None:
+        reconcile_task.cancel()
+    if checkpoint_task is not None:
+        checkpoint_task.cancel()
+    # Off the event loop: a running load needs it to leave the write gate
+    await asyncio.to_thread(job_runner.shutdown)
+    job_runner = None
+    db_executor.shutdown(wait=True)
+    db_executor = None
+    if db_pool is not None:
+        db_pool.close()
+        db_pool = None
 
 
 app = FastAPI(
@@ -95,9 +289,63 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 
+@app.exception_handler(db.PoolTimeout)
+async def pool_timeout_handler(request: Request, exc: db.PoolTimeout):
+    return JSONResponse(status_code=503, content={"detail": str(exc)})
+
+
+# "Did you mean" suggestions attached to name-lookup 404s (0 disables)
+NOT_FOUND_SUGGESTIONS = int(os.environ.get('NOT_FOUND_SUGGESTIONS', '5'))
+
+
+class NameNotFound(HTTPException):
+    """404 for an owner (parameter=None) or owner/parameter that does not exist."""
+
+    def __init__(self, owner: str, parameter: Optional[str] = None, detail: Optional[str] = None):
+        if detail is None:
+            detail = f"Parameter '{owner}/{parameter}' not found" if parameter else f"Owner '{owner}' not found"
+        super().__init__(status_code=404, detail=detail)
+        self.owner = owner
+        self.parameter = parameter
+
+
+@app.exception_handler(NameNotFound)
+async def name_not_found_handler(request: Request, exc: NameNotFound):
+    content = {"detail": exc.detail}
+    if NOT_FOUND_SUGGESTIONS > 0:
+        try:
+            content["suggestions"] = await run_db(
+                _suggest_for_missing, exc.owner, exc.parameter, NOT_FOUND_SUGGESTIONS)
+        except (psycopg2.Error, db.PoolTimeout) as e:
+            # Suggestions are best effort (e.g. pg_trgm not installed)
+            print(f"Not-found suggestions unavailable: {e}")
+    return JSONResponse(status_code=404, content=content)
+
+
+def _suggest_for_missing(conn, owner: str, parameter: Optional[str], limit: int):
+    with conn.cursor() as cur:
+        if parameter is None:
+            cur.execute("SELECT username FROM suggest_owners(%s, %s)", (owner, limit))
+            return [row['username'] for row in cur.fetchall()]
+        cur.execute("SELECT owner, name FROM suggest_parameters(%s, %s, %s)", (parameter, owner, limit))
+        return [f"{row['owner']}/{row['name']}" for row in cur.fetchall()]
+
+
+def resolver_http_error(e: psycopg2.Error, owner: str, parameter: str) -> HTTPException:
+    """Map a resolver error to an HTTPException; a missing parameter gets suggestions."""
+    # The primary message only: str(e) carries the PL/pgSQL CONTEXT trace
+    message = e.diag.message_primary or str(e)
+    if message.startswith('Parameter '):
+        return NameNotFound(owner, parameter, detail=message)
+    if 'not found' in message.lower():
+        return HTTPException(status_code=404, detail=message)
+    return HTTPException(status_code=500, detail=message)
+
+
 # Pydantic models for responses
 class Owner(BaseModel):
     id: int
@@ -161,181 +409,400 @@ class ForkRequest(BaseModel):
     target_owner: str
 
 
+class ResolveBatchRequest(BaseModel):
+    queries: List[str]
+
+
+class BlobRequest(BaseModel):
+    hashes: List[str]
+
+
 @app.get('/', response_class=HTMLResponse)
 async def home(request: Request):
     return templates.TemplateResponse('interactive.html', {'request': request})
 
-@app.post("/load")
-async def load_parameters():
-    print("Loading parameters...")
-    load_params_module.load_parameters(Path(__file__).parent / 'Parameters')
-    return {"status": "ok"}
+LOAD_OWNER = 'evezor'
+
+
+@app.post("/load", status_code=202)
+async def load_parameters(
+    response: Response,
+    incremental: bool = Query(False, description="Only load changed directories, as new dev file versions")
+):
+    """
+    Start loading the Parameters folder as a background job and return
+    the job at once; poll GET /jobs/{id} for progress and the result.
+    409 if a load is already queued or running.
+    """
+    try:
+        job = job_runner.submit('load', _run_load, incremental, asyncio.get_running_loop(),
+                                params={'incremental': incremental})
+    except jobs.JobConflict as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "job": e.job.to_dict()})
+    response.headers['Location'] = f"/jobs/{job.id}"
+    return job.to_dict()
+
+
+def _run_load(incremental: bool, loop: asyncio.AbstractEventLoop, progress, log):
+    # Runs on the job runner's thread with its own connection
+    parameters_dir = Path(__file__).parent / 'Parameters'
+    load = (load_params_module.load_parameters_incremental if incremental
+            else load_params_module.load_parameters_bulk)
+    # Every parameter written is logged for replay (one POST .../load entry
+    # each) and, like any logged write, committed and logged inside the
+    # write gate, so a checkpoint or restore never falls between the two
+    entries = []
+    with write_gate.writing_from_thread(loop):
+        loaded = load(
+            parameters_dir, LOAD_OWNER, progress=progress, log=log,
+            written=lambda name, body: entries.append(
+                replay_entry("POST", f"/parameters/{LOAD_OWNER}/{name}/load", body))
+        )
+        for future in [replay_log.submit(entry) for entry in entries]:
+            future.result()
+    for name in loaded['written']:
+        resolve_cache.invalidate(LOAD_OWNER, name)
+    return loaded
+
+
+@app.get("/jobs")
+async def list_jobs():
+    """Background jobs this process knows of, newest first."""
+    return [job.to_dict() for job in job_runner.jobs()]
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status, progress, messages and result of a background job."""
+    job = job_runner.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return job.to_dict()
 
 # Health check
 @app.get("/health")
 async def health_check():
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cur:
-            cur.execute("SELECT 1")
-        conn.close()
+        await run_db(_ping)
         return {"status": "healthy"}
     except Exception as e:
         raise HTTPException(status_code=503, detail=str(e))
 
 
+def _ping(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT 1")
+
+
 # Owners
 @app.get("/owners", response_model=List[Owner])
 async def list_owners():
     """List all owners in the registry."""
-    conn = get_db_connection()
-    try:
-        with conn.cursor() as cur:
-            cur.execute("SELECT id, username FROM owners ORDER BY username")
-            return cur.fetchall()
-    finally:
-        conn.close()
+    return await run_db(_list_owners)
+
+
+def _list_owners(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT id, username FROM owners ORDER BY username")
+        return cur.fetchall()
 
 
 @app.get("/owners/{username}", response_model=Owner)
 async def get_owner(username: str):
     """Get owner by username."""
-    conn = get_db_connection()
-    try:
-        with conn.cursor() as cur:
-            cur.execute(
-                "SELECT id, username FROM owners WHERE username = %s",
-                (username,)
-            )
-            owner = cur.fetchone()
-            if not owner:
-                raise HTTPException(status_code=404, detail=f"Owner '{username}' not found")
-            return owner
-    finally:
-        conn.close()
+    return await run_db(_get_owner, username)
+
+
+def _get_owner(conn, username: str):
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT id, username FROM owners WHERE username = %s",
+            (username,)
+        )
+        owner = cur.fetchone()
+        if not owner:
+            raise NameNotFound(username)
+        return owner
 
 
 @app.post("/owners", response_model=Owner)
 async def create_owner(body: OwnerCreate):
     """Create a new owner."""
-    conn = get_db_connection()
+    async with write_gate.writing():
+        result = await run_db(_create_owner, body)
+        await log_replay("POST", "/owners", body=body.model_dump())
+    return result
+
+
+def _create_owner(conn, body: OwnerCreate):
     try:
         with conn.cursor() as cur:
             cur.execute(
                 "INSERT INTO owners (username) VALUES (%s) RETURNING id, username",
                 (body.username,)
             )
-            owner = cur.fetchone()
-            conn.commit()
-            return owner
+            return cur.fetchone()
     except psycopg2.IntegrityError:
         raise HTTPException(status_code=409, detail=f"Owner '{body.username}' already exists")
     except psycopg2.Error as e:
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        conn.close()
 
 
 # Parameters
 @app.get("/parameters", response_model=List[ParameterSummary])
-async def list_parameters(owner: Optional[str] = Query(None, description="Filter by owner")):
-    """List all parameters, optionally filtered by owner."""
-    conn = get_db_connection()
-    try:
-        with conn.cursor() as cur:
-            if owner:
-                cur.execute("""
-                    SELECT
-                        p.id,
-                        o.username as owner,
-                        p.name,
-                        p.description,
-                        COALESCE(
-                            ARRAY_AGG(pv.version ORDER BY pv.version)
-                            FILTER (WHERE pv.is_dev = FALSE AND pv.version IS NOT NULL),
-                            ARRAY[]::INTEGER[]
-                        ) as versions,
-                        BOOL_OR(pv.is_dev) as has_dev
-                    FROM parameters p
-                    JOIN owners o ON o.id = p.owner_id
-                    LEFT JOIN parameter_versions pv ON pv.parameter_id = p.id
-                    WHERE o.username = %s
-                    GROUP BY p.id, o.username, p.name, p.description
-                    ORDER BY p.name
-                """, (owner,))
-            else:
-                cur.execute("""
-                    SELECT
-                        p.id,
-                        o.username as owner,
-                        p.name,
-                        p.description,
-                        COALESCE(
-                            ARRAY_AGG(pv.version ORDER BY pv.version)
-                            FILTER (WHERE pv.is_dev = FALSE AND pv.version IS NOT NULL),
-                            ARRAY[]::INTEGER[]
-                        ) as versions,
-                        BOOL_OR(pv.is_dev) as has_dev
-                    FROM parameters p
-                    JOIN owners o ON o.id = p.owner_id
-                    LEFT JOIN parameter_versions pv ON pv.parameter_id = p.id
-                    GROUP BY p.id, o.username, p.name, p.description
-                    ORDER BY o.username, p.name
-                """)
-            return cur.fetchall()
-    finally:
-        conn.close()
-
+async def list_parameters(
+    response: Response,
+    owner: Optional[str] = Query(None, description="Filter by owner"),
+    prefix: Optional[str] = Query(None, min_length=1, description="Only names starting with this prefix"),
+    has_dev: Optional[bool] = Query(None, description="Only parameters with (true) or without (false) a dev version"),
+    limit: int = Query(100, ge=1, le=1000, description="Parameters per page"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page")
+):
+    """
+    List parameters ordered by owner, then name (byte order), optionally filtered.
 
-@app.get("/parameters/{owner}/{name}")
-async def get_parameter(owner: str, name: str):
-    """Get detailed information about a parameter."""
-    conn = get_db_connection()
+    Returns `limit` parameters per page. When more follow, the X-Next-Cursor
+    response header holds the cursor for the next page; pass it back as
+    `cursor` with the same filters.
+    """
+    after = decode_cursor(cursor, 'owner', 'name') if cursor else None
+    if after is not None and not all(isinstance(v, str) for v in after.values()):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    rows, next_cursor = await run_db(_list_parameters, owner, prefix, has_dev, limit, after)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return rows
+
+
+def _like_prefix(prefix: str) -> str:
+    return re.sub(r'([\\%_])', r'\\\1', prefix) + '%'
+
+
+def _list_parameters(conn, owner: Optional[str], prefix: Optional[str] = None,
+                     has_dev: Optional[bool] = None, limit: int = 100,
+                     after: Optional[dict] = None):
+    """One page of parameter summaries and the cursor for the next page (or None)."""
+    with conn.cursor() as cur:
+        # Owners are walked in order through idx_owners_username_c from the
+        # cursor's owner, and each owner's names through
+        # idx_parameters_owner_name_c, starting after the cursor. Both walks
+        # stop once limit + 1 rows are found, so a page costs the same however
+        # deep it is. Versions and has_dev are looked up for the page only,
+        # through the partial version indexes.
+        cur.execute("""
+            SELECT
+                page.id,
+                page.owner,
+                page.name,
+                page.description,
+                ARRAY(
+                    SELECT pv.version
+                    FROM parameter_versions pv
+                    WHERE pv.parameter_id = page.id AND pv.is_dev = FALSE
+                    ORDER BY pv.version
+                ) AS versions,
+                EXISTS (
+                    SELECT 1 FROM parameter_versions pv
+                    WHERE pv.parameter_id = page.id AND pv.is_dev = TRUE
+                ) AS has_dev
+            FROM (
+                SELECT p.id, o.username AS owner, p.name, p.description
+                FROM owners o
+                CROSS JOIN LATERAL (
+                    SELECT p.id, p.name, p.description
+                    FROM parameters p
+                    WHERE p.owner_id = o.id
+                      AND p.name COLLATE "C" > CASE
+                              WHEN o.username = %(after_owner)s THEN %(after_name)s
+                              ELSE ''
+                          END
+                      AND (%(prefix)s::TEXT IS NULL OR p.name COLLATE "C" LIKE %(prefix)s)
+                      AND (%(has_dev)s::BOOLEAN IS NULL OR EXISTS (
+                              SELECT 1 FROM parameter_versions d
+                              WHERE d.parameter_id = p.id AND d.is_dev = TRUE
+                          ) = %(has_dev)s::BOOLEAN)
+                    ORDER BY p.name COLLATE "C"
+                    LIMIT %(limit)s + 1
+                ) p
+                WHERE (%(owner)s::TEXT IS NULL OR o.username = %(owner)s)
+                  AND (%(after_owner)s::TEXT IS NULL OR o.username COLLATE "C" >= %(after_owner)s)
+                ORDER BY o.username COLLATE "C", p.name COLLATE "C"
+                LIMIT %(limit)s + 1
+            ) page
+            ORDER BY page.owner COLLATE "C", page.name COLLATE "C"
+        """, {
+            'owner': owner,
+            'prefix': _like_prefix(prefix) if prefix else None,
+            'has_dev': has_dev,
+            'limit': limit,
+            'after_owner': after['owner'] if after else None,
+            'after_name': after['name'] if after else None,
+        })
+        rows = cur.fetchall()
+
+        # One extra row was fetched to tell whether another page follows
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor({'owner': rows[-1]['owner'], 'name': rows[-1]['name']})
+        return rows, next_cursor
+
+
+def encode_cursor(position: dict) -> str:
+    """Opaque pagination cursor for a keyset position."""
+    raw = json.dumps(position, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, *fields: str) -> dict:
+    """Decode a cursor from encode_cursor(); 400 unless it has exactly `fields`."""
     try:
-        with conn.cursor() as cur:
-            # Get parameter info
-            cur.execute("""
-                SELECT p.id, o.username as owner, p.name, p.description
-                FROM parameters p
-                JOIN owners o ON o.id = p.owner_id
-                WHERE o.username = %s AND p.name = %s
-            """, (owner, name))
-            param = cur.fetchone()
+        position = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if isinstance(position, dict) and sorted(position) == sorted(fields):
+            return position
+    except (ValueError, UnicodeDecodeError):
+        pass
+    raise HTTPException(status_code=400, detail="Invalid cursor")
 
-            if not param:
-                raise HTTPException(status_code=404, detail=f"Parameter '{owner}/{name}' not found")
 
-            # Get versions
-            cur.execute("""
-                SELECT pv.id, pv.version, pv.is_dev
-                FROM parameter_versions pv
-                WHERE pv.parameter_id = %s
-                ORDER BY pv.is_dev, pv.version
-            """, (param['id'],))
-            versions = cur.fetchall()
+@app.get("/parameters/{owner}/{name}")
+async def get_parameter(
+    owner: str,
+    name: str,
+    limit: int = Query(100, ge=1, le=1000, description="Versions per page"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page")
+):
+    """
+    Get detailed information about a parameter.
 
-            # Get file mappings for each version
-            versions_with_files = []
-            for v in versions:
-                cur.execute("""
-                    SELECT ft.name as file_type, pvf.file_version
+    Versions are listed newest first (dev, then stable versions descending),
+    `limit` per page; pass `next_cursor` back as `cursor` for the next page.
+    """
+    after = decode_cursor(cursor, 'version') if cursor else None
+    if after is not None and not isinstance(after['version'], (int, type(None))):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return await run_db(_get_parameter, owner, name, limit, after)
+
+
+def _get_parameter(conn, owner: str, name: str, limit: int = 100, after: Optional[dict] = None):
+    """`after` is a decoded cursor: None for the first page, {'version': None} right after dev."""
+    with conn.cursor() as cur:
+        # Parameter, one page of versions and their file mappings in one round trip.
+        # Dev sorts first and only appears on the first page; stable versions
+        # are walked backwards through idx_unique_stable_versions.
+        cur.execute("""
+            SELECT p.id, o.username AS owner, p.name, p.description,
+                   COALESCE(page.versions, '[]'::JSON) AS versions
+            FROM parameters p
+            JOIN owners o ON o.id = p.owner_id
+            LEFT JOIN LATERAL (
+                SELECT JSON_AGG(
+                           JSON_BUILD_OBJECT(
+                               'version', pv.version,
+                               'is_dev', pv.is_dev,
+                               'file_mappings', COALESCE(fm.file_mappings, '{}'::JSON)
+                           )
+                           ORDER BY pv.is_dev DESC, pv.version DESC
+                       ) AS versions
+                FROM (
+                    (SELECT id, version, is_dev
+                     FROM parameter_versions
+                     WHERE parameter_id = p.id AND is_dev = TRUE AND NOT %(paged)s)
+                    UNION ALL
+                    (SELECT id, version, is_dev
+                     FROM parameter_versions
+                     WHERE parameter_id = p.id AND is_dev = FALSE
+                       AND (%(after)s::INTEGER IS NULL OR version < %(after)s::INTEGER)
+                     ORDER BY version DESC
+                     LIMIT %(limit)s + 1)
+                    ORDER BY is_dev DESC, version DESC
+                    LIMIT %(limit)s + 1
+                ) pv
+                LEFT JOIN LATERAL (
+                    SELECT JSON_OBJECT_AGG(ft.name, pvf.file_version) AS file_mappings
                     FROM parameter_version_files pvf
                     JOIN file_types ft ON ft.id = pvf.file_type_id
-                    WHERE pvf.parameter_version_id = %s
-                """, (v['id'],))
-                files = {row['file_type']: row['file_version'] for row in cur.fetchall()}
-                versions_with_files.append({
-                    'version': v['version'],
-                    'is_dev': v['is_dev'],
-                    'file_mappings': files
-                })
+                    WHERE pvf.parameter_version_id = pv.id
+                ) fm ON TRUE
+            ) page ON TRUE
+            WHERE o.username = %(owner)s AND p.name = %(name)s
+        """, {'owner': owner, 'name': name, 'limit': limit,
+              'paged': after is not None, 'after': after['version'] if after else None})
+        param = cur.fetchone()
+
+        if not param:
+            raise NameNotFound(owner, name)
+
+        # One extra row was fetched to tell whether another page follows
+        versions = param.pop('versions')
+        next_cursor = None
+        if len(versions) > limit:
+            versions = versions[:limit]
+            next_cursor = encode_cursor({'version': versions[-1]['version']})
+
+        return {
+            **param,
+            'versions': versions,
+            'next_cursor': next_cursor
+        }
+
+
+@app.get("/search")
+async def search(
+    q: str = Query(..., min_length=1, max_length=500, description="Search terms (web search syntax)"),
+    owner: Optional[str] = Query(None, description="Only this owner's parameters"),
+    limit: int = Query(20, ge=1, le=100, description="Results per page"),
+    offset: int = Query(0, ge=0, le=10000, description="Results to skip")
+):
+    """
+    Full-text search over parameter names, descriptions and the newest
+    readme and py contents, best matches first, with highlighted snippets.
+    """
+    return await run_db(_search, q, owner, limit, offset)
 
-            return {
-                **param,
-                'versions': versions_with_files
-            }
-    finally:
-        conn.close()
+
+def _search(conn, q: str, owner: Optional[str], limit: int = 20, offset: int = 0):
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT * FROM search_parameters(%s, %s, %s, %s)",
+            (q, owner, limit, offset)
+        )
+        return {'query': q, 'results': cur.fetchall()}
+
+
+@app.get("/suggest")
+async def suggest(
+    q: str = Query(..., min_length=1, max_length=200, description="Partial or misspelled name, or owner/name"),
+    limit: int = Query(10, ge=1, le=50, description="Suggestions per kind")
+):
+    """
+    Typo-tolerant name completion for owners and parameters.
+
+    `q` is a parameter name, or `owner/name` to favour that owner's
+    parameters. Owner suggestions are for the owner part when given,
+    otherwise for the whole text.
+    """
+    owner, sep, name = q.partition('/')
+    if not sep:
+        owner, name = None, q
+    return await run_db(_suggest, owner, name, limit)
+
+
+def _suggest(conn, owner: Optional[str], name: str, limit: int = 10):
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT * FROM suggest_owners(%s, %s)", (owner or name, limit))
+            owners = cur.fetchall()
+            parameters = []
+            if name:
+                cur.execute(
+                    "SELECT * FROM suggest_parameters(%s, %s, %s)",
+                    (name, owner or None, limit)
+                )
+                parameters = cur.fetchall()
+            return {'owners': owners, 'parameters': parameters}
+    except psycopg2.Error as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/parameters/{owner}/{name}")
@@ -344,7 +811,14 @@ async def create_parameter(owner: str, name: str):
     Create a new parameter with a v1 containing one file per registered file type,
     each with placeholder content.
     """
-    conn = get_db_connection()
+    async with write_gate.writing():
+        result = await run_db(_create_parameter, owner, name)
+        resolve_cache.invalidate(owner, name)
+        await log_replay("POST", f"/parameters/{owner}/{name}")
+    return result
+
+
+def _create_parameter(conn, owner: str, name: str):
     try:
         with conn.cursor() as cur:
             # Resolve owner
@@ -374,12 +848,16 @@ async def create_parameter(owner: str, name: str):
             cur.execute("SELECT id, name FROM file_types ORDER BY name")
             file_types = cur.fetchall()
 
+            # Store the placeholder content once; every file v1 points at it
+            cur.execute("SELECT store_blob(%s) AS hash", ('new parameter',))
+            placeholder_hash = cur.fetchone()['hash']
+
             # Create file v1 for each file type with placeholder content
             for ft in file_types:
                 cur.execute("""
-                    INSERT INTO files (parameter_id, file_type_id, version, path, content)
+                    INSERT INTO files (parameter_id, file_type_id, version, path, content_hash)
                     VALUES (%s, %s, 1, %s, %s)
-                """, (parameter_id, ft['id'], ft['name'], 'new parameter'))
+                """, (parameter_id, ft['id'], ft['name'], placeholder_hash))
 
             # Create stable v1
             cur.execute("""
@@ -396,21 +874,13 @@ async def create_parameter(owner: str, name: str):
                     VALUES (%s, %s, 1)
                 """, (v1_id, ft['id']))
 
-            conn.commit()
-
-            log_replay("POST", f"/parameters/{owner}/{name}")
-
             return {
                 "parameter": f"{owner}/{name}",
                 "version": 1,
                 "files_created": len(file_types)
             }
-    except HTTPException:
-        raise
     except psycopg2.Error as e:
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        conn.close()
 
 
 # File Versioning
@@ -429,7 +899,14 @@ async def create_file_versions(owner: str, name: str, body: FileVersionBatch):
     if not body.files:
         raise HTTPException(status_code=400, detail="No files provided")
 
-    conn = get_db_connection()
+    async with write_gate.writing():
+        result = await run_db_locked(_create_file_versions, owner, name, body)
+        resolve_cache.invalidate(owner, name)
+        await log_replay("POST", f"/parameters/{owner}/{name}/file-versions", body=body.model_dump())
+    return result
+
+
+def _create_file_versions(conn, owner: str, name: str, body: FileVersionBatch):
     try:
         with conn.cursor() as cur:
             # Resolve parameter
@@ -441,82 +918,19 @@ async def create_file_versions(owner: str, name: str, body: FileVersionBatch):
             param = cur.fetchone()
             if not param:
                 raise HTTPException(status_code=404, detail=f"Parameter '{owner}/{name}' not found")
-            parameter_id = param['id']
-
-            # Ensure a dev parameter_version exists; create one if not
-            cur.execute("""
-                SELECT id FROM parameter_versions
-                WHERE parameter_id = %s AND is_dev = TRUE
-            """, (parameter_id,))
-            dev_version = cur.fetchone()
-            if not dev_version:
-                cur.execute("""
-                    INSERT INTO parameter_versions (parameter_id, is_dev)
-                    VALUES (%s, TRUE)
-                    RETURNING id
-                """, (parameter_id,))
-                dev_version = cur.fetchone()
-            dev_version_id = dev_version['id']
-
-            created = []
-            for file in body.files:
-                # Resolve file type
-                cur.execute("SELECT id FROM file_types WHERE name = %s", (file.file_type,))
-                ft = cur.fetchone()
-                if not ft:
-                    raise HTTPException(status_code=400, detail=f"Unknown file type: '{file.file_type}'")
-                file_type_id = ft['id']
-
-                # Get the current highest version and its path for this (parameter, file_type)
-                cur.execute("""
-                    SELECT version, path FROM files
-                    WHERE parameter_id = %s AND file_type_id = %s
-                    ORDER BY version DESC LIMIT 1
-                """, (parameter_id, file_type_id))
-                current = cur.fetchone()
-
-                if current:
-                    new_version = current['version'] + 1
-                    path = current['path']
-                else:
-                    new_version = 1
-                    path = file.file_type
-
-                # Insert the new file version
-                cur.execute("""
-                    INSERT INTO files (parameter_id, file_type_id, version, path, content, change_note)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                """, (parameter_id, file_type_id, new_version, path, file.content, file.change_note))
 
-                # Point the dev mapping at the new version (insert or update)
-                cur.execute("""
-                    INSERT INTO parameter_version_files (parameter_version_id, file_type_id, file_version)
-                    VALUES (%s, %s, %s)
-                    ON CONFLICT (parameter_version_id, file_type_id)
-                    DO UPDATE SET file_version = EXCLUDED.file_version
-                """, (dev_version_id, file_type_id, new_version))
-
-                created.append({
-                    "file_type": file.file_type,
-                    "new_version": new_version,
-                    "path": path,
-                    "change_note": file.change_note
-                })
-
-            conn.commit()
-
-            log_replay("POST", f"/parameters/{owner}/{name}/file-versions", body=body.model_dump())
-
-            return {
-                "parameter": f"{owner}/{name}",
-                "created": created
-            }
-    except HTTPException:
-        raise
+        created = file_versions.create_dev_file_versions(conn, param['id'], [
+            file_versions.NewFile(file.file_type, file.content, file.change_note)
+            for file in body.files
+        ])
+        return {
+            "parameter": f"{owner}/{name}",
+            "created": created
+        }
+    except file_versions.UnknownFileType as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except psycopg2.Error as e:
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        conn.close()
 
 
 # Publish
@@ -526,7 +940,14 @@ async def publish_version(owner: str, name: str):
     Publish the current dev state as the next stable version.
     Snapshots the merged dev+latest file map and freezes dependencies.
     """
-    conn = get_db_connection()
+    async with write_gate.writing():
+        result = await run_db_locked(_publish_version, owner, name)
+        resolve_cache.invalidate(owner, name)
+        await log_replay("POST", f"/parameters/{owner}/{name}/publish")
+    return result
+
+
+def _publish_version(conn, owner: str, name: str):
     try:
         with conn.cursor() as cur:
             cur.execute("""
@@ -538,6 +959,9 @@ async def publish_version(owner: str, name: str):
             if not param:
                 raise HTTPException(status_code=404, detail=f"Parameter '{owner}/{name}' not found")
 
+            # Taken before the guard, so a concurrent publish cannot empty dev in between
+            file_versions.lock_parameter(cur, param['id'])
+
             # Guard: require at least one dev file mapping before publishing
             cur.execute("""
                 SELECT pvf.file_type_id
@@ -555,20 +979,12 @@ async def publish_version(owner: str, name: str):
             cur.execute("SELECT publish_parameter(%s) AS new_version", (param['id'],))
             new_version = cur.fetchone()['new_version']
 
-            conn.commit()
-
-            log_replay("POST", f"/parameters/{owner}/{name}/publish")
-
             return {
                 "parameter": f"{owner}/{name}",
                 "published_version": new_version
             }
-    except HTTPException:
-        raise
     except psycopg2.Error as e:
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        conn.close()
 
 
 # Fork
@@ -579,7 +995,63 @@ async def fork_parameter(owner: str, name: str, body: ForkRequest):
     Copies the latest state (dev if available, otherwise latest stable)
     as v1 in the target owner's namespace.
     """
-    conn = get_db_connection()
+    async with write_gate.writing():
+        result = await run_db(_fork_parameter, owner, name, body)
+        resolve_cache.invalidate(body.target_owner, name)
+        await log_replay("POST", f"/parameters/{owner}/{name}/fork", body=body.model_dump())
+    return result
+
+
+# The source's dev state if dev maps any files, otherwise its latest stable
+# version. Nothing is written when that state has no files.
+FORK_PARAMETER = """
+    WITH source_version AS (
+        SELECT pv.id
+        FROM parameter_versions pv
+        WHERE pv.parameter_id = %(source_id)s
+          AND (pv.is_dev OR pv.version = (
+                SELECT MAX(version) FROM parameter_versions
+                WHERE parameter_id = %(source_id)s AND is_dev = FALSE))
+          AND EXISTS (SELECT 1 FROM parameter_version_files pvf
+                      WHERE pvf.parameter_version_id = pv.id)
+        ORDER BY pv.is_dev DESC
+        LIMIT 1
+    ),
+    source_files AS (
+        SELECT f.file_type_id, f.path, f.content_hash
+        FROM source_version sv
+        JOIN parameter_version_files pvf ON pvf.parameter_version_id = sv.id
+        JOIN files f ON f.parameter_id = %(source_id)s
+                    AND f.file_type_id = pvf.file_type_id
+                    AND f.version = pvf.file_version
+    ),
+    new_param AS (
+        INSERT INTO parameters (owner_id, name, description)
+        SELECT %(owner_id)s, %(name)s, %(description)s
+        WHERE EXISTS (SELECT 1 FROM source_files)
+        RETURNING id
+    ),
+    new_files AS (
+        INSERT INTO files (parameter_id, file_type_id, version, path, content_hash)
+        SELECT np.id, sf.file_type_id, 1, sf.path, sf.content_hash
+        FROM new_param np CROSS JOIN source_files sf
+        RETURNING file_type_id
+    ),
+    v1 AS (
+        INSERT INTO parameter_versions (parameter_id, version, is_dev)
+        SELECT id, 1, FALSE FROM new_param
+        RETURNING id
+    ),
+    mapped AS (
+        INSERT INTO parameter_version_files (parameter_version_id, file_type_id, file_version)
+        SELECT v1.id, nf.file_type_id, 1
+        FROM v1 CROSS JOIN new_files nf
+    )
+    SELECT count(*) AS files_copied FROM new_files
+"""
+
+
+def _fork_parameter(conn, owner: str, name: str, body: ForkRequest):
     try:
         with conn.cursor() as cur:
             # Resolve source parameter
@@ -591,184 +1063,422 @@ async def fork_parameter(owner: str, name: str, body: ForkRequest):
             source = cur.fetchone()
             if not source:
                 raise HTTPException(status_code=404, detail=f"Parameter '{owner}/{name}' not found")
-            source_param_id = source['id']
 
             # Resolve target owner
             cur.execute("SELECT id FROM owners WHERE username = %s", (body.target_owner,))
             target_owner_row = cur.fetchone()
             if not target_owner_row:
                 raise HTTPException(status_code=404, detail=f"Owner '{body.target_owner}' not found")
-            target_owner_id = target_owner_row['id']
 
             # Check target parameter doesn't already exist
             cur.execute("""
                 SELECT id FROM parameters WHERE owner_id = %s AND name = %s
-            """, (target_owner_id, name))
+            """, (target_owner_row['id'], name))
             if cur.fetchone():
                 raise HTTPException(status_code=409, detail=f"Parameter '{body.target_owner}/{name}' already exists")
 
-            # Get the latest file state: prefer dev, fall back to latest stable
-            cur.execute("""
-                SELECT pvf.file_type_id, pvf.file_version
-                FROM parameter_version_files pvf
-                JOIN parameter_versions pv ON pv.id = pvf.parameter_version_id
-                WHERE pv.parameter_id = %s AND pv.is_dev = TRUE
-            """, (source_param_id,))
-            file_mappings = cur.fetchall()
-
-            if not file_mappings:
-                cur.execute("""
-                    SELECT pvf.file_type_id, pvf.file_version
-                    FROM parameter_version_files pvf
-                    JOIN parameter_versions pv ON pv.id = pvf.parameter_version_id
-                    WHERE pv.parameter_id = %s AND pv.is_dev = FALSE
-                    AND pv.version = (
-                        SELECT MAX(version) FROM parameter_versions
-                        WHERE parameter_id = %s AND is_dev = FALSE
-                    )
-                """, (source_param_id, source_param_id))
-                file_mappings = cur.fetchall()
-
-            if not file_mappings:
+            # One statement copies the file rows of the source's latest
+            # state as version 1 and maps them into a stable v1. The copies
+            # point at the same blobs, so no content is duplicated.
+            cur.execute(FORK_PARAMETER, {
+                'source_id': source['id'],
+                'owner_id': target_owner_row['id'],
+                'name': name,
+                'description': source['description'],
+            })
+            files_copied = cur.fetchone()['files_copied']
+            if not files_copied:
                 raise HTTPException(status_code=400, detail="Source parameter has no files to fork")
 
-            # Create new parameter
-            cur.execute("""
-                INSERT INTO parameters (owner_id, name, description)
-                VALUES (%s, %s, %s)
-                RETURNING id
-            """, (target_owner_id, name, source['description']))
-            new_param_id = cur.fetchone()['id']
-
-            # Copy files as version 1 and build mapping list
-            copied_files = []
-            for fm in file_mappings:
-                cur.execute("""
-                    SELECT path, content FROM files
-                    WHERE parameter_id = %s AND file_type_id = %s AND version = %s
-                """, (source_param_id, fm['file_type_id'], fm['file_version']))
-                file_row = cur.fetchone()
-
-                cur.execute("""
-                    INSERT INTO files (parameter_id, file_type_id, version, path, content)
-                    VALUES (%s, %s, 1, %s, %s)
-                """, (new_param_id, fm['file_type_id'], file_row['path'], file_row['content']))
-
-                copied_files.append(fm['file_type_id'])
-
-            # Create stable v1
-            cur.execute("""
-                INSERT INTO parameter_versions (parameter_id, version, is_dev)
-                VALUES (%s, 1, FALSE)
-                RETURNING id
-            """, (new_param_id,))
-            v1_id = cur.fetchone()['id']
-
-            # Link v1 to the copied files (all at version 1)
-            for file_type_id in copied_files:
-                cur.execute("""
-                    INSERT INTO parameter_version_files (parameter_version_id, file_type_id, file_version)
-                    VALUES (%s, %s, 1)
-                """, (v1_id, file_type_id))
-
-            conn.commit()
-
-            log_replay("POST", f"/parameters/{owner}/{name}/fork", body=body.model_dump())
-
             return {
                 "source": f"{owner}/{name}",
                 "forked_to": f"{body.target_owner}/{name}",
-                "files_copied": len(copied_files)
+                "files_copied": files_copied
             }
-    except HTTPException:
-        raise
     except psycopg2.Error as e:
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        conn.close()
 
 
 # Replay
-async def replay_entries(entries: list[dict] | None = None) -> list[dict]:
+REPLAY_PATH = re.compile(r'^/parameters/([^/]+)/([^/]+)(?:/(file-versions|publish|fork|load))?$')
+
+
+def parse_replay_path(path: str) -> Optional[tuple]:
     """
-    Replay recorded requests by calling the original handlers directly.
-    Pass a specific list of entries, or None to replay everything in replay.json.
-    Returns a result dict per entry with status 'ok' or 'error'.
+    Split a logged path into (owner, name, action); action is 'create' for
+    the bare parameter path and 'create-owner' (with no owner or name) for
+    POST /owners.
     """
-    global _replaying
+    if path == '/owners':
+        return None, None, 'create-owner'
+    m = REPLAY_PATH.match(path)
+    if not m:
+        return None
+    owner, name, action = m.groups()
+    return owner, name, action or 'create'
 
+
+def replay_result(entry: dict, result=None, error: Optional[str] = None) -> dict:
+    if error is not None:
+        return {"path": entry["path"], "timestamp": entry.get("timestamp"), "status": "error", "error": error}
+    return {"path": entry["path"], "timestamp": entry.get("timestamp"), "status": "ok", "result": result}
+
+
+async def replay_entries(entries: Iterable[dict] | None = None) -> list[dict]:
+    """
+    Replay recorded requests one at a time, each in its own transaction.
+    Pass specific entries, or None to stream everything in the replay log.
+    Returns a result dict per entry with status 'ok' or 'error'.
+
+    Entries run the handlers' sync bodies, so they are not logged again
+    and don't wait on the write gate the caller holds closed.
+    """
     if entries is None:
+        entries = replay_log.entries()
+
+    results = []
+    for entry in entries:
         try:
-            raw = REPLAY_PATH.read_text()
-            entries = json.loads(raw) if raw.strip() else []
-        except (FileNotFoundError, json.JSONDecodeError):
-            entries = []
+            results.append(replay_result(entry, await run_db_locked(_replay_entry, entry)))
+        except HTTPException as e:
+            results.append(replay_result(entry, error=f"{e.status_code}: {e.detail}"))
+        except Exception as e:
+            results.append(replay_result(entry, error=str(e)))
+    # Replayed writes bypass the handlers' per-parameter invalidation
+    resolve_cache.clear()
+
+    return results
 
-    _replaying = True
+
+# Parallel replay
+REPLAY_WORKERS = int(os.environ.get('REPLAY_WORKERS', '4'))
+REPLAY_BATCH_SIZE = int(os.environ.get('REPLAY_BATCH_SIZE', '100'))
+REPLAY_BATCH_RETRIES = 3
+# Database executor threads (and so pooled connections) a parallel replay
+# leaves free for live requests
+REPLAY_EXECUTOR_RESERVE = int(os.environ.get('REPLAY_EXECUTOR_RESERVE', '2'))
+
+
+def partition_replay_entries(entries: Iterable[dict]) -> tuple[list[tuple], list[list[tuple]]]:
+    """
+    Split log entries into owner creations and independent partitions of
+    (position, entry).
+
+    Entries for the same owner/name share a partition, a fork joins its
+    source's partition with its target's, and a loaded parameter joins
+    those of the parameters it depends on (union-find), so replaying a
+    partition in log order applies every write an entry depends on before
+    it. Partitions share no parameters and can be replayed concurrently;
+    they are returned largest first. Any partition may need the owners, so
+    owner creations come back separately, to be replayed first.
+    """
+    parent = {}
+
+    def find(key):
+        parent.setdefault(key, key)
+        while parent[key] != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    owners, keyed = [], []
+    for position, entry in enumerate(entries):
+        target = parse_replay_path(entry.get("path", ""))
+        if target is not None and target[2] == 'create-owner':
+            owners.append((position, entry))
+            continue
+        if target is None:
+            # Fails on replay; give it a partition of its own
+            keys = [('', position)]
+        else:
+            owner, name, action = target
+            keys = [(owner, name)]
+            body = entry.get("body") or {}
+            target_owner = body.get("target_owner") if action == 'fork' else None
+            if isinstance(target_owner, str):
+                keys.append((target_owner, name))
+            # A loaded parameter is linked to the parameters it depends on
+            if action == 'load' and isinstance(body.get("dependencies"), list):
+                keys.extend((owner, dep) for dep in body["dependencies"] if isinstance(dep, str))
+        root = find(keys[0])
+        for key in keys[1:]:
+            parent[find(key)] = root
+        keyed.append((keys[0], position, entry))
+
+    partitions = {}
+    for key, position, entry in keyed:
+        partitions.setdefault(find(key), []).append((position, entry))
+    return owners, sorted(partitions.values(), key=len, reverse=True)
+
+
+def assign_replay_partitions(partitions: list, workers: int) -> list[list[tuple]]:
+    """Deal partitions (largest first) to whichever worker has the fewest entries so far."""
+    heap = [(0, i, []) for i in range(workers)]
+    for partition in partitions:
+        size, i, assigned = heapq.heappop(heap)
+        assigned.extend(partition)
+        heapq.heappush(heap, (size + len(partition), i, assigned))
+    return [assigned for _, _, assigned in sorted(heap, key=lambda w: w[1]) if assigned]
+
+
+def _replay_entry(conn, entry: dict):
+    target = parse_replay_path(entry["path"])
+    if target is None:
+        raise ValueError(f"Unrecognized path: {entry['path']}")
+    owner, name, action = target
+    if action == 'create-owner':
+        return _create_owner(conn, OwnerCreate(**entry["body"]))
+    if action == 'file-versions':
+        body = FileVersionBatch(**entry["body"])
+        if not body.files:
+            raise HTTPException(status_code=400, detail="No files provided")
+        return _create_file_versions(conn, owner, name, body)
+    if action == 'publish':
+        return _publish_version(conn, owner, name)
+    if action == 'fork':
+        return _fork_parameter(conn, owner, name, ForkRequest(**entry["body"]))
+    if action == 'load':
+        return load_params_module.apply_load_entry(conn, owner, name, entry["body"])
+    return _create_parameter(conn, owner, name)
+
+
+def _replay_batch(conn, batch: list) -> list:
+    """
+    Replay (position, entry) pairs in the open transaction, each under its
+    own savepoint so a failing entry is rolled back alone. A deadlock or
+    serialization failure is re-raised so the whole batch can be retried.
+    """
     results = []
-    try:
-        for entry in entries:
-            path = entry["path"]
+    with conn.cursor() as cur:
+        for position, entry in batch:
+            cur.execute("SAVEPOINT replay_entry")
             try:
-                # /parameters/{owner}/{name}/file-versions
-                m = re.match(r'^/parameters/([^/]+)/([^/]+)/file-versions$', path)
-                if m:
-                    owner, name = m.groups()
-                    body = FileVersionBatch(**entry["body"])
-                    result = await create_file_versions(owner, name, body)
-                    results.append({"path": path, "timestamp": entry.get("timestamp"), "status": "ok", "result": result})
-                    continue
-
-                # /parameters/{owner}/{name}/publish
-                m = re.match(r'^/parameters/([^/]+)/([^/]+)/publish$', path)
-                if m:
-                    owner, name = m.groups()
-                    result = await publish_version(owner, name)
-                    results.append({"path": path, "timestamp": entry.get("timestamp"), "status": "ok", "result": result})
-                    continue
-
-                # /parameters/{owner}/{name}/fork
-                m = re.match(r'^/parameters/([^/]+)/([^/]+)/fork$', path)
-                if m:
-                    owner, name = m.groups()
-                    body = ForkRequest(**entry["body"])
-                    result = await fork_parameter(owner, name, body)
-                    results.append({"path": path, "timestamp": entry.get("timestamp"), "status": "ok", "result": result})
-                    continue
-
-                # /parameters/{owner}/{name} (create new parameter)
-                m = re.match(r'^/parameters/([^/]+)/([^/]+)$', path)
-                if m:
-                    owner, name = m.groups()
-                    result = await create_parameter(owner, name)
-                    results.append({"path": path, "timestamp": entry.get("timestamp"), "status": "ok", "result": result})
-                    continue
-
-                results.append({"path": path, "timestamp": entry.get("timestamp"), "status": "error", "error": f"Unrecognized path: {path}"})
-
+                result = replay_result(entry, _replay_entry(conn, entry))
             except HTTPException as e:
-                results.append({"path": path, "timestamp": entry.get("timestamp"), "status": "error", "error": f"{e.status_code}: {e.detail}"})
+                if isinstance(e.__context__, psycopg2.extensions.TransactionRollbackError):
+                    raise e.__context__
+                result = replay_result(entry, error=f"{e.status_code}: {e.detail}")
+            except psycopg2.extensions.TransactionRollbackError:
+                raise
             except Exception as e:
-                results.append({"path": path, "timestamp": entry.get("timestamp"), "status": "error", "error": str(e)})
-    finally:
-        _replaying = False
+                result = replay_result(entry, error=str(e))
+            if result["status"] == "ok":
+                cur.execute("RELEASE SAVEPOINT replay_entry")
+            else:
+                cur.execute("ROLLBACK TO SAVEPOINT replay_entry")
+            results.append((position, result))
+    return results
+
 
+def _replay_worker(entries: list, batch_size: int, shard: int) -> list:
+    """
+    Replay a worker's share of (position, entry) pairs on one connection,
+    committing every batch_size entries. Returns (position, result) pairs.
+    """
+    conn = get_db_connection()
+    results = []
+    try:
+        # Batches hold their registry counter rows until commit; give each
+        # worker its own counter shard so workers don't queue on each other
+        with conn.cursor() as cur:
+            cur.execute("SET registry.counter_shard = %s", (str(shard),))
+        conn.commit()
+        for start in range(0, len(entries), batch_size):
+            batch = entries[start:start + batch_size]
+            for attempt in range(REPLAY_BATCH_RETRIES + 1):
+                try:
+                    batch_results = _replay_batch(conn, batch)
+                    conn.commit()
+                    break
+                except psycopg2.extensions.TransactionRollbackError as e:
+                    # Lost a deadlock against another worker (e.g. both
+                    # storing the same new blob); back off and redo the batch
+                    conn.rollback()
+                    if attempt == REPLAY_BATCH_RETRIES:
+                        batch_results = [(p, replay_result(entry, error=str(e))) for p, entry in batch]
+                    else:
+                        time.sleep(0.05 * (attempt + 1))
+                except psycopg2.Error as e:
+                    conn.rollback()
+                    batch_results = [(p, replay_result(entry, error=str(e))) for p, entry in batch]
+                    break
+            results.extend(batch_results)
+    finally:
+        try:
+            conn.rollback()
+            with conn.cursor() as cur:
+                cur.execute("RESET registry.counter_shard")
+            conn.commit()
+        except psycopg2.Error:
+            pass  # Broken connection; the pool discards it
+        release_db_connection(conn)
     return results
 
 
+async def replay_entries_parallel(entries: Iterable[dict] | None = None,
+                                  workers: int = REPLAY_WORKERS,
+                                  batch_size: int = REPLAY_BATCH_SIZE) -> tuple[list[dict], dict]:
+    """
+    Replay recorded requests with independent parameters in parallel.
+
+    Entries are partitioned by parameter (see partition_replay_entries) and
+    the partitions dealt out to `workers` database workers. Each worker runs
+    the sync handlers on a single pooled connection and commits every
+    `batch_size` entries. Returns the per-entry results in log order, as
+    replay_entries does, and a summary of the partitioning.
+    """
+    if entries is None:
+        entries = replay_log.entries()
+
+    owners, partitions = partition_replay_entries(entries)
+    # Each worker holds an executor thread and a connection for the whole
+    # replay; keep REPLAY_EXECUTOR_RESERVE of them free for live requests
+    available = db_executor_workers - REPLAY_EXECUTOR_RESERVE if db_executor_workers else workers
+    workers = max(1, min(workers, len(partitions), available))
+    shares = assign_replay_partitions(partitions, workers)
+
+    done = [await run_blocking(_replay_worker, owners, batch_size, 0)] if owners else []
+    done += await asyncio.gather(*(run_blocking(_replay_worker, share, batch_size, shard)
+                                   for shard, share in enumerate(shares)))
+    # Replayed writes bypass the handlers' per-parameter invalidation
+    resolve_cache.clear()
+
+    results = sorted((pair for share in done for pair in share), key=lambda pair: pair[0])
+    return [result for _, result in results], {
+        "owners": len(owners),
+        "partitions": len(partitions),
+        "largest_partition": len(partitions[0]) if partitions else 0,
+        "workers": len(shares),
+        "batch_size": batch_size,
+    }
+
+
 @app.post("/replay")
-async def replay():
-    """Replay all recorded requests from replay.json in order."""
-    results = await replay_entries()
+async def replay(
+    parallel: bool = Query(False, description="Replay independent parameters concurrently"),
+    workers: int = Query(REPLAY_WORKERS, ge=1, le=64, description="Concurrent workers in parallel mode"),
+    batch_size: int = Query(REPLAY_BATCH_SIZE, ge=1, le=10000, description="Entries per commit in parallel mode"),
+    restore: bool = Query(False, description="Restore the latest snapshot first and replay only the log after it"),
+):
+    """
+    Replay all recorded requests from the replay log.
+    By default entries are replayed one at a time in log order; with
+    parallel=true, parameters that do not depend on each other are replayed
+    concurrently in batched transactions. With restore=true the registry is
+    first reset to the latest checkpoint snapshot and only the entries
+    logged after it are replayed. Logged writes wait while it runs.
+    """
+    start = time.perf_counter()
+    entries, restored = None, {}
+    # Live writes in every API process wait until the log is replayed, so
+    # none lands between the restore and the entries replayed after it
+    async with write_gate.closed():
+        if restore:
+            snapshot = snapshot_store.latest()
+            if snapshot is None:
+                raise HTTPException(status_code=404, detail="No snapshot to restore; take one with POST /replay/checkpoint")
+            manifest = await run_db(_restore_snapshot, snapshot)
+            # Everything cached predates the restored state
+            resolve_cache.clear()
+            entries = replay_log.entries(manifest['offset'])
+            restored = {"restored": {
+                "offset": manifest['offset'],
+                "created_at": manifest['created_at'],
+                "seconds": round(time.perf_counter() - start, 3),
+            }}
+        if parallel:
+            results, summary = await replay_entries_parallel(entries, workers=workers, batch_size=batch_size)
+        else:
+            results, summary = await replay_entries(entries), {}
+    elapsed = time.perf_counter() - start
     succeeded = sum(1 for r in results if r["status"] == "ok")
     return {
+        "mode": "parallel" if parallel else "sequential",
+        **restored,
+        **summary,
         "total": len(results),
         "succeeded": succeeded,
         "failed": len(results) - succeeded,
+        "elapsed_seconds": round(elapsed, 3),
+        "entries_per_second": round(len(results) / elapsed, 1) if elapsed > 0 else None,
         "results": results
     }
 
 
+def _restore_snapshot(conn, snapshot: Path) -> dict:
+    try:
+        manifest = snapshot_store.restore(conn, snapshot)
+    except psycopg2.Error as e:
+        raise HTTPException(status_code=500, detail=f"Snapshot restore failed: {e}")
+    # A restore may renumber file types
+    file_versions.file_type_ids.clear()
+    return manifest
+
+
+# Checkpoints
+_checkpoint_lock = asyncio.Lock()
+
+
+async def take_checkpoint() -> dict:
+    """
+    Snapshot the registry at a replay log offset, then drop the snapshots
+    and log segments that are no longer needed.
+
+    Logged writes are paused only while the snapshot transaction starts and
+    the log rotates, so the snapshot holds exactly the writes in the
+    segments before the offset. The tables are then copied from that
+    transaction while writes continue.
+    """
+    async with _checkpoint_lock:
+        conn = await run_blocking(get_db_connection)
+        try:
+            async with write_gate.closed():
+                offset = await run_blocking(_begin_snapshot, conn)
+            manifest = await run_blocking(snapshot_store.write, conn, offset)
+        finally:
+            await run_blocking(conn.rollback)
+            release_db_connection(conn)
+        oldest = await run_blocking(snapshot_store.prune)
+        manifest['segments_compacted'] = await run_blocking(replay_log.compact, oldest)
+        return manifest
+
+
+def _begin_snapshot(conn) -> int:
+    with conn.cursor() as cur:
+        cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+        # The transaction's snapshot is taken by its first query
+        cur.execute("SELECT 1")
+    return replay_log.rotate()
+
+
+@app.post("/replay/checkpoint")
+async def create_checkpoint():
+    """Snapshot the registry now and compact the replay log behind it."""
+    try:
+        return await take_checkpoint()
+    except psycopg2.Error as e:
+        raise HTTPException(status_code=500, detail=f"Checkpoint failed: {e}")
+
+
+# Periodic checkpoints (seconds between runs; 0 disables)
+REPLAY_CHECKPOINT_INTERVAL = float(os.environ.get('REPLAY_CHECKPOINT_INTERVAL', 0))
+
+
+async def checkpoint_periodically(interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        latest = snapshot_store.latest()
+        if latest is not None and not any(True for _ in replay_log.entries(int(latest.name))):
+            continue  # Nothing logged since the last checkpoint
+        try:
+            manifest = await take_checkpoint()
+        except (psycopg2.Error, db.PoolTimeout, OSError) as e:
+            print(f"Replay checkpoint failed: {e}")
+            continue
+        print(f"Replay checkpoint at segment {manifest['offset']} "
+              f"({manifest['bytes']} bytes, {manifest['segments_compacted']} segments compacted)")
+
+
 # Package Resolution
 def parse_package_query(query: str) -> tuple:
     """
@@ -792,8 +1502,48 @@ def parse_package_query(query: str) -> tuple:
     return owner, parameter, selector, filetypes
 
 
+# Cache-Control for resolves. Stable versions are immutable, so an integer
+# selector can be cached indefinitely; latest moves on publish and dev on
+# every push, so those are revalidated against the ETag.
+RESOLVE_LATEST_MAX_AGE = int(os.environ.get('RESOLVE_LATEST_MAX_AGE', '30'))
+
+
+def resolve_cache_control(selector: str) -> str:
+    if selector.isdigit():
+        return 'public, max-age=31536000, immutable'
+    if selector == 'latest':
+        return f'public, max-age={RESOLVE_LATEST_MAX_AGE}, must-revalidate'
+    return 'no-cache'
+
+
+def package_etag(owner: str, parameter: str, selector: str, manifest: list,
+                 manifest_only: bool = False) -> str:
+    """Strong ETag for a resolved package, derived from its file map and content hashes."""
+    first = manifest[0]
+    key = json.dumps([
+        owner, parameter, selector, first['version'], first['is_dev'], manifest_only,
+        [[m['file_type'], m['file_version'], m['path'], m['content_hash']] for m in manifest],
+    ], separators=(',', ':'))
+    return '"' + hashlib.sha256(key.encode('utf-8')).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match check (weak comparison, as RFC 9110 requires for this header)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(','))
+    return any(tag.removeprefix('W/') == etag for tag in candidates)
+
+
 @app.get("/resolve/{query:path}")
-async def resolve_package(query: str):
+async def resolve_package(
+    query: str,
+    closure: bool = Query(False, description="Include every transitive dependency"),
+    manifest: bool = Query(False, description="Return sizes and content hashes instead of content"),
+    if_none_match: Optional[str] = Header(None)
+):
     """
     Resolve a package query and return the files.
 
@@ -804,73 +1554,548 @@ async def resolve_package(query: str):
     - evezor/Floe:1
     - evezor/Floe:dev
     - evezor/Floe:latest[js,py]
+    - evezor/Floe:latest[py]?closure=true
+
+    Responses carry a strong ETag; a matching If-None-Match returns 304
+    without reading any file content. Resolved payloads are served from
+    resolve_cache when possible.
+
+    With closure=true the response lists the root and every transitive
+    dependency (each parameter version once) with their files.
+
+    With manifest=true each file carries its size and content_hash instead
+    of its content; fetch only the contents you lack with POST /blobs.
     """
     owner, parameter, selector, filetypes = parse_package_query(query)
-
-    conn = get_db_connection()
+    if closure:
+        return await resolve_closure(owner, parameter, selector, filetypes, manifest, if_none_match)
+
+    key = resolve_cache.key(owner, parameter, selector, filetypes, manifest)
+
+    cached = resolve_cache.get(key)
+    if cached is not None:
+        etag, payload = cached
+    else:
+        generation = resolve_cache.generation(owner, parameter)
+        etag, body = await run_db(
+            _resolve_package, owner, parameter, selector, filetypes, manifest, if_none_match)
+        payload = None
+        if body is not None:
+            payload = JSONResponse(content=body).body
+            resolve_cache.put(key, generation, etag, payload)
+
+    headers = {'ETag': etag, 'Cache-Control': resolve_cache_control(selector)}
+    if payload is None or etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=payload, media_type='application/json', headers=headers)
+
+
+def _resolve_package(conn, owner: str, parameter: str, selector: str, filetypes: Optional[list],
+                     manifest_only: bool = False, if_none_match: Optional[str] = None):
+    """Return (etag, body); body is None when if_none_match already matches."""
     try:
         with conn.cursor() as cur:
-            # Use the resolve_package function from the database
-            if filetypes:
-                cur.execute(
-                    "SELECT * FROM resolve_package(%s, %s, %s, %s)",
-                    (owner, parameter, selector, filetypes)
-                )
-            else:
-                cur.execute(
-                    "SELECT * FROM resolve_package(%s, %s, %s)",
-                    (owner, parameter, selector)
+            cur.execute("""
+                SELECT m.*, b.size
+                FROM resolve_package_manifest(%s, %s, %s, %s) WITH ORDINALITY m
+                JOIN blobs b ON b.hash = m.content_hash
+                ORDER BY m.ordinality
+            """, (owner, parameter, selector, filetypes))
+            manifest = cur.fetchall()
+
+            if not manifest:
+                raise HTTPException(
+                    status_code=404,
+                    detail=f"No files found for {owner}/{parameter}:{selector}"
                 )
 
-            rows = cur.fetchall()
+            etag = package_etag(owner, parameter, selector, manifest, manifest_only)
+            if etag_matches(if_none_match, etag):
+                return etag, None
+            if manifest_only:
+                return etag, package_body(owner, parameter, selector, manifest, None)
 
-            if not rows:
+            cur.execute(
+                "SELECT hash, content FROM blobs WHERE hash = ANY(%s)",
+                (list({m['content_hash'] for m in manifest}),)
+            )
+            contents = {row['hash']: row['content'] for row in cur.fetchall()}
+
+            return etag, package_body(owner, parameter, selector, manifest, contents)
+    except psycopg2.Error as e:
+        raise resolver_http_error(e, owner, parameter)
+
+
+async def resolve_closure(owner: str, parameter: str, selector: str, filetypes: Optional[list],
+                          manifest_only: bool, if_none_match: Optional[str]):
+    # Not cached in resolve_cache: a write to any dependency would have to
+    # invalidate every closure containing it
+    etag, body, has_dev = await run_db(
+        _resolve_closure, owner, parameter, selector, filetypes, manifest_only, if_none_match)
+    # A dev dependency can change under a stable root, so only an all-stable
+    # closure inherits the selector's caching
+    headers = {'ETag': etag, 'Cache-Control': resolve_cache_control('dev' if has_dev else selector)}
+    if body is None:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=body, headers=headers)
+
+
+def _resolve_closure(conn, owner: str, parameter: str, selector: str, filetypes: Optional[list],
+                     manifest_only: bool = False, if_none_match: Optional[str] = None):
+    """Return (etag, body, has_dev); body is None when if_none_match already matches."""
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT m.*, b.size
+                FROM resolve_package_closure(%s, %s, %s, %s) WITH ORDINALITY m
+                JOIN blobs b ON b.hash = m.content_hash
+                ORDER BY m.ordinality
+            """, (owner, parameter, selector, filetypes))
+            manifest = cur.fetchall()
+
+            if not manifest:
                 raise HTTPException(
                     status_code=404,
                     detail=f"No files found for {owner}/{parameter}:{selector}"
                 )
 
-            # Get version info
-            cur.execute("""
-                SELECT pv.version, pv.is_dev
-                FROM parameter_versions pv
-                JOIN parameters p ON p.id = pv.parameter_id
-                JOIN owners o ON o.id = p.owner_id
-                WHERE o.username = %s AND p.name = %s
-                AND (
-                    (pv.is_dev = TRUE AND %s = 'dev')
-                    OR (pv.is_dev = FALSE AND %s = 'latest' AND pv.version = (
-                        SELECT MAX(version) FROM parameter_versions
-                        WHERE parameter_id = p.id AND is_dev = FALSE
-                    ))
-                    OR (pv.is_dev = FALSE AND pv.version = %s::INTEGER)
+            key = json.dumps([
+                owner, parameter, selector, 'closure', manifest_only,
+                [[m['owner'], m['parameter'], m['version'], m['is_dev'], m['file_type'],
+                  m['file_version'], m['path'], m['content_hash']] for m in manifest],
+            ], separators=(',', ':'))
+            etag = '"' + hashlib.sha256(key.encode('utf-8')).hexdigest()[:32] + '"'
+            has_dev = any(m['is_dev'] for m in manifest)
+            if etag_matches(if_none_match, etag):
+                return etag, None, has_dev
+
+            contents = None
+            if not manifest_only:
+                cur.execute(
+                    "SELECT hash, content FROM blobs WHERE hash = ANY(%s)",
+                    (list({m['content_hash'] for m in manifest}),)
                 )
-            """, (owner, parameter, selector, selector,
-                  selector if selector not in ('dev', 'latest') else '0'))
-            version_info = cur.fetchone()
+                contents = {row['hash']: row['content'] for row in cur.fetchall()}
+
+            packages = {}
+            for m in manifest:
+                ident = (m['owner'], m['parameter'], m['version'], m['is_dev'])
+                package = packages.get(ident)
+                if package is None:
+                    package = packages[ident] = {
+                        'depth': m['depth'],
+                        'owner': m['owner'],
+                        'parameter': m['parameter'],
+                        'version': m['version'],
+                        'is_dev': m['is_dev'],
+                        'files': [],
+                    }
+                package['files'].append(file_entry(m, contents))
 
-            return {
+            # The root has no rows if the file type filter excludes all its files
+            root = manifest[0] if manifest[0]['depth'] == 0 else {'version': None, 'is_dev': selector == 'dev'}
+            return etag, {
                 'owner': owner,
                 'parameter': parameter,
                 'selector': selector,
-                'version': version_info['version'] if version_info else None,
-                'is_dev': version_info['is_dev'] if version_info else False,
-                'files': [
-                    {
-                        'file_type': row['file_type'],
-                        'file_version': row['file_version'],
-                        'path': row['path'],
-                        'content': row['content']
-                    }
-                    for row in rows
-                ]
-            }
+                'version': root['version'],
+                'is_dev': root['is_dev'],
+                'packages': list(packages.values())
+            }, has_dev
+    except psycopg2.Error as e:
+        raise resolver_http_error(e, owner, parameter)
+
+
+def file_entry(m: dict, contents: Optional[dict]) -> dict:
+    """One entry of a response's files list; contents=None gives the manifest form."""
+    if contents is None:
+        return {
+            'file_type': m['file_type'],
+            'file_version': m['file_version'],
+            'path': m['path'],
+            'size': m['size'],
+            'content_hash': m['content_hash']
+        }
+    return {
+        'file_type': m['file_type'],
+        'file_version': m['file_version'],
+        'path': m['path'],
+        'content': contents[m['content_hash']]
+    }
+
+
+def package_body(owner: str, parameter: str, selector: str, manifest: list,
+                 contents: Optional[dict]) -> dict:
+    """Resolve response body from manifest rows and a content_hash -> content map."""
+    return {
+        'owner': owner,
+        'parameter': parameter,
+        'selector': selector,
+        'version': manifest[0]['version'],
+        'is_dev': manifest[0]['is_dev'],
+        'files': [file_entry(m, contents) for m in manifest]
+    }
+
+
+RESOLVE_BATCH_MAX = int(os.environ.get('RESOLVE_BATCH_MAX', '500'))
+
+
+def _json_bytes(value) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+@app.post("/resolve/batch")
+async def resolve_batch(body: ResolveBatchRequest):
+    """
+    Resolve many package queries in one request.
+
+    Body: { "queries": ["evezor/Parameter:latest", "evezor/GRBL:2[py]", ...] }
+
+    Returns one result per query, in order. Each result has a status: 200 with
+    the resolved package and its ETag, or 400/404 with a detail message. One
+    bad query does not fail the batch. Cached packages are served from
+    resolve_cache; all misses are resolved together with two queries.
+    """
+    if len(body.queries) > RESOLVE_BATCH_MAX:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many queries: {len(body.queries)} (max {RESOLVE_BATCH_MAX})"
+        )
+
+    results: list = [None] * len(body.queries)
+    misses = []  # (index, owner, parameter, selector, filetypes, key, generation)
+    for i, query in enumerate(body.queries):
+        try:
+            owner, parameter, selector, filetypes = parse_package_query(query)
+        except HTTPException as e:
+            results[i] = (400, e.detail)
+            continue
+        if selector not in ('latest', 'dev') and not (selector.isdigit() and int(selector) < 2**31):
+            results[i] = (400, f"Invalid selector '{selector}': expected latest, dev, or a version number")
+            continue
+        key = resolve_cache.key(owner, parameter, selector, filetypes)
+        cached = resolve_cache.get(key)
+        if cached is not None:
+            results[i] = (200, cached)
+        else:
+            misses.append((i, owner, parameter, selector, filetypes, key,
+                           resolve_cache.generation(owner, parameter)))
+
+    if misses:
+        resolved = await run_db(_resolve_batch, [m[1:5] for m in misses])
+        for (i, *_, key, generation), (status, result) in zip(misses, resolved):
+            if status == 200:
+                etag, package = result
+                result = (etag, JSONResponse(content=package).body)
+                resolve_cache.put(key, generation, *result)
+            results[i] = (status, result)
+
+    # Cached payloads are already serialized; splice them in rather than re-encoding
+    items = []
+    for query, (status, result) in zip(body.queries, results):
+        if status == 200:
+            etag, payload = result
+            items.append(b'{"query":' + _json_bytes(query) + b',"status":200,"etag":'
+                         + _json_bytes(etag) + b',"package":' + payload + b'}')
+        else:
+            items.append(_json_bytes({'query': query, 'status': status, 'detail': result}))
+    return Response(content=b'{"results":[' + b','.join(items) + b']}', media_type='application/json')
+
+
+def _resolve_batch(conn, queries: list) -> list:
+    """
+    Resolve (owner, parameter, selector, filetypes) tuples with two set-based
+    queries: one mapping every query to its parameter version, one fetching the
+    effective files of all distinct versions. Returns (status, result) per query,
+    where result is (etag, body) for 200 and a detail message otherwise.
+    """
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT q.idx, p.id AS parameter_id, pv.id AS parameter_version_id
+                FROM unnest(%s::TEXT[], %s::TEXT[], %s::TEXT[])
+                     WITH ORDINALITY AS q(owner, parameter, selector, idx)
+                LEFT JOIN owners o ON o.username = q.owner
+                LEFT JOIN parameters p ON p.owner_id = o.id AND p.name = q.parameter
+                LEFT JOIN LATERAL (
+                    SELECT v.id
+                    FROM parameter_versions v
+                    WHERE v.parameter_id = p.id
+                      AND CASE q.selector
+                              WHEN 'dev' THEN v.is_dev
+                              WHEN 'latest' THEN NOT v.is_dev
+                              ELSE NOT v.is_dev AND v.version = q.selector::INTEGER
+                          END
+                    ORDER BY v.version DESC
+                    LIMIT 1
+                ) pv ON TRUE
+                ORDER BY q.idx
+            """, ([q[0] for q in queries], [q[1] for q in queries], [q[2] for q in queries]))
+            targets = cur.fetchall()
+
+            pvids = list({t['parameter_version_id'] for t in targets if t['parameter_version_id']})
+            files_by_pvid: dict = {}
+            if pvids:
+                cur.execute("""
+                    SELECT t.pvid, pv.version, pv.is_dev, ft.name AS file_type,
+                           m.file_version, f.path, f.content_hash, b.content
+                    FROM unnest(%s::INTEGER[]) AS t(pvid)
+                    JOIN parameter_versions pv ON pv.id = t.pvid
+                    CROSS JOIN LATERAL resolve_effective_file_map(t.pvid) m
+                    JOIN file_types ft ON ft.id = m.file_type_id
+                    JOIN files f ON
+                        f.parameter_id = pv.parameter_id
+                        AND f.file_type_id = m.file_type_id
+                        AND f.version = m.file_version
+                    JOIN blobs b ON b.hash = f.content_hash
+                    ORDER BY t.pvid, ft.name
+                """, (pvids,))
+                for row in cur.fetchall():
+                    files_by_pvid.setdefault(row['pvid'], []).append(row)
+    except psycopg2.Error as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    resolved = []
+    for (owner, parameter, selector, filetypes), target in zip(queries, targets):
+        if target['parameter_id'] is None:
+            resolved.append((404, f"Parameter {owner}.{parameter} not found"))
+            continue
+        if target['parameter_version_id'] is None:
+            resolved.append((404, f"Version {selector} not found for parameter {owner}.{parameter}"))
+            continue
+        manifest = [
+            row for row in files_by_pvid.get(target['parameter_version_id'], [])
+            if not filetypes or row['file_type'] in filetypes
+        ]
+        if not manifest:
+            resolved.append((404, f"No files found for {owner}/{parameter}:{selector}"))
+            continue
+        contents = {row['content_hash']: row['content'] for row in manifest}
+        resolved.append((200, (
+            package_etag(owner, parameter, selector, manifest),
+            package_body(owner, parameter, selector, manifest, contents),
+        )))
+    return resolved
+
+
+# Blobs
+BLOBS_MAX = int(os.environ.get('BLOBS_MAX', '1000'))
+BLOB_HASH = re.compile(r'^[0-9a-f]{64}$')
+
+
+@app.post("/blobs")
+async def get_blobs(body: BlobRequest):
+    """
+    Fetch file contents by content hash (as listed by /resolve?manifest=true).
+
+    Body: { "hashes": ["<sha256 hex>", ...] }
+    Returns { "blobs": { hash: content }, "missing": [hash, ...] }
+    """
+    hashes = list(dict.fromkeys(h.lower() for h in body.hashes))
+    if len(hashes) > BLOBS_MAX:
+        raise HTTPException(status_code=400, detail=f"Too many hashes: {len(hashes)} (max {BLOBS_MAX})")
+    invalid = [h for h in hashes if not BLOB_HASH.match(h)]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Invalid content hash: {invalid[0]}")
+    return await run_db(_get_blobs, hashes)
+
+
+def _get_blobs(conn, hashes: list):
+    with conn.cursor() as cur:
+        cur.execute("SELECT hash, content FROM blobs WHERE hash = ANY(%s)", (hashes,))
+        blobs = {row['hash']: row['content'] for row in cur.fetchall()}
+    return {
+        'blobs': blobs,
+        'missing': [h for h in hashes if h not in blobs]
+    }
+
+
+# Bundles
+@app.get("/bundle/{query:path}")
+async def get_bundle(
+    query: str,
+    format: str = Query('tar', description="Archive format: tar, tgz or zip"),
+    closure: bool = Query(True, description="Include every transitive dependency")
+):
+    """
+    Download a resolved package (and by default its dependency closure) as an archive.
+
+    Members are named owner/parameter/path. The archive is streamed as file
+    contents come off a server-side cursor, so large packages never sit in
+    server memory as a whole.
+    """
+    owner, parameter, selector, filetypes = parse_package_query(query)
+    if format not in bundle.FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format '{format}': expected one of {', '.join(bundle.FORMATS)}")
+
+    # Resolve errors and an empty bundle must surface as 404 before the
+    # streaming response starts
+    version = await run_db(_bundle_root_version, owner, parameter, selector)
+    chunks = _bundle_chunks(owner, parameter, selector, filetypes, closure, format)
+    # The generator holds a pooled connection; steps run on the db executor
+    # and the lock keeps a close() from racing a step still in flight
+    lock = threading.Lock()
+
+    def step():
+        with lock:
+            return next(chunks, None)
+
+    def close():
+        with lock:
+            chunks.close()
+
+    try:
+        first = await run_blocking(step)
+    except BaseException:
+        close_bundle(close)
+        raise
+
+    media_type, extension = bundle.FORMATS[format]
+    filename = f"{owner}-{parameter}-{version}{extension}"
+    return StreamingResponse(
+        stream_bundle(first, step, close),
+        media_type=media_type,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+
+def _bundle_root_version(conn, owner: str, parameter: str, selector: str):
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT COALESCE(pv.version::TEXT, 'dev') AS version
+                FROM parameter_versions pv
+                WHERE pv.id = resolve_parameter_version(resolve_parameter(%s, %s), %s)
+            """, (owner, parameter, selector))
+            return cur.fetchone()['version']
+    except psycopg2.Error as e:
+        raise resolver_http_error(e, owner, parameter)
+
+
+async def stream_bundle(first: bytes, step: Callable, close: Callable):
+    try:
+        chunk = first
+        while chunk is not None:
+            yield chunk
+            chunk = await run_blocking(step)
+    finally:
+        # Not awaited: this also runs when the client disconnects mid-download
+        close_bundle(close)
+
+
+def close_bundle(close: Callable):
+    """Close a bundle generator on the db executor, or inline once it is shut down."""
+    executor = db_executor
+    if executor is not None:
+        try:
+            executor.submit(close)
+            return
+        except RuntimeError:
+            pass
+    close()
+
+
+def _bundle_chunks(owner: str, parameter: str, selector: str, filetypes: Optional[list],
+                   closure: bool, fmt: str):
+    if closure:
+        sql = """
+            SELECT m.owner, m.parameter, m.version, m.is_dev, m.path, b.content
+            FROM resolve_package_closure(%s, %s, %s, %s) WITH ORDINALITY m
+            JOIN blobs b ON b.hash = m.content_hash
+            ORDER BY m.ordinality
+        """
+    else:
+        sql = """
+            SELECT %s AS owner, %s AS parameter, m.version, m.is_dev, m.path, b.content
+            FROM resolve_package_manifest(%s, %s, %s, %s) WITH ORDINALITY m
+            JOIN blobs b ON b.hash = m.content_hash
+            ORDER BY m.ordinality
+        """
+    args = (owner, parameter, selector, filetypes)
+
+    conn = get_db_connection()
+    try:
+        # Named cursor: rows are fetched from the server a few at a time
+        with conn.cursor(name='bundle') as cur:
+            cur.itersize = 8
+            try:
+                cur.execute(sql, args if closure else (owner, parameter, *args))
+                # Peek so an empty bundle is a 404 rather than an empty archive
+                first = cur.fetchone()
+            except psycopg2.Error as e:
+                raise resolver_http_error(e, owner, parameter)
+            if first is None:
+                raise HTTPException(
+                    status_code=404,
+                    detail=f"No files found for {owner}/{parameter}:{selector}"
+                )
+
+            def members():
+                first_version = {}
+                for row in itertools.chain([first], cur):
+                    ident = (row['owner'], row['parameter'])
+                    version = 'dev' if row['is_dev'] else row['version']
+                    # A parameter pinned at two versions in one closure keeps the
+                    # shallowest one at the plain path
+                    prefix = f"{row['owner']}/{row['parameter']}"
+                    if first_version.setdefault(ident, version) != version:
+                        prefix += f"@{version}"
+                    yield f"{prefix}/{row['path']}", row['content'].encode('utf-8')
+
+            yield from bundle.iter_archive(members(), fmt)
+        conn.commit()
+    finally:
+        release_db_connection(conn)
+
+
+# Lockfiles
+@app.get("/lockfile/{query:path}")
+async def get_lockfile(query: str):
+    """
+    Generate a lockfile for a package query (owner/parameter:selector[filetypes]).
+
+    Lists every package in the dependency closure with its resolved version
+    and the content hash of each file. No file content is transferred.
+    """
+    owner, parameter, selector, filetypes = parse_package_query(query)
+    return await run_db(_generate_lockfile, owner, parameter, selector, filetypes)
+
+
+def _generate_lockfile(conn, owner: str, parameter: str, selector: str, filetypes: Optional[list]):
+    try:
+        lock = lockfile.generate(conn, owner, parameter, selector, filetypes)
+        if not lock['packages']:
+            raise HTTPException(
+                status_code=404,
+                detail=f"No files found for {owner}/{parameter}:{selector}"
+            )
+        return lock
+    except psycopg2.Error as e:
+        if 'not found' in str(e).lower():
+            raise HTTPException(status_code=404, detail=str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/lockfile/verify")
+async def verify_lockfile(lock: dict):
+    """
+    Check a lockfile against the registry using content hashes only.
+
+    `up_to_date` is true when the lockfile's root query still resolves to
+    exactly the locked packages and files.
+    """
+    return await run_db(_verify_lockfile, lock)
+
+
+def _verify_lockfile(conn, lock: dict):
+    try:
+        return lockfile.verify(conn, lock)
+    except lockfile.LockfileError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except psycopg2.Error as e:
         if 'not found' in str(e).lower():
             raise HTTPException(status_code=404, detail=str(e))
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        conn.close()
 
 
 # Dependencies
@@ -881,7 +2106,10 @@ async def get_dependencies(
     selector: str = Query('latest', description="Version selector: latest, dev, or integer")
 ):
     """Get the dependency tree for a parameter version."""
-    conn = get_db_connection()
+    return await run_db(_get_dependencies, owner, name, selector)
+
+
+def _get_dependencies(conn, owner: str, name: str, selector: str):
     try:
         with conn.cursor() as cur:
             cur.execute(
@@ -907,52 +2135,94 @@ async def get_dependencies(
         if 'not found' in str(e).lower():
             raise HTTPException(status_code=404, detail=str(e))
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        conn.close()
 
 
 # File Types
 @app.get("/file-types")
 async def list_file_types():
     """List all registered file types."""
-    conn = get_db_connection()
-    try:
-        with conn.cursor() as cur:
-            cur.execute("SELECT id, name FROM file_types ORDER BY name")
-            return cur.fetchall()
-    finally:
-        conn.close()
+    return await run_db(_list_file_types)
+
+
+def _list_file_types(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT id, name FROM file_types ORDER BY name")
+        return cur.fetchall()
 
 
 # Stats
 @app.get("/stats")
 async def get_stats():
     """Get registry statistics."""
-    conn = get_db_connection()
-    try:
-        with conn.cursor() as cur:
-            stats = {}
+    return await run_db(_get_stats)
 
-            cur.execute("SELECT COUNT(*) as count FROM owners")
-            stats['owners'] = cur.fetchone()['count']
 
-            cur.execute("SELECT COUNT(*) as count FROM parameters")
-            stats['parameters'] = cur.fetchone()['count']
+STATS_COUNTERS = ('owners', 'parameters', 'stable_versions', 'dev_versions', 'files', 'dependencies')
 
-            cur.execute("SELECT COUNT(*) as count FROM parameter_versions WHERE is_dev = FALSE")
-            stats['stable_versions'] = cur.fetchone()['count']
 
-            cur.execute("SELECT COUNT(*) as count FROM parameter_versions WHERE is_dev = TRUE")
-            stats['dev_versions'] = cur.fetchone()['count']
+def _get_stats(conn):
+    # Counters are maintained by triggers (init/05_stats.sql); no table scans
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT name, SUM(delta)::BIGINT AS count
+            FROM registry_counters
+            GROUP BY name
+        """)
+        counts = {row['name']: row['count'] for row in cur.fetchall()}
+        return {name: counts.get(name, 0) for name in STATS_COUNTERS}
 
-            cur.execute("SELECT COUNT(*) as count FROM files")
-            stats['files'] = cur.fetchone()['count']
 
-            cur.execute("SELECT COUNT(*) as count FROM parameter_version_dependencies")
-            stats['dependencies'] = cur.fetchone()['count']
+@app.post("/stats/reconcile")
+async def reconcile_stats(repair: bool = Query(True, description="Correct counters that drifted")):
+    """Compare the /stats counters with true row counts (full scans)."""
+    return await run_db(_reconcile_stats, repair)
 
-            return stats
-    finally:
-        conn.close()
+
+def _reconcile_stats(conn, repair: bool = True):
+    with conn.cursor() as cur:
+        cur.execute("SELECT * FROM reconcile_registry_counters(%s)", (repair,))
+        counters = cur.fetchall()
+        return {
+            'consistent': all(c['drift'] == 0 for c in counters),
+            'repaired': repair,
+            'counters': counters,
+        }
 
 
+# Periodic counter reconciliation (seconds between runs; 0 disables)
+STATS_RECONCILE_INTERVAL = float(os.environ.get('STATS_RECONCILE_INTERVAL', 3600))
+
+
+async def reconcile_stats_periodically(interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            result = await run_db(_reconcile_stats, True)
+        except (psycopg2.Error, db.PoolTimeout) as e:
+            print(f"Stats reconciliation failed: {e}")
+            continue
+        drifted = {c['name']: c['drift'] for c in result['counters'] if c['drift']}
+        if drifted:
+            print(f"Stats counters drifted and were repaired: {drifted}")
+
+
+@app.get("/stats/cache")
+async def get_cache_stats():
+    """Get resolve cache statistics."""
+    return resolve_cache.stats()
+
+
+@app.get("/stats/replay")
+async def get_replay_stats():
+    """Get replay log and checkpoint statistics."""
+    stats = await run_blocking(replay_log.stats)
+    stats['checkpoints'] = await run_blocking(snapshot_store.stats)
+    return stats
+
+
+@app.get("/stats/pool")
+async def get_pool_stats():
+    """Get database connection pool statistics."""
+    if db_pool is None:
+        return {"enabled": False, "executor_workers": db_executor_workers}
+    return {"enabled": True, **db_pool.stats(), "executor_workers": db_executor_workers}
@@ -0,0 +1,317 @@
+"""
+Append-only replay log of mutating API requests.
+
+Entries are JSON Lines in numbered segment files under one directory:
+
+    replay/
+        00000001.jsonl
+        00000002.jsonl   <- active segment, appended to
+
+Writers never rewrite existing data. submit() queues a line and returns
+a future that completes once the line is on disk; append() is the
+blocking form. A flusher thread writes every queued line with a single
+write() and fsync(), so concurrent writers share one fsync (group
+commit), and async callers wait on the future without holding a thread.
+The flusher holds an flock on the directory's .lock file while it
+writes, which keeps lines from several API processes whole and in order. A new segment is
+started once the active one reaches the size limit. The log is configured
+from the environment:
+
+    REPLAY_LOG_DIR            segment directory (default: replay/ next to this file)
+    REPLAY_LOG_SEGMENT_BYTES  rotate after this many bytes (default 16 MiB)
+    REPLAY_LOG_FSYNC          0 skips fsync (default 1)
+
+entries() streams the log back one line at a time. A crash can leave a
+torn last line in a segment; it is skipped when read.
+
+A segment number is also a log offset: rotate() starts a fresh segment
+and returns its number, so everything before it is a fixed prefix of the
+log. Checkpoints (checkpoint.py) record that offset with their snapshot,
+replay can start reading from it, and compact() deletes the segments
+before it.
+
+WriterLock extends the API's write gate across processes sharing the
+directory. A process holds .writers shared while it has logged writes in
+flight; a checkpoint or restore holds it exclusive, so it waits for the
+writes of every process. New writers first pass .turnstile, which the
+exclusive holder keeps locked, so writers arriving meanwhile stay out
+instead of keeping .writers shared. Every call is non-blocking; callers
+poll.
+"""
+
+import os
+import json
+import fcntl
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+from concurrent.futures import Future
+
+SEGMENT_SUFFIX = '.jsonl'
+TURNSTILE_FILE = '.turnstile'
+WRITERS_FILE = '.writers'
+
+
+class ReplayLog:
+    """Segmented, group-committed JSON Lines log."""
+
+    def __init__(self, directory: Path, segment_bytes: int = 16 * 1024 * 1024, fsync: bool = True):
+        self.directory = Path(directory)
+        self.segment_bytes = max(segment_bytes, 1)
+        self.fsync = fsync
+        self._cond = threading.Condition()
+        self._pending: list = []      # (encoded line, future) not yet written
+        self._flushing = False
+        self._flusher: threading.Thread | None = None
+
+        # Statistics
+        self._appends = 0
+        self._flushes = 0
+
+    # --- writing ---------------------------------------------------------
+
+    def submit(self, entry: dict) -> Future:
+        """Queue one entry; the future completes once it is written (and fsynced)."""
+        line = (json.dumps(entry, separators=(',', ':')) + '\n').encode('utf-8')
+        future = Future()
+        with self._cond:
+            self._pending.append((line, future))
+            self._appends += 1
+            if self._flusher is None or not self._flusher.is_alive():
+                self._flusher = threading.Thread(target=self._flush_forever, name='replay-log-flush', daemon=True)
+                self._flusher.start()
+            self._cond.notify_all()
+        return future
+
+    def append(self, entry: dict):
+        """Append one entry; returns once it is written (and fsynced)."""
+        self.submit(entry).result()
+
+    def _flush_forever(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending)
+                batch, self._pending = self._pending, []
+                self._flushing = True
+            error = None
+            try:
+                self._write(b''.join(line for line, _ in batch))
+            except Exception as e:
+                error = e
+            with self._cond:
+                self._flushing = False
+                self._flushes += 1
+                self._cond.notify_all()
+            for _, future in batch:
+                if error is None:
+                    future.set_result(None)
+                else:
+                    future.set_exception(OSError(f"Replay log write failed: {error}"))
+
+    @contextmanager
+    def _locked(self):
+        # Exclusive across processes sharing the directory
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.directory / '.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _write(self, data: bytes):
+        with self._locked():
+            segment = self._active_segment(len(data))
+            fd = os.open(segment, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                view = memoryview(data)
+                while view:
+                    view = view[os.write(fd, view):]
+                if self.fsync:
+                    os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def _active_segment(self, incoming: int) -> Path:
+        # Caller holds the directory lock, so no other process is rotating
+        segments = self.segments()
+        if not segments:
+            return self._segment_path(1)
+        last = segments[-1]
+        size = last.stat().st_size
+        if size and size + incoming > self.segment_bytes:
+            return self._segment_path(int(last.stem) + 1)
+        return last
+
+    def _segment_path(self, number: int) -> Path:
+        return self.directory / f"{number:08d}{SEGMENT_SUFFIX}"
+
+    def rotate(self) -> int:
+        """
+        Close the active segment and return the number of the next one.
+        Every entry appended by this process so far is in a segment before
+        the returned offset; later appends go to it or after it.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: not self._flushing and not self._pending)
+            with self._locked():
+                segments = self.segments()
+                if not segments:
+                    return 1
+                last = segments[-1]
+                if last.stat().st_size == 0:
+                    return int(last.stem)
+                following = self._segment_path(int(last.stem) + 1)
+                following.touch()
+                return int(following.stem)
+
+    def compact(self, offset: int) -> int:
+        """Delete the segments before `offset`. Returns how many were deleted."""
+        removed = 0
+        with self._locked():
+            for segment in self.segments()[:-1]:
+                if int(segment.stem) >= offset:
+                    break
+                segment.unlink()
+                removed += 1
+        return removed
+
+    # --- reading ---------------------------------------------------------
+
+    def segments(self) -> list:
+        """Segment files in log order."""
+        if not self.directory.is_dir():
+            return []
+        return sorted(
+            p for p in self.directory.iterdir()
+            if p.suffix == SEGMENT_SUFFIX and p.stem.isdigit()
+        )
+
+    def entries(self, offset: int = 1):
+        """Yield logged entries in order from segment `offset` on, one line at a time."""
+        for segment in self.segments():
+            if int(segment.stem) < offset:
+                continue
+            with open(segment, 'rb') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        # Torn write at the end of a segment after a crash
+                        continue
+
+    def import_legacy(self, path: Path) -> int:
+        """
+        Move the entries of an old replay.json (one JSON array) into the log
+        and rename the file to *.imported. Returns the number of entries moved.
+        """
+        path = Path(path)
+        try:
+            raw = path.read_text()
+        except FileNotFoundError:
+            return 0
+        entries = json.loads(raw) if raw.strip() else []
+        if entries:
+            self._write(b''.join(
+                (json.dumps(e, separators=(',', ':')) + '\n').encode('utf-8') for e in entries
+            ))
+        path.rename(path.with_name(path.name + '.imported'))
+        return len(entries)
+
+    def stats(self) -> dict:
+        segments = self.segments()
+        with self._cond:
+            return {
+                'directory': str(self.directory),
+                'segments': len(segments),
+                'first_segment': int(segments[0].stem) if segments else None,
+                'bytes': sum(p.stat().st_size for p in segments),
+                'segment_bytes': self.segment_bytes,
+                'fsync': self.fsync,
+                'appends': self._appends,
+                'flushes': self._flushes,
+            }
+
+
+def _open_lock_file(directory: Path, name: str):
+    directory.mkdir(parents=True, exist_ok=True)
+    return open(directory / name, 'a')
+
+
+def _try_flock(file, operation: int) -> bool:
+    try:
+        fcntl.flock(file, operation | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+
+class WriterLock:
+    """This process's shared side of the cross-process write gate."""
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self._turnstile = None
+        self._writers = None
+
+    def pass_turnstile(self) -> bool:
+        """False while a checkpoint or restore in any process holds the gate."""
+        if self._turnstile is None:
+            self._turnstile = _open_lock_file(self.directory, TURNSTILE_FILE)
+        if not _try_flock(self._turnstile, fcntl.LOCK_SH):
+            return False
+        fcntl.flock(self._turnstile, fcntl.LOCK_UN)
+        return True
+
+    def share(self) -> bool:
+        """Hold .writers shared for this process's first write in flight."""
+        if self._writers is None:
+            self._writers = _open_lock_file(self.directory, WRITERS_FILE)
+        return _try_flock(self._writers, fcntl.LOCK_SH)
+
+    def unshare(self):
+        """Release .writers once this process has no write in flight."""
+        fcntl.flock(self._writers, fcntl.LOCK_UN)
+
+    def exclusive(self) -> 'ExclusiveHold':
+        return ExclusiveHold(self.directory)
+
+
+class ExclusiveHold:
+    """
+    An exclusive hold on the write gate, taken step by step: the turnstile
+    first, then .writers once every process's writes have drained. Uses its
+    own file descriptors, so it never converts this process's shared lock.
+    Closing it releases both.
+    """
+
+    def __init__(self, directory: Path):
+        self._turnstile = _open_lock_file(directory, TURNSTILE_FILE)
+        self._writers = _open_lock_file(directory, WRITERS_FILE)
+        self._has_turnstile = False
+
+    def try_acquire(self) -> bool:
+        if not self._has_turnstile:
+            self._has_turnstile = _try_flock(self._turnstile, fcntl.LOCK_EX)
+        return self._has_turnstile and _try_flock(self._writers, fcntl.LOCK_EX)
+
+    def close(self):
+        self._writers.close()
+        self._turnstile.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def create_log() -> ReplayLog:
+    """Build the replay log from REPLAY_LOG_* environment variables."""
+    return ReplayLog(
+        Path(os.environ.get('REPLAY_LOG_DIR', Path(__file__).parent / 'replay')),
+        segment_bytes=int(os.environ.get('REPLAY_LOG_SEGMENT_BYTES', str(16 * 1024 * 1024))),
+        fsync=os.environ.get('REPLAY_LOG_FSYNC', '1') != '0',
+    )
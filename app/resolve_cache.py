@@ -0,0 +1,162 @@
+"""
+In-process cache for resolved packages.
+
+Entries are the serialized JSON of a /resolve response plus its ETag, keyed
+by (owner, parameter, selector, file types, manifest-only). The cache is an
+LRU bounded by the total size of the cached payloads:
+
+    RESOLVE_CACHE_MAX_BYTES  payload budget in bytes (default 64 MiB, 0 disables)
+    RESOLVE_CACHE_TTL        seconds a latest/dev entry is served (default 1,
+                             0 keeps them until invalidated)
+
+Integer selectors resolve to immutable stable versions and are only dropped
+by LRU eviction or clear(). `latest` and `dev` entries are dropped by
+invalidate() whenever that parameter is written through this process.
+invalidate() can't see writes made by another API process sharing the
+database, or directly in it, so those entries also expire after the TTL,
+which bounds how stale they can be.
+
+Each parameter has a generation counter that invalidate() bumps. A reader
+takes the generation before querying the database and passes it to put(),
+so a result read before a write committed is never stored after that
+write's invalidation.
+"""
+
+import os
+import time
+import threading
+from collections import Counter, OrderedDict
+
+
+class ResolveCache:
+    """Byte-bounded LRU of resolved package payloads."""
+
+    def __init__(self, max_bytes: int, ttl: float = 1.0):
+        self.max_bytes = max(max_bytes, 0)
+        self.ttl = max(ttl, 0.0)
+        self._entries: OrderedDict = OrderedDict()   # key -> (etag, payload, expiry or None)
+        self._by_parameter: dict = {}                 # (owner, parameter) -> set of keys
+        self._generations: dict = {}                  # (owner, parameter) -> int
+        self._epoch = 0
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        # Statistics
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+        self._stale_puts = 0
+        self._parameter_hits: Counter = Counter()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @staticmethod
+    def key(owner: str, parameter: str, selector: str, filetypes: list | None,
+            manifest: bool = False) -> tuple:
+        return (owner, parameter, selector, tuple(sorted(set(filetypes))) if filetypes else None, manifest)
+
+    def generation(self, owner: str, parameter: str) -> tuple:
+        """Token to pass to put() for a result about to be read from the database."""
+        with self._lock:
+            return (self._epoch, self._generations.get((owner, parameter), 0))
+
+    def get(self, key: tuple):
+        """Return (etag, payload) or None."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] is not None and entry[2] <= time.monotonic():
+                self._remove(key)
+                self._expirations += 1
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            self._parameter_hits[f'{key[0]}/{key[1]}'] += 1
+            return entry[0], entry[1]
+
+    def put(self, key: tuple, generation: tuple, etag: str, payload: bytes) -> bool:
+        """Store a payload unless the parameter was invalidated since `generation` was taken."""
+        size = len(payload)
+        if not self.enabled or size > self.max_bytes:
+            return False
+        owner, parameter = key[0], key[1]
+        with self._lock:
+            if generation != (self._epoch, self._generations.get((owner, parameter), 0)):
+                self._stale_puts += 1
+                return False
+            self._remove(key)
+            expiry = None if key[2].isdigit() or not self.ttl else time.monotonic() + self.ttl
+            self._entries[key] = (etag, payload, expiry)
+            self._by_parameter.setdefault((owner, parameter), set()).add(key)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._evictions += 1
+            return True
+
+    def invalidate(self, owner: str, parameter: str):
+        """Drop the mutable (latest/dev) entries of a parameter after a write."""
+        with self._lock:
+            ident = (owner, parameter)
+            self._generations[ident] = self._generations.get(ident, 0) + 1
+            self._invalidations += 1
+            for key in list(self._by_parameter.get(ident, ())):
+                if not key[2].isdigit():
+                    self._remove(key)
+
+    def clear(self):
+        """Drop everything, including stable entries (e.g. after a bulk reload)."""
+        with self._lock:
+            self._epoch += 1
+            self._generations.clear()
+            self._entries.clear()
+            self._by_parameter.clear()
+            self._bytes = 0
+            self._invalidations += 1
+
+    def _remove(self, key: tuple):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._bytes -= len(entry[1])
+        keys = self._by_parameter.get((key[0], key[1]))
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_parameter[(key[0], key[1])]
+
+    def stats(self, top: int = 10) -> dict:
+        """Point-in-time cache statistics, with the `top` most-hit parameters."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'enabled': self.enabled,
+                'max_bytes': self.max_bytes,
+                'bytes': self._bytes,
+                'entries': len(self._entries),
+                'parameters': len(self._by_parameter),
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else 0.0,
+                'evictions': self._evictions,
+                'expirations': self._expirations,
+                'invalidations': self._invalidations,
+                'stale_puts_dropped': self._stale_puts,
+                'top_parameters': dict(self._parameter_hits.most_common(top)),
+            }
+
+
+def create_cache() -> ResolveCache:
+    """Build the resolve cache from RESOLVE_CACHE_MAX_BYTES and RESOLVE_CACHE_TTL."""
+    return ResolveCache(
+        int(os.environ.get('RESOLVE_CACHE_MAX_BYTES', str(64 * 1024 * 1024))),
+        ttl=float(os.environ.get('RESOLVE_CACHE_TTL', '1')),
+    )
@@ -0,0 +1,71 @@
+"""Shared helpers for the benchmark scripts in this directory."""
+
+import sys
+import json
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent / 'app'
+if str(APP_DIR) not in sys.path:
+    sys.path.insert(0, str(APP_DIR))
+
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile of `values` (0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+def summarize(label: str, latencies: list, elapsed: float, errors: int = 0) -> dict:
+    """Throughput and latency summary (milliseconds) for one benchmark run."""
+    return {
+        'run': label,
+        'requests': len(latencies),
+        'errors': errors,
+        'req/s': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'p50 ms': round(percentile(latencies, 50) * 1000, 2),
+        'p99 ms': round(percentile(latencies, 99) * 1000, 2),
+        'max ms': round(max(latencies) * 1000, 2) if latencies else 0.0,
+    }
+
+
+def print_table(rows: list):
+    """Print a list of dicts as an aligned text table."""
+    if not rows:
+        return
+    headers = list(rows[0].keys())
+    widths = {h: max(len(str(h)), *(len(str(r.get(h, ''))) for r in rows)) for h in headers}
+    print('  '.join(str(h).ljust(widths[h]) for h in headers))
+    print('  '.join('-' * widths[h] for h in headers))
+    for row in rows:
+        print('  '.join(str(row.get(h, '')).ljust(widths[h]) for h in headers))
+
+
+class Timer:
+    """Context manager measuring wall-clock seconds in `.elapsed`."""
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+
+
+def http(method: str, url: str, body: dict | None = None, headers: dict | None = None,
+         timeout: float = 60.0) -> tuple:
+    """Issue an HTTP request; returns (status, headers, body bytes) without raising on 4xx/5xx."""
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(url, data=data, method=method, headers=dict(headers or {}))
+    if data is not None:
+        req.add_header('Content-Type', 'application/json')
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return resp.status, dict(resp.headers), resp.read()
+    except urllib.error.HTTPError as e:
+        return e.code, dict(e.headers), e.read()
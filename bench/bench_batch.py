@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Batch resolve benchmark - N sequential GET /resolve vs one POST /resolve/batch.
+
+Picks --size packages from GET /parameters (the way the IDE loads a board
+configuration) and resolves them --rounds times each way, reporting the
+wall-clock time of one full round.
+
+The resolve cache would answer most of both runs from memory, so start the
+API with the cache disabled to measure the database work:
+
+    RESOLVE_CACHE_MAX_BYTES=0 uvicorn main:app --port 8000
+    python bench/bench_batch.py --api http://localhost:8000
+
+Usage:
+    python bench/bench_batch.py [--api URL] [--size N] [--rounds N] [--selector latest]
+"""
+
+import argparse
+import json
+import time
+
+from _common import http, print_table, summarize
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare sequential resolves with one batch resolve')
+    parser.add_argument('--api', default='http://localhost:8000')
+    parser.add_argument('--size', type=int, default=40, help='Packages per round')
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--selector', default='latest')
+    args = parser.parse_args()
+
+    status, _, body = http('GET', f"{args.api}/parameters")
+    if status != 200:
+        raise SystemExit(f"GET /parameters failed ({status})")
+    params = [p for p in json.loads(body) if p['versions']][:args.size]
+    queries = [f"{p['owner']}/{p['name']}:{args.selector}" for p in params]
+
+    status, _, body = http('GET', f"{args.api}/stats/cache")
+    if status == 200 and json.loads(body).get('enabled'):
+        print("note: resolve cache is enabled; results mostly measure cache hits\n")
+
+    sequential, errors = [], 0
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        round_start = time.perf_counter()
+        for q in queries:
+            status, _, _ = http('GET', f"{args.api}/resolve/{q}")
+            errors += status != 200
+        sequential.append(time.perf_counter() - round_start)
+    rows = [summarize(f'{len(queries)} x GET /resolve', sequential, time.perf_counter() - start, errors)]
+
+    batched, errors = [], 0
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        round_start = time.perf_counter()
+        status, _, body = http('POST', f"{args.api}/resolve/batch", {'queries': queries})
+        if status != 200:
+            errors += 1
+        else:
+            errors += sum(r['status'] != 200 for r in json.loads(body)['results'])
+        batched.append(time.perf_counter() - round_start)
+    rows.append(summarize(f'1 x POST /resolve/batch ({len(queries)})', batched,
+                          time.perf_counter() - start, errors))
+
+    # 'requests' and 'req/s' count rounds here; latencies are per round
+    print_table(rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Event-loop blocking benchmark - /resolve latency while a slow /publish runs.
+
+Measures GET /resolve latency from several client threads twice: once on an
+idle server, and once while a POST /publish is stuck behind a table lock held
+by this script for --hold seconds. If database calls block the event loop,
+every resolve issued during the hold stalls with the publish and p99 climbs
+to roughly the hold time.
+
+Writes to the registry (creates owner 'bench' and parameter 'bench/SlowPublish'),
+so run it against a disposable database:
+
+    POSTGRES_HOST=localhost POSTGRES_PORT=5455 python bench/bench_concurrency.py --api http://localhost:8000
+
+Usage:
+    python bench/bench_concurrency.py [--api URL] [--threads N] [--hold SECONDS] [--query owner/name:selector]
+"""
+
+import argparse
+import threading
+import time
+
+from _common import Timer, http, print_table, summarize
+
+import db
+
+
+def measure_resolves(label: str, url: str, threads: int, duration: float) -> dict:
+    latencies: list = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker():
+        local = []
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            status, _, _ = http('GET', url)
+            if status != 200:
+                with lock:
+                    errors[0] += 1
+                continue
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    with Timer() as t:
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+    return summarize(label, latencies, t.elapsed, errors[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure /resolve p99 while a slow /publish runs')
+    parser.add_argument('--api', default='http://localhost:8000')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--hold', type=float, default=5.0, help='Seconds the publish is held up')
+    parser.add_argument('--query', default='evezor/Parameter:latest')
+    args = parser.parse_args()
+
+    resolve_url = f"{args.api}/resolve/{args.query}"
+
+    # Scratch parameter with pending dev changes so the publish has work to do
+    http('POST', f"{args.api}/owners", {'username': 'bench'})
+    http('POST', f"{args.api}/parameters/bench/SlowPublish")
+    status, _, body = http('POST', f"{args.api}/parameters/bench/SlowPublish/file-versions",
+                           {'files': [{'file_type': 'py', 'content': f'# {time.time()}'}]})
+    if status != 200:
+        raise SystemExit(f"Setup failed ({status}): {body.decode()}")
+
+    rows = [measure_resolves('idle server', resolve_url, args.threads, args.hold)]
+
+    # Block publish_parameter's INSERT INTO parameter_versions; reads stay unblocked
+    blocker = db.connect()
+    with blocker.cursor() as cur:
+        cur.execute("LOCK TABLE parameter_versions IN EXCLUSIVE MODE")
+
+    publish_result = {}
+
+    def publish():
+        start = time.perf_counter()
+        status, _, _ = http('POST', f"{args.api}/parameters/bench/SlowPublish/publish")
+        publish_result.update(status=status, seconds=round(time.perf_counter() - start, 2))
+
+    def release():
+        time.sleep(args.hold)
+        blocker.rollback()
+        blocker.close()
+
+    # Release on a timer, not after measuring: a blocked event loop would
+    # otherwise hold up the resolves that the release is waiting on
+    releaser = threading.Thread(target=release)
+    publisher = threading.Thread(target=publish)
+    publisher.start()
+    time.sleep(0.2)  # let the publish reach the lock
+    releaser.start()
+    rows.append(measure_resolves('during slow publish', resolve_url, args.threads, args.hold))
+    releaser.join()
+    publisher.join()
+
+    print_table(rows)
+    print(f"\npublish: {publish_result}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Write contention benchmark - concurrent publishes and file-version pushes.
+
+Fires --requests write requests from --threads client threads, alternating
+POST .../file-versions and POST .../publish, first all at one parameter
+(bench/Contended0) and then spread over --params parameters. Reports
+throughput, tail latency and errors (5xx and failed connections) for each.
+A publish answered 400 because another publish already took the dev
+changes is a valid outcome, not an error; those are counted separately.
+
+Without per-parameter locking, concurrent writers of one parameter race
+for the same next version number and lose on the unique indexes (500).
+
+Writes to the registry (creates owner 'bench' and parameters
+'bench/ContendedN'), so run it against a disposable database:
+
+    python bench/bench_contention.py --api http://localhost:8000
+
+Usage:
+    python bench/bench_contention.py [--api URL] [--threads N] [--requests N] [--params N]
+"""
+
+import argparse
+import itertools
+import threading
+import time
+
+from _common import Timer, http, print_table, summarize
+
+
+def measure_writes(label: str, api: str, names: list, threads: int, requests: int) -> dict:
+    latencies: list = []
+    errors = [0]
+    nothing_to_publish = [0]
+    lock = threading.Lock()
+    counter = itertools.count()
+
+    def worker():
+        local = []
+        while (i := next(counter)) < requests:
+            name = names[i % len(names)]
+            start = time.perf_counter()
+            if (i // len(names)) % 2 == 0:
+                status, _, _ = http('POST', f"{api}/parameters/bench/{name}/file-versions",
+                                    {'files': [{'file_type': 'py', 'content': f'# {label} {i}'}]})
+            else:
+                status, _, _ = http('POST', f"{api}/parameters/bench/{name}/publish")
+            elapsed = time.perf_counter() - start
+            with lock:
+                if status == 400:
+                    nothing_to_publish[0] += 1
+                elif status != 200:
+                    errors[0] += 1
+                    continue
+            local.append(elapsed)
+        with lock:
+            latencies.extend(local)
+
+    with Timer() as t:
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+    row = summarize(label, latencies, t.elapsed, errors[0])
+    row['nothing to publish'] = nothing_to_publish[0]
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure concurrent publish and file-version writes')
+    parser.add_argument('--api', default='http://localhost:8000')
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=400, help='Write requests per run')
+    parser.add_argument('--params', type=int, default=50, help='Parameters in the spread-out run')
+    args = parser.parse_args()
+
+    names = [f"Contended{i}" for i in range(args.params)]
+    http('POST', f"{args.api}/owners", {'username': 'bench'})
+    for name in names:
+        http('POST', f"{args.api}/parameters/bench/{name}")
+
+    rows = [
+        measure_writes('one parameter', args.api, names[:1], args.threads, args.requests),
+        measure_writes(f'{args.params} parameters', args.api, names, args.threads, args.requests),
+    ]
+    print_table(rows)
+
+
+if __name__ == '__main__':
+    main()
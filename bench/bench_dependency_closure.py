@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Dependency tree benchmark - recursive CTE vs materialized closure.
+
+Builds synthetic layered graphs under owner 'bench': DEPTH layers of
+WIDTH parameters (one stable v1 each), where every version depends on
+every parameter in the next layer. Each version is reached by WIDTH
+paths from the layer above, so the number of paths from the root grows
+as WIDTH ** DEPTH. Then times the full dependency tree of the root three
+ways:
+
+  - legacy recursive CTE: the previous resolve_dependency_tree, which
+                          follows every path (to depth 50) and DISTINCTs
+  - closure table:        resolve_dependency_tree reading the root's rows
+                          from parameter_version_closure
+  - BFS fallback:         resolve_dependency_tree with the root's closure
+                          rows removed, as for a closure that reaches dev
+
+Shapes whose path count exceeds --max-paths skip the legacy run.
+Writes to the registry, so run it against a disposable database:
+
+    POSTGRES_HOST=localhost POSTGRES_PORT=5455 python bench/bench_dependency_closure.py
+
+Usage:
+    python bench/bench_dependency_closure.py [--repeat N] [--shapes 2x8,3x10,1x40,4x30] [--max-paths N]
+"""
+
+import time
+import argparse
+
+from _common import print_table, summarize
+
+import db
+
+
+def ensure_graph(conn, width: int, depth: int) -> str:
+    """Create the WIDTHxDEPTH graph if needed and materialize its closures; returns the root's name."""
+    prefix = f"Closure{width}x{depth}"
+    root = f"{prefix}L0N0"
+    with conn.cursor() as cur:
+        cur.execute("INSERT INTO owners (username) VALUES ('bench') ON CONFLICT DO NOTHING")
+        cur.execute("""
+            INSERT INTO parameters (owner_id, name)
+            SELECT o.id, %(prefix)s || 'L' || l || 'N' || n
+            FROM owners o, generate_series(0, %(depth)s - 1) l, generate_series(0, %(width)s - 1) n
+            WHERE o.username = 'bench'
+            ON CONFLICT DO NOTHING
+        """, {'prefix': prefix, 'width': width, 'depth': depth})
+        cur.execute("""
+            INSERT INTO parameter_versions (parameter_id, version, is_dev)
+            SELECT p.id, 1, FALSE
+            FROM parameters p JOIN owners o ON o.id = p.owner_id
+            WHERE o.username = 'bench' AND p.name LIKE %s || 'L%%'
+            ON CONFLICT DO NOTHING
+        """, (prefix,))
+        # The graph is acyclic by construction; skip the per-row cycle walk
+        cur.execute("SET LOCAL registry.defer_cycle_check = on")
+        cur.execute("""
+            INSERT INTO parameter_version_dependencies
+                (parameter_version_id, depends_on_parameter_id, depends_on_version,
+                 depends_on_is_dev, original_selector)
+            SELECT pv.id, dep.id, 1, FALSE, '1'
+            FROM generate_series(0, %(depth)s - 2) l
+            CROSS JOIN generate_series(0, %(width)s - 1) n
+            CROSS JOIN generate_series(0, %(width)s - 1) m
+            JOIN owners o ON o.username = 'bench'
+            JOIN parameters p ON p.owner_id = o.id AND p.name = %(prefix)s || 'L' || l || 'N' || n
+            JOIN parameter_versions pv ON pv.parameter_id = p.id AND pv.version = 1
+            JOIN parameters dep ON dep.owner_id = o.id AND dep.name = %(prefix)s || 'L' || (l + 1) || 'N' || m
+            ON CONFLICT DO NOTHING
+        """, {'prefix': prefix, 'width': width, 'depth': depth})
+        cur.execute("SET LOCAL registry.defer_cycle_check = off")
+        # Bottom-up, so no single call recurses through the whole graph
+        cur.execute("""
+            SELECT materialize_dependency_closure(pv.id)
+            FROM generate_series(%(depth)s - 1, 0, -1) l
+            JOIN owners o ON o.username = 'bench'
+            JOIN parameters p ON p.owner_id = o.id AND p.name LIKE %(prefix)s || 'L' || l || 'N%%'
+            JOIN parameter_versions pv ON pv.parameter_id = p.id AND pv.version = 1
+            ORDER BY l DESC
+        """, {'prefix': prefix, 'depth': depth})
+    conn.commit()
+    return root
+
+
+def legacy_dependency_tree(conn, owner: str, name: str):
+    with conn.cursor() as cur:
+        cur.execute("""
+            WITH RECURSIVE dep_tree AS (
+                SELECT 0 AS depth, %(owner)s::text AS owner, %(name)s::text AS parameter,
+                       pv.version, pv.is_dev, pv.id AS param_version_id
+                FROM parameter_versions pv
+                WHERE pv.id = resolve_parameter_version(resolve_parameter(%(owner)s, %(name)s), 'latest')
+
+                UNION ALL
+
+                SELECT
+                    dt.depth + 1,
+                    o.username,
+                    p.name,
+                    pvd.depends_on_version,
+                    pvd.depends_on_is_dev,
+                    CASE
+                        WHEN pvd.depends_on_is_dev THEN
+                            (SELECT pv2.id FROM parameter_versions pv2
+                             WHERE pv2.parameter_id = pvd.depends_on_parameter_id AND pv2.is_dev = TRUE)
+                        ELSE
+                            (SELECT pv2.id FROM parameter_versions pv2
+                             WHERE pv2.parameter_id = pvd.depends_on_parameter_id
+                               AND pv2.version = pvd.depends_on_version AND pv2.is_dev = FALSE)
+                    END
+                FROM dep_tree dt
+                JOIN parameter_version_dependencies pvd
+                    ON pvd.parameter_version_id = dt.param_version_id
+                JOIN parameters p ON p.id = pvd.depends_on_parameter_id
+                JOIN owners o ON o.id = p.owner_id
+                WHERE dt.depth < 50
+            )
+            SELECT DISTINCT depth, owner, parameter, version, is_dev
+            FROM dep_tree
+            ORDER BY depth, owner, parameter
+        """, {'owner': owner, 'name': name})
+        return cur.fetchall()
+
+
+def dependency_tree(conn, owner: str, name: str):
+    with conn.cursor() as cur:
+        cur.execute("SELECT * FROM resolve_dependency_tree(%s, %s, 'latest')", (owner, name))
+        return cur.fetchall()
+
+
+def drop_root_closure(conn, owner: str, name: str):
+    """Remove the root's closure rows in the open transaction (rolled back by the caller)."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            DELETE FROM parameter_version_closure
+            WHERE ancestor_id = resolve_parameter_version(resolve_parameter(%s, %s), 'latest')
+        """, (owner, name))
+
+
+def timed(label: str, fn, repeat: int) -> dict:
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - t)
+    return summarize(label, latencies, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time full dependency tree queries on synthetic graphs')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--shapes', default='2x8,3x10,1x40,4x30', help='WIDTHxDEPTH graphs')
+    parser.add_argument('--max-paths', type=int, default=200000, help='Skip the legacy run above this many paths')
+    args = parser.parse_args()
+
+    conn = db.connect()
+    rows = []
+    try:
+        for shape in args.shapes.split(','):
+            width, depth = (int(x) for x in shape.split('x'))
+            root = ensure_graph(conn, width, depth)
+            paths = sum(width ** level for level in range(min(depth, 51)))
+
+            if paths <= args.max_paths:
+                rows.append(timed(f"{shape:>5} legacy recursive CTE", lambda: legacy_dependency_tree(conn, 'bench', root), args.repeat))
+            rows.append(timed(f"{shape:>5} closure table", lambda: dependency_tree(conn, 'bench', root), args.repeat))
+            drop_root_closure(conn, 'bench', root)
+            rows.append(timed(f"{shape:>5} BFS fallback", lambda: dependency_tree(conn, 'bench', root), args.repeat))
+            conn.rollback()
+    finally:
+        conn.close()
+
+    print_table(rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+File version write benchmark - per-file statements vs one set-based write.
+
+Creates parameter bench/FileVersions, then times adding a batch of 1, 8
+and 100 dev file versions (cycling through the file types) two ways:
+
+  - legacy per-file: the previous create_dev_file_versions, a file type
+                     lookup, latest version query, insert and mapping
+                     upsert per file
+  - set-based:       file_versions.create_dev_file_versions, one statement
+                     per batch with cached file type ids
+
+Each batch is rolled back, so every run writes on top of the same history.
+Writes to the registry, so run it against a disposable database:
+
+    POSTGRES_HOST=localhost POSTGRES_PORT=5455 python bench/bench_file_versions.py
+
+Usage:
+    python bench/bench_file_versions.py [--repeat N] [--sizes 1,8,100]
+"""
+
+import time
+import argparse
+
+from _common import print_table, summarize
+
+import db
+import file_versions
+
+
+def ensure_parameter(conn, name: str) -> int:
+    with conn.cursor() as cur:
+        cur.execute("INSERT INTO owners (username) VALUES ('bench') ON CONFLICT DO NOTHING")
+        cur.execute("""
+            INSERT INTO parameters (owner_id, name)
+            SELECT id, %s FROM owners WHERE username = 'bench'
+            ON CONFLICT DO NOTHING
+        """, (name,))
+        cur.execute("""
+            SELECT p.id FROM parameters p JOIN owners o ON o.id = p.owner_id
+            WHERE o.username = 'bench' AND p.name = %s
+        """, (name,))
+        pid = cur.fetchone()['id']
+    conn.commit()
+    return pid
+
+
+def legacy_create_dev_file_versions(conn, parameter_id: int, files: list) -> list:
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT id FROM parameter_versions
+            WHERE parameter_id = %s AND is_dev = TRUE
+        """, (parameter_id,))
+        dev_version = cur.fetchone()
+        if not dev_version:
+            cur.execute("""
+                INSERT INTO parameter_versions (parameter_id, is_dev)
+                VALUES (%s, TRUE)
+                RETURNING id
+            """, (parameter_id,))
+            dev_version = cur.fetchone()
+
+        created = []
+        for file in files:
+            cur.execute("SELECT id FROM file_types WHERE name = %s", (file.file_type,))
+            file_type_id = cur.fetchone()['id']
+            cur.execute("""
+                SELECT version, path FROM files
+                WHERE parameter_id = %s AND file_type_id = %s
+                ORDER BY version DESC LIMIT 1
+            """, (parameter_id, file_type_id))
+            current = cur.fetchone()
+            new_version = current['version'] + 1 if current else 1
+            path = current['path'] if current else (file.path or file.file_type)
+            cur.execute("""
+                INSERT INTO files (parameter_id, file_type_id, version, path, content_hash, change_note)
+                VALUES (%s, %s, %s, %s, store_blob(%s), %s)
+            """, (parameter_id, file_type_id, new_version, path, file.content, file.change_note))
+            cur.execute("""
+                INSERT INTO parameter_version_files (parameter_version_id, file_type_id, file_version)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (parameter_version_id, file_type_id)
+                DO UPDATE SET file_version = EXCLUDED.file_version
+            """, (dev_version['id'], file_type_id, new_version))
+            created.append({"file_type": file.file_type, "new_version": new_version, "path": path})
+        return created
+
+
+def make_batch(file_types: list, size: int) -> list:
+    # Fresh content each time, so store_blob writes a blob per file
+    stamp = time.perf_counter_ns()
+    return [
+        file_versions.NewFile(file_types[i % len(file_types)], f"bench {stamp} {i}\n", "bench")
+        for i in range(size)
+    ]
+
+
+def timed(label: str, conn, fn, file_types: list, size: int, repeat: int) -> dict:
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        batch = make_batch(file_types, size)
+        t = time.perf_counter()
+        fn(batch)
+        latencies.append(time.perf_counter() - t)
+        conn.rollback()
+    return summarize(label, latencies, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time dev file version writes by batch size')
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--sizes', default='1,8,100')
+    args = parser.parse_args()
+
+    conn = db.connect()
+    rows = []
+    try:
+        pid = ensure_parameter(conn, 'FileVersions')
+        with conn.cursor() as cur:
+            cur.execute("SELECT name FROM file_types ORDER BY id")
+            file_types = [row['name'] for row in cur.fetchall()]
+        conn.rollback()
+
+        for size in (int(s) for s in args.sizes.split(',')):
+            legacy = lambda batch: legacy_create_dev_file_versions(conn, pid, batch)  # noqa: E731
+            set_based = lambda batch: file_versions.create_dev_file_versions(conn, pid, batch)  # noqa: E731
+            rows.append(timed(f"{size:>3} files, legacy per-file", conn, legacy, file_types, size, args.repeat))
+            rows.append(timed(f"{size:>3} files, set-based", conn, set_based, file_types, size, args.repeat))
+    finally:
+        conn.close()
+
+    print_table(rows)
+
+
+if __name__ == '__main__':
+    main()
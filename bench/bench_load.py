@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Loader benchmark - row-by-row load_parameters vs the bulk COPY loader.
+
+Times both loaders on the bundled app/Parameters tree, then on a synthetic
+tree of --params parameter directories written to a temporary directory
+(eight files each and dependencies shaped like the real ones). The
+row-by-row loader issues a few statements per file, so on the synthetic
+tree it only runs over the first --legacy-max parameters. The bulk loader
+runs on that same subset too, for a like-for-like comparison.
+
+Every load runs in its own transaction and is rolled back, so the registry
+is left untouched:
+
+    POSTGRES_HOST=localhost POSTGRES_PORT=5455 python bench/bench_load.py
+
+Usage:
+    python bench/bench_load.py [--params 50000] [--legacy-max 2000] [--workers 8] [--seed 1]
+"""
+
+import io
+import time
+import random
+import argparse
+import tempfile
+import contextlib
+from pathlib import Path
+
+from _common import APP_DIR, print_table
+
+import load_parameters as loader
+
+LIBRARIES = 20
+ENVIRONMENTS = '{\n  "esp32": {"baud": 115200},\n  "rp2040": {"baud": 115200}\n}\n'
+
+
+def write_synthetic_tree(root: Path, count: int, rng: random.Random) -> list:
+    """Write `count` parameter directories under root; returns their paths."""
+    root.mkdir()
+    dirs = []
+    for i in range(count):
+        name = f"Synth{i:05d}"
+        d = root / name
+        d.mkdir()
+        # Shaped like the bundled tree: everything depends on one base
+        # parameter, and some also on one of a handful of libraries
+        deps = []
+        if i:
+            deps.append('Synth00000')
+        if i > LIBRARIES and rng.random() < 0.2:
+            deps.append(f"Synth{rng.randint(1, LIBRARIES):05d}")
+        (d / f"{name}.py").write_text(
+            f"class {name}:\n    def __init__(self, pin={i % 40}):\n        self.pin = pin\n" * 4
+        )
+        (d / f"{name}.json").write_text(f'{{"name": "{name}", "pin": {i % 40}}}\n')
+        (d / 'README.md').write_text(f"# {name}\n\nSynthetic parameter {i} for load benchmarks.\n")
+        (d / 'dependencies.txt').write_text(''.join(f"{dep}\n" for dep in deps))
+        (d / 'requirements.txt').write_text('machine\n')
+        (d / 'environments.json').write_text(ENVIRONMENTS)
+        (d / 'html.html').write_text(f'<div class="param">{name}</div>\n')
+        (d / 'js.js').write_text(f"export const name = '{name}';\n")
+        dirs.append(d)
+    return dirs
+
+
+def subset_tree(root: Path, dirs: list) -> Path:
+    """A directory of symlinks to the given parameter directories."""
+    root.mkdir()
+    for d in dirs:
+        (root / d.name).symlink_to(d, target_is_directory=True)
+    return root
+
+
+def timed_load(label: str, load, parameters_dir: Path, owner: str, **kwargs) -> dict:
+    conn = loader.get_db_connection()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            load(parameters_dir, owner, conn=conn, **kwargs)
+            elapsed = time.perf_counter() - start
+    finally:
+        conn.rollback()
+        conn.close()
+    params = sum(1 for p in parameters_dir.iterdir() if p.is_dir())
+    return {
+        'run': label,
+        'parameters': params,
+        'seconds': round(elapsed, 2),
+        'params/s': round(params / elapsed, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the row-by-row and bulk parameter loaders')
+    parser.add_argument('--params', type=int, default=50000)
+    parser.add_argument('--legacy-max', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    bundled = APP_DIR / 'Parameters'
+    rows = [
+        timed_load('row-by-row, app/Parameters', loader.load_parameters, bundled, 'bench_load'),
+        timed_load('bulk, app/Parameters', loader.load_parameters_bulk, bundled, 'bench_load',
+                   workers=args.workers),
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        t = time.perf_counter()
+        dirs = write_synthetic_tree(tmp / 'synthetic', args.params, rng)
+        print(f"wrote {len(dirs)} synthetic parameters in {time.perf_counter() - t:.1f}s\n")
+        subset = subset_tree(tmp / 'subset', dirs[:args.legacy_max])
+
+        rows.append(timed_load(f'row-by-row, synthetic {len(dirs[:args.legacy_max])}',
+                               loader.load_parameters, subset, 'bench_load'))
+        rows.append(timed_load(f'bulk, synthetic {len(dirs[:args.legacy_max])}',
+                               loader.load_parameters_bulk, subset, 'bench_load', workers=args.workers))
+        rows.append(timed_load(f'bulk, synthetic {len(dirs)}',
+                               loader.load_parameters_bulk, tmp / 'synthetic', 'bench_load',
+                               workers=args.workers))
+
+    print_table(rows)
+
+
+if __name__ == '__main__':
+    main()
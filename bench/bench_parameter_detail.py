@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Parameter detail benchmark - N+1 version lookups vs one aggregated query.
+
+Creates parameters bench/Versions1, bench/Versions100 and bench/Versions10000
+with that many stable versions (each mapping every file type), then times
+listing all of their versions three ways:
+
+  - legacy N+1: the previous get_parameter, one mapping query per version
+  - aggregated: main._get_parameter fetching every version in one query
+  - API page:   GET /parameters/bench/VersionsN (first page, default limit)
+
+Writes to the registry, so run it against a disposable database:
+
+    POSTGRES_HOST=localhost POSTGRES_PORT=5455 python bench/bench_parameter_detail.py
+
+Usage:
+    python bench/bench_parameter_detail.py [--api URL] [--repeat N] [--sizes 1,100,10000]
+"""
+
+import os
+import time
+import argparse
+
+from _common import APP_DIR, http, print_table, summarize
+
+import db
+
+# main mounts its static and template directories relative to the working directory
+os.chdir(APP_DIR)
+import main as api  # noqa: E402
+
+
+def ensure_parameter(conn, name: str, versions: int):
+    with conn.cursor() as cur:
+        cur.execute("INSERT INTO owners (username) VALUES ('bench') ON CONFLICT DO NOTHING")
+        cur.execute("""
+            INSERT INTO parameters (owner_id, name)
+            SELECT id, %s FROM owners WHERE username = 'bench'
+            ON CONFLICT DO NOTHING
+        """, (name,))
+        cur.execute("""
+            SELECT p.id FROM parameters p JOIN owners o ON o.id = p.owner_id
+            WHERE o.username = 'bench' AND p.name = %s
+        """, (name,))
+        pid = cur.fetchone()['id']
+        cur.execute("""
+            INSERT INTO parameter_versions (parameter_id, version, is_dev)
+            SELECT %s, v, FALSE FROM generate_series(1, %s) v
+            ON CONFLICT DO NOTHING
+        """, (pid, versions))
+        cur.execute("""
+            INSERT INTO parameter_version_files (parameter_version_id, file_type_id, file_version)
+            SELECT pv.id, ft.id, pv.version
+            FROM parameter_versions pv CROSS JOIN file_types ft
+            WHERE pv.parameter_id = %s
+            ON CONFLICT DO NOTHING
+        """, (pid,))
+    conn.commit()
+
+
+def legacy_get_parameter(conn, owner: str, name: str):
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT p.id, o.username as owner, p.name, p.description
+            FROM parameters p
+            JOIN owners o ON o.id = p.owner_id
+            WHERE o.username = %s AND p.name = %s
+        """, (owner, name))
+        param = cur.fetchone()
+        cur.execute("""
+            SELECT pv.id, pv.version, pv.is_dev
+            FROM parameter_versions pv
+            WHERE pv.parameter_id = %s
+            ORDER BY pv.is_dev, pv.version
+        """, (param['id'],))
+        versions = []
+        for v in cur.fetchall():
+            cur.execute("""
+                SELECT ft.name as file_type, pvf.file_version
+                FROM parameter_version_files pvf
+                JOIN file_types ft ON ft.id = pvf.file_type_id
+                WHERE pvf.parameter_version_id = %s
+            """, (v['id'],))
+            versions.append({
+                'version': v['version'],
+                'is_dev': v['is_dev'],
+                'file_mappings': {row['file_type']: row['file_version'] for row in cur.fetchall()}
+            })
+        return {**param, 'versions': versions}
+
+
+def timed(label: str, fn, repeat: int) -> dict:
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - t)
+    return summarize(label, latencies, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time parameter detail lookups by version count')
+    parser.add_argument('--api', default='http://localhost:8000')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--sizes', default='1,100,10000')
+    args = parser.parse_args()
+
+    conn = db.connect()
+    rows = []
+    try:
+        for size in (int(s) for s in args.sizes.split(',')):
+            name = f"Versions{size}"
+            ensure_parameter(conn, name, size)
+            repeat = max(1, args.repeat // 10) if size >= 10000 else args.repeat
+
+            rows.append(timed(f"{size:>5} versions, legacy N+1", lambda: legacy_get_parameter(conn, 'bench', name), repeat))
+            rows.append(timed(f"{size:>5} versions, aggregated", lambda: api._get_parameter(conn, 'bench', name, size), repeat))
+            rows.append(timed(f"{size:>5} versions, API page", lambda: http('GET', f"{args.api}/parameters/bench/{name}"), repeat))
+            conn.rollback()
+    finally:
+        conn.close()
+
+    print_table(rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Connection pool benchmark - connect-per-request vs pooled connections.
+
+Runs the same resolve query from a number of worker threads for a fixed
+duration, once opening a fresh connection per request (the pre-pool
+behaviour) and once borrowing connections from db.ConnectionPool, and
+reports requests per second and latency for both.
+
+Uses the POSTGRES_* environment variables, e.g. against docker-compose:
+
+    POSTGRES_HOST=localhost POSTGRES_PORT=5455 python bench/bench_pool.py
+
+Usage:
+    python bench/bench_pool.py [--threads N] [--duration SECONDS] [--query owner/name:selector]
+"""
+
+import argparse
+import threading
+import time
+
+from _common import Timer, print_table, summarize
+
+import db
+
+
+def run(label: str, acquire, release, query: tuple, threads: int, duration: float) -> dict:
+    latencies: list = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker():
+        local = []
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                conn = acquire()
+                try:
+                    with conn.cursor() as cur:
+                        cur.execute("SELECT * FROM resolve_package(%s, %s, %s)", query)
+                        cur.fetchall()
+                    conn.rollback()
+                finally:
+                    release(conn)
+            except Exception:
+                with lock:
+                    errors[0] += 1
+                continue
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    with Timer() as t:
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+    return summarize(label, latencies, t.elapsed, errors[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark pooled vs per-request connections')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--pool-size', type=int, default=8)
+    parser.add_argument('--query', default='evezor/Parameter:latest')
+    args = parser.parse_args()
+
+    owner, rest = args.query.split('/', 1)
+    name, _, selector = rest.partition(':')
+    query = (owner, name, selector or 'latest')
+
+    rows = [run('connect-per-request', db.connect, lambda conn: conn.close(),
+                query, args.threads, args.duration)]
+
+    pool = db.ConnectionPool(min(2, args.pool_size), args.pool_size, 30.0, **db.connection_params())
+    pool.prewarm()
+    try:
+        rows.append(run(f'pool (max {args.pool_size})', pool.getconn, pool.putconn,
+                        query, args.threads, args.duration))
+    finally:
+        print(pool.stats())
+        pool.close()
+
+    print_table(rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Replay log benchmark - rewrite-the-whole-file replay.json vs the segmented log.
+
+Appends --entries file-version records (the shape POST .../file-versions
+logs) in a temporary directory three ways:
+
+  - legacy:      read, parse and rewrite replay.json with indent=2 per entry
+  - log, 1 writer:  ReplayLog.append with fsync, one thread
+  - log, N writers: ReplayLog.append with fsync, --threads threads sharing fsyncs
+  - log, async:     ReplayLog.submit from --threads asyncio tasks, as log_replay does
+
+The legacy writer is quadratic, so it is only run up to --legacy-max entries.
+Does not touch the database.
+
+Usage:
+    python bench/bench_replay_log.py [--entries 2000] [--threads 16] [--legacy-max 2000]
+"""
+
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+
+from _common import print_table, summarize
+
+import replay_log
+
+
+def entry(i: int) -> dict:
+    return {
+        'timestamp': '2026-01-01T00:00:00+00:00',
+        'method': 'POST',
+        'path': f'/parameters/bench/P{i % 50}/file-versions',
+        'body': {'files': [{'file_type': 'py', 'content': 'x = 1\n' * 20, 'change_note': None}]},
+    }
+
+
+def legacy_append(path: Path, record: dict):
+    # The previous log_replay: load everything, append, rewrite everything
+    try:
+        raw = path.read_text()
+        entries = json.loads(raw) if raw.strip() else []
+    except (FileNotFoundError, json.JSONDecodeError):
+        entries = []
+    entries.append(record)
+    path.write_text(json.dumps(entries, indent=2))
+
+
+def run_legacy(directory: Path, count: int) -> dict:
+    path = directory / 'replay.json'
+    latencies = []
+    start = time.perf_counter()
+    for i in range(count):
+        t = time.perf_counter()
+        legacy_append(path, entry(i))
+        latencies.append(time.perf_counter() - t)
+    return summarize(f'legacy replay.json ({count})', latencies, time.perf_counter() - start)
+
+
+def run_log(directory: Path, count: int, threads: int) -> dict:
+    log = replay_log.ReplayLog(directory)
+    latencies, lock = [], threading.Lock()
+
+    def worker(n: int, offset: int):
+        local = []
+        for i in range(n):
+            t = time.perf_counter()
+            log.append(entry(offset + i))
+            local.append(time.perf_counter() - t)
+        with lock:
+            latencies.extend(local)
+
+    per_thread = count // threads
+    workers = [threading.Thread(target=worker, args=(per_thread, k * per_thread)) for k in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+    stats = log.stats()
+    label = f"log, {threads} writer{'s' if threads > 1 else ''} ({stats['flushes']} fsyncs)"
+    return summarize(label, latencies, elapsed)
+
+
+def run_log_async(directory: Path, count: int, tasks: int) -> dict:
+    log = replay_log.ReplayLog(directory)
+    latencies = []
+
+    async def writer(n: int, offset: int):
+        for i in range(n):
+            t = time.perf_counter()
+            await asyncio.wrap_future(log.submit(entry(offset + i)))
+            latencies.append(time.perf_counter() - t)
+
+    async def run():
+        per_task = count // tasks
+        await asyncio.gather(*(writer(per_task, k * per_task) for k in range(tasks)))
+
+    start = time.perf_counter()
+    asyncio.run(run())
+    elapsed = time.perf_counter() - start
+    stats = log.stats()
+    return summarize(f"log, {tasks} async writers ({stats['flushes']} fsyncs)", latencies, elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare replay.json rewrites with the append-only replay log')
+    parser.add_argument('--entries', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--legacy-max', type=int, default=2000)
+    args = parser.parse_args()
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        rows.append(run_legacy(tmp, min(args.entries, args.legacy_max)))
+        rows.append(run_log(tmp / 'single', args.entries, 1))
+        rows.append(run_log(tmp / 'group', args.entries, args.threads))
+        rows.append(run_log_async(tmp / 'async', args.entries, args.threads))
+
+    print_table(rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Suggest benchmark - fuzzy name lookup on a synthetic registry.
+
+Inserts --names synthetic parameters (CamelCase hardware-style names such
+as NeoPixelArrayDriver) spread over --owners owners, then times three kinds
+of lookup through suggest_parameters():
+
+  - typo:     a random character dropped, swapped or replaced, lower-cased
+  - prefix:   the first 3-6 characters, as typed into IDE autocomplete
+  - owner:    owner/typo with a misspelled owner
+
+A sample of the typo lookups is also run as a sequential scan scoring
+every name with word_similarity(), the cost without the trigram index.
+Recall@5 is the share of lookups whose intended name is in the top five.
+
+The candidate queries inside suggest_parameters() and suggest_owners()
+are also EXPLAINed on the populated tables, to check that the nearest
+names come off the trigram indexes in distance order rather than from a
+sort over every row. The timings only mean something if they do, so the
+script exits with status 1 when either plan sorts.
+
+Everything runs in one transaction that is rolled back, so it leaves the
+registry untouched; it needs pg_trgm and init/07_suggest.sql. The
+postgres:16 image from docker-compose.yml ships pg_trgm:
+
+    docker compose up -d db
+    POSTGRES_HOST=localhost POSTGRES_PORT=5455 python bench/bench_suggest.py
+
+Usage:
+    python bench/bench_suggest.py [--names 100000] [--owners 200] [--lookups 200] [--seed 1]
+"""
+
+import time
+import random
+import argparse
+
+from _common import print_table, summarize
+
+import db
+
+WORDS = [
+    'Neo', 'Pixel', 'Array', 'Stepper', 'Servo', 'Encoder', 'CAN', 'Bus', 'GRBL', 'Scara',
+    'Uart', 'I2C', 'Spi', 'Gui', 'Button', 'Feeder', 'Motor', 'Driver', 'Sensor', 'Temp',
+    'Analog', 'Input', 'Output', 'Relay', 'Laser', 'Probe', 'Limit', 'Switch', 'Fan', 'Heater',
+    'Mqtt', 'Wifi', 'Core', 'Esp32', 'Display', 'Oled', 'Led', 'Strip', 'Valve', 'Pump',
+]
+
+
+def synthetic_names(count: int, rng: random.Random) -> list:
+    names = set()
+    while len(names) < count:
+        name = ''.join(rng.sample(WORDS, rng.randint(2, 4)))
+        if rng.random() < 0.3:
+            name += str(rng.randint(1, 99))
+        names.add(name)
+    return sorted(names)
+
+
+def typo(text: str, rng: random.Random) -> str:
+    i = rng.randrange(len(text) - 1)
+    edit = rng.choice(('drop', 'swap', 'replace'))
+    if edit == 'drop':
+        text = text[:i] + text[i + 1:]
+    elif edit == 'swap':
+        text = text[:i] + text[i + 1] + text[i] + text[i + 2:]
+    else:
+        text = text[:i] + rng.choice('abcdefghijklmnopqrstuvwxyz') + text[i + 1:]
+    return text.lower()
+
+
+def populate(cur, names: list, owners: int, rng: random.Random) -> list:
+    usernames = [f"bench_owner_{i:03d}" for i in range(owners)]
+    cur.execute("INSERT INTO owners (username) SELECT unnest(%s::TEXT[])", (usernames,))
+    cur.execute("""
+        INSERT INTO parameters (owner_id, name)
+        SELECT o.id, n.name
+        FROM unnest(%s::TEXT[], %s::TEXT[]) AS n(owner, name)
+        JOIN owners o ON o.username = n.owner
+    """, ([rng.choice(usernames) for _ in names], names))
+    cur.execute("ANALYZE parameters")
+    cur.execute("ANALYZE owners")
+    cur.execute("""
+        SELECT o.username, p.name FROM parameters p JOIN owners o ON o.id = p.owner_id
+        WHERE o.username = ANY(%s)
+    """, (usernames,))
+    return [(row['username'], row['name']) for row in cur.fetchall()]
+
+
+def timed(label: str, cur, sql: str, args: list) -> tuple:
+    latencies, results = [], []
+    start = time.perf_counter()
+    for params in args:
+        t = time.perf_counter()
+        cur.execute(sql, params)
+        results.append(cur.fetchall())
+        latencies.append(time.perf_counter() - t)
+    return summarize(label, latencies, time.perf_counter() - start), results
+
+
+SUGGEST = "SELECT owner, name FROM suggest_parameters(%s, %s, 5)"
+SCAN = """
+    SELECT o.username AS owner, p.name
+    FROM parameters p JOIN owners o ON o.id = p.owner_id
+    ORDER BY word_similarity(lower(%s), lower(p.name)) DESC
+    LIMIT 5
+"""
+
+# The index-ordered candidate queries of suggest_parameters and
+# suggest_owners (init/07_suggest.sql), with p_limit = 5
+CANDIDATES = [
+    ('idx_parameters_name_trgm', """
+        SELECT p.owner_id, p.name FROM parameters p
+        ORDER BY lower(%s) <<-> lower(p.name)
+        LIMIT 25
+    """),
+    ('idx_owners_username_trgm', """
+        SELECT o.username FROM owners o
+        ORDER BY lower(%s) <<-> lower(o.username)
+        LIMIT 5
+    """),
+]
+
+
+def index_ordered(cur, index: str, sql: str, query: str) -> bool:
+    """True if the plan reads `index` in distance order (an index scan with an Order By)."""
+    cur.execute("EXPLAIN (FORMAT JSON) " + sql, (query,))
+    nodes = [cur.fetchone()['QUERY PLAN'][0]['Plan']]
+    while nodes:
+        node = nodes.pop()
+        if node.get('Index Name') == index and node.get('Order By'):
+            return True
+        nodes.extend(node.get('Plans', []))
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time fuzzy name suggestions on a synthetic registry')
+    parser.add_argument('--names', type=int, default=100000)
+    parser.add_argument('--owners', type=int, default=200)
+    parser.add_argument('--lookups', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    conn = db.connect()
+    rows = []
+    try:
+        with conn.cursor() as cur:
+            t = time.perf_counter()
+            registry = populate(cur, synthetic_names(args.names, rng), args.owners, rng)
+            print(f"inserted {len(registry)} names in {time.perf_counter() - t:.1f}s\n")
+
+            plans = [(index, index_ordered(cur, index, sql, typo(rng.choice(registry)[1], rng)))
+                     for index, sql in CANDIDATES]
+
+            targets = [rng.choice(registry) for _ in range(args.lookups)]
+            typos = [(typo(name, rng), None) for _, name in targets]
+            prefixes = [(name[:rng.randint(3, 6)], None) for _, name in targets]
+            owned = [(typo(name, rng), typo(owner, rng)) for owner, name in targets]
+
+            row, found = timed('typo, suggest_parameters', cur, SUGGEST, typos)
+            rows.append(row)
+            rows.append(timed('typo, full scan', cur, SCAN, [(q,) for q, _ in typos[:20]])[0])
+            rows.append(timed('prefix, suggest_parameters', cur, SUGGEST, prefixes)[0])
+            row, found_owned = timed('owner/typo, suggest_parameters', cur, SUGGEST, owned)
+            rows.append(row)
+
+            recall = sum(name in [r['name'] for r in hits] for (_, name), hits in zip(targets, found))
+            recall_owned = sum(
+                (owner, name) in [(r['owner'], r['name']) for r in hits]
+                for (owner, name), hits in zip(targets, found_owned)
+            )
+    finally:
+        conn.rollback()
+        conn.close()
+
+    print_table(rows)
+    print(f"\nrecall@5: typo {recall}/{len(targets)}, owner/typo {recall_owned}/{len(targets)}")
+    for index, ordered in plans:
+        print(f"{index}: {'index-ordered' if ordered else 'NOT index-ordered, sorts every row'}")
+    if not all(ordered for _, ordered in plans):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -14,6 +14,11 @@ CREATE TABLE owners (
     username TEXT NOT NULL UNIQUE
 );
 
+-- GET /parameters walks owners in byte order ("C") and stops once a
+-- page is full, rather than sorting every owner after the cursor.
+CREATE INDEX idx_owners_username_c
+    ON owners(username COLLATE "C");
+
 -- Seed default owners
 INSERT INTO owners (username) VALUES
     ('evezor'),
@@ -37,6 +42,11 @@ CREATE TABLE parameters (
 CREATE INDEX idx_parameters_owner
     ON parameters(owner_id);
 
+-- Keyset pagination and name-prefix filters for GET /parameters.
+-- Byte order ("C") makes `name LIKE 'prefix%'` an index range scan.
+CREATE INDEX idx_parameters_owner_name_c
+    ON parameters(owner_id, name COLLATE "C");
+
 -- =========================================================
 -- 3. File types (js / py / md / future)
 -- =========================================================
@@ -58,7 +68,34 @@ INSERT INTO file_types (name) VALUES
 ON CONFLICT DO NOTHING;
 
 -- =========================================================
--- 4. Files (independently versioned per type)
+-- 4. Blobs (content-addressed file contents)
+-- =========================================================
+-- Each distinct content is stored once, keyed by the hex SHA-256 of its
+-- UTF-8 bytes. Files point at blobs, so identical content across versions,
+-- owners and forks is shared instead of copied.
+CREATE TABLE blobs (
+    hash TEXT PRIMARY KEY,
+    content TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Store content (deduplicated) and return its hash
+CREATE OR REPLACE FUNCTION store_blob(p_content TEXT)
+RETURNS TEXT AS $$
+DECLARE
+    h TEXT := encode(sha256(convert_to(p_content, 'UTF8')), 'hex');
+BEGIN
+    INSERT INTO blobs (hash, content, size)
+    VALUES (h, p_content, octet_length(p_content))
+    ON CONFLICT (hash) DO NOTHING;
+
+    RETURN h;
+END;
+$$ LANGUAGE plpgsql;
+
+-- =========================================================
+-- 5. Files (independently versioned per type)
 -- =========================================================
 CREATE TABLE files (
     id SERIAL PRIMARY KEY,
@@ -66,7 +103,7 @@ CREATE TABLE files (
     file_type_id INTEGER NOT NULL REFERENCES file_types(id),
     version INTEGER NOT NULL,
     path TEXT NOT NULL,
-    content TEXT NOT NULL,
+    content_hash TEXT NOT NULL REFERENCES blobs(hash),
     change_note TEXT,
     created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
 
@@ -77,7 +114,7 @@ CREATE INDEX idx_files_lookup
     ON files(parameter_id, file_type_id, version);
 
 -- =========================================================
--- 5. Parameter versions (major versions + dev)
+-- 6. Parameter versions (major versions + dev)
 -- =========================================================
 CREATE TABLE parameter_versions (
     id SERIAL PRIMARY KEY,
@@ -105,9 +142,14 @@ CREATE UNIQUE INDEX idx_unique_stable_versions
     ON parameter_versions(parameter_id, version)
     WHERE is_dev = FALSE;
 
+-- All versions of a parameter, dev or stable (the dependency cycle check
+-- walks these for every dependency inserted)
+CREATE INDEX idx_parameter_versions_parameter
+    ON parameter_versions(parameter_id);
+
 
 -- =========================================================
--- 6. Mapping: parameter version → file versions
+-- 7. Mapping: parameter version → file versions
 -- =========================================================
 CREATE TABLE parameter_version_files (
     id SERIAL PRIMARY KEY,
@@ -123,7 +165,7 @@ CREATE INDEX idx_pvf_version
     ON parameter_version_files(parameter_version_id);
 
 -- =========================================================
--- 7. Optional: Guardrails (recommended)
+-- 8. Optional: Guardrails (recommended)
 -- =========================================================
 
 -- Prevent deleting files that are referenced by stable versions
@@ -154,10 +196,9 @@ FOR EACH ROW
 EXECUTE FUNCTION prevent_file_delete_if_used();
 
 -- =========================================================
--- 8. Recommended extensions (safe, optional)
+-- 9. Recommended extensions (safe, optional)
 -- =========================================================
 -- Uncomment if you want them
--- CREATE EXTENSION IF NOT EXISTS pgcrypto;   -- future hashing
 -- CREATE EXTENSION IF NOT EXISTS citext;     -- case-insensitive names
 
 COMMIT;
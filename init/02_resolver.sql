@@ -116,13 +116,14 @@ BEGIN
         ft.name,
         pvf.file_version,
         f.path,
-        f.content
+        b.content
     FROM parameter_version_files pvf
     JOIN file_types ft ON ft.id = pvf.file_type_id
     JOIN files f ON
         f.parameter_id = p_parameter_id
         AND f.file_type_id = ft.id
         AND f.version = pvf.file_version
+    JOIN blobs b ON b.hash = f.content_hash
     WHERE pvf.parameter_version_id = p_parameter_version_id
       AND (
           p_file_types IS NULL
@@ -133,90 +134,141 @@ $$ LANGUAGE plpgsql STABLE;
 
 
 -- ===============================
--- 5. Full resolver (single call)
--- When selector = 'dev', merges dev mappings over latest so that
--- file types not yet touched in dev fall back to their latest version.
+-- 5. Effective file map for a parameter version
+-- Stable versions return their own mapping. The dev version merges its
+-- mappings over latest so that file types not yet touched in dev fall
+-- back to their latest version.
 -- ===============================
-CREATE OR REPLACE FUNCTION resolve_package(
+CREATE OR REPLACE FUNCTION resolve_effective_file_map(
+    p_parameter_version_id INTEGER
+)
+RETURNS TABLE (
+    file_type_id INTEGER,
+    file_version INTEGER
+) AS $$
+DECLARE
+    pid         INTEGER;
+    dev         BOOLEAN;
+    latest_pvid INTEGER;
+BEGIN
+    SELECT pv.parameter_id, pv.is_dev INTO pid, dev
+    FROM parameter_versions pv
+    WHERE pv.id = p_parameter_version_id;
+
+    IF NOT dev THEN
+        RETURN QUERY
+        SELECT pvf.file_type_id, pvf.file_version
+        FROM parameter_version_files pvf
+        WHERE pvf.parameter_version_id = p_parameter_version_id;
+        RETURN;
+    END IF;
+
+    -- Latest stable version id; NULL when no stable version exists yet
+    SELECT pv.id INTO latest_pvid
+    FROM parameter_versions pv
+    WHERE pv.parameter_id = pid AND pv.is_dev = FALSE
+    ORDER BY pv.version DESC
+    LIMIT 1;
+
+    -- Dev mappings win; latest fills in any file types dev hasn't touched
+    RETURN QUERY
+    SELECT pvf.file_type_id, pvf.file_version
+    FROM parameter_version_files pvf
+    WHERE pvf.parameter_version_id = p_parameter_version_id
+
+    UNION ALL
+
+    SELECT pvf.file_type_id, pvf.file_version
+    FROM parameter_version_files pvf
+    WHERE pvf.parameter_version_id = latest_pvid
+      AND pvf.file_type_id NOT IN (
+          SELECT d.file_type_id
+          FROM parameter_version_files d
+          WHERE d.parameter_version_id = p_parameter_version_id
+      );
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+
+-- ===============================
+-- 6. Package manifest (no content)
+-- Everything needed to identify a resolved package: the version it
+-- resolved to and, per file, its version, path and content hash.
+-- ===============================
+CREATE OR REPLACE FUNCTION resolve_package_manifest(
     p_owner TEXT,
     p_parameter TEXT,
     p_selector TEXT,
     p_file_types TEXT[] DEFAULT NULL
 )
 RETURNS TABLE (
-    owner TEXT,
-    parameter TEXT,
-    selector TEXT,
+    parameter_version_id INTEGER,
+    version INTEGER,
+    is_dev BOOLEAN,
     file_type TEXT,
     file_version INTEGER,
     path TEXT,
-    content TEXT
+    content_hash TEXT
 ) AS $$
 DECLARE
-    pid         INTEGER;
-    dev_pvid    INTEGER;
-    latest_pvid INTEGER;
-    pvid        INTEGER;
+    pid  INTEGER;
+    pvid INTEGER;
 BEGIN
     pid := resolve_parameter(p_owner, p_parameter);
+    pvid := resolve_parameter_version(pid, p_selector);
 
-    IF p_selector = 'dev' THEN
-        dev_pvid := resolve_parameter_version(pid, 'dev');
-
-        -- Latest stable version id; NULL when no stable version exists yet
-        SELECT id INTO latest_pvid
-        FROM parameter_versions
-        WHERE parameter_id = pid AND is_dev = FALSE
-        ORDER BY version DESC
-        LIMIT 1;
-
-        -- Dev mappings win; latest fills in any file types dev hasn't touched
-        RETURN QUERY
-        SELECT
-            p_owner,
-            p_parameter,
-            p_selector,
-            ft.name,
-            merged.file_version,
-            f.path,
-            f.content
-        FROM (
-            SELECT pvf.file_type_id, pvf.file_version
-            FROM parameter_version_files pvf
-            WHERE pvf.parameter_version_id = dev_pvid
-
-            UNION ALL
-
-            SELECT pvf.file_type_id, pvf.file_version
-            FROM parameter_version_files pvf
-            WHERE pvf.parameter_version_id = latest_pvid
-              AND pvf.file_type_id NOT IN (
-                  SELECT file_type_id
-                  FROM parameter_version_files
-                  WHERE parameter_version_id = dev_pvid
-              )
-        ) merged
-        JOIN file_types ft ON ft.id = merged.file_type_id
-        JOIN files f ON
-            f.parameter_id = pid
-            AND f.file_type_id = merged.file_type_id
-            AND f.version = merged.file_version
-        WHERE (p_file_types IS NULL OR ft.name = ANY(p_file_types));
+    RETURN QUERY
+    SELECT
+        pv.id,
+        pv.version,
+        pv.is_dev,
+        ft.name,
+        m.file_version,
+        f.path,
+        f.content_hash
+    FROM resolve_effective_file_map(pvid) m
+    JOIN parameter_versions pv ON pv.id = pvid
+    JOIN file_types ft ON ft.id = m.file_type_id
+    JOIN files f ON
+        f.parameter_id = pid
+        AND f.file_type_id = m.file_type_id
+        AND f.version = m.file_version
+    WHERE (p_file_types IS NULL OR ft.name = ANY(p_file_types))
+    ORDER BY ft.name;
+END;
+$$ LANGUAGE plpgsql STABLE;
 
-    ELSE
-        pvid := resolve_parameter_version(pid, p_selector);
 
-        RETURN QUERY
-        SELECT
-            p_owner,
-            p_parameter,
-            p_selector,
-            r.file_type,
-            r.file_version,
-            r.path,
-            r.content
-        FROM resolve_files(pid, pvid, p_file_types) r;
-    END IF;
+-- ===============================
+-- 7. Full resolver (single call)
+-- ===============================
+CREATE OR REPLACE FUNCTION resolve_package(
+    p_owner TEXT,
+    p_parameter TEXT,
+    p_selector TEXT,
+    p_file_types TEXT[] DEFAULT NULL
+)
+RETURNS TABLE (
+    owner TEXT,
+    parameter TEXT,
+    selector TEXT,
+    file_type TEXT,
+    file_version INTEGER,
+    path TEXT,
+    content TEXT
+) AS $$
+BEGIN
+    RETURN QUERY
+    SELECT
+        p_owner,
+        p_parameter,
+        p_selector,
+        m.file_type,
+        m.file_version,
+        m.path,
+        b.content
+    FROM resolve_package_manifest(p_owner, p_parameter, p_selector, p_file_types) m
+    JOIN blobs b ON b.hash = m.content_hash;
 END;
 $$ LANGUAGE plpgsql STABLE;
 
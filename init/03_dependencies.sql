@@ -69,7 +69,9 @@ $$ LANGUAGE plpgsql STABLE;
 
 
 -- =========================================================
--- Recursive dependency resolver (full tree)
+-- Dependency tree (full closure)
+-- Every parameter version the root reaches, once, at the depth
+-- where it is first reached (see resolve_dependency_closure)
 -- =========================================================
 CREATE OR REPLACE FUNCTION resolve_dependency_tree(
     p_owner TEXT,
@@ -90,52 +92,153 @@ BEGIN
     pid := resolve_parameter(p_owner, p_parameter);
     pvid := resolve_parameter_version(pid, p_selector);
 
-    RETURN QUERY
-    WITH RECURSIVE dep_tree AS (
-        -- Base case: the root parameter
+    -- Joined to the closure table directly, the planner looks up each
+    -- row by key; behind a function scan it hashes whole tables
+    IF EXISTS (
+        SELECT 1 FROM parameter_version_closure c
+        WHERE c.ancestor_id = pvid AND c.descendant_id = pvid
+    ) THEN
+        RETURN QUERY
         SELECT
-            0 AS depth,
-            p_owner AS owner,
-            p_parameter AS parameter,
-            pv.version,
-            pv.is_dev,
-            pvid AS param_version_id
-        FROM parameter_versions pv
-        WHERE pv.id = pvid
-
-        UNION ALL
-
-        -- Recursive case: dependencies
-        SELECT
-            dt.depth + 1,
+            c.depth,
             o.username,
             p.name,
-            pvd.depends_on_version,
-            pvd.depends_on_is_dev,
-            CASE
-                WHEN pvd.depends_on_is_dev THEN
-                    (SELECT pv2.id FROM parameter_versions pv2
-                     WHERE pv2.parameter_id = pvd.depends_on_parameter_id AND pv2.is_dev = TRUE)
-                ELSE
-                    (SELECT pv2.id FROM parameter_versions pv2
-                     WHERE pv2.parameter_id = pvd.depends_on_parameter_id
-                       AND pv2.version = pvd.depends_on_version AND pv2.is_dev = FALSE)
-            END
-        FROM dep_tree dt
-        JOIN parameter_version_dependencies pvd
-            ON pvd.parameter_version_id = dt.param_version_id
-        JOIN parameters p ON p.id = pvd.depends_on_parameter_id
+            pv.version,
+            pv.is_dev
+        FROM parameter_version_closure c
+        JOIN parameter_versions pv ON pv.id = c.descendant_id
+        JOIN parameters p ON p.id = pv.parameter_id
         JOIN owners o ON o.id = p.owner_id
-        WHERE dt.depth < 50  -- Prevent infinite recursion
-    )
-    SELECT DISTINCT
-        dep_tree.depth,
-        dep_tree.owner,
-        dep_tree.parameter,
-        dep_tree.version,
-        dep_tree.is_dev
-    FROM dep_tree
-    ORDER BY dep_tree.depth, dep_tree.owner, dep_tree.parameter;
+        WHERE c.ancestor_id = pvid
+        ORDER BY c.depth, o.username, p.name;
+        RETURN;
+    END IF;
+
+    RETURN QUERY
+    SELECT
+        c.depth,
+        o.username,
+        p.name,
+        pv.version,
+        pv.is_dev
+    FROM resolve_dependency_closure(pvid) c
+    JOIN parameter_versions pv ON pv.id = c.parameter_version_id
+    JOIN parameters p ON p.id = pv.parameter_id
+    JOIN owners o ON o.id = p.owner_id
+    ORDER BY c.depth, o.username, p.name;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+
+-- =========================================================
+-- Transitive dependency closure of a parameter version
+-- Each parameter version appears once, at the depth where it is
+-- first reached. Read from parameter_version_closure when the
+-- version's closure is materialized, otherwise a breadth-first
+-- walk of the dependency graph.
+-- =========================================================
+CREATE OR REPLACE FUNCTION resolve_dependency_closure(
+    p_parameter_version_id INTEGER
+)
+RETURNS TABLE (
+    parameter_version_id INTEGER,
+    depth INTEGER
+) AS $$
+#variable_conflict use_column
+DECLARE
+    seen     INTEGER[] := ARRAY[p_parameter_version_id];
+    frontier INTEGER[] := ARRAY[p_parameter_version_id];
+    level    INTEGER := 0;
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM parameter_version_closure c
+        WHERE c.ancestor_id = p_parameter_version_id
+          AND c.descendant_id = p_parameter_version_id
+    ) THEN
+        RETURN QUERY
+        SELECT c.descendant_id, c.depth
+        FROM parameter_version_closure c
+        WHERE c.ancestor_id = p_parameter_version_id
+        ORDER BY c.depth;
+        RETURN;
+    END IF;
+
+    parameter_version_id := p_parameter_version_id;
+    depth := 0;
+    RETURN NEXT;
+
+    LOOP
+        level := level + 1;
+
+        SELECT array_agg(DISTINCT target.id) INTO frontier
+        FROM parameter_version_dependencies pvd
+        JOIN parameter_versions target ON
+            target.parameter_id = pvd.depends_on_parameter_id
+            AND target.is_dev = pvd.depends_on_is_dev
+            AND (pvd.depends_on_is_dev OR target.version = pvd.depends_on_version)
+        WHERE pvd.parameter_version_id = ANY(frontier)
+          AND NOT (target.id = ANY(seen));
+
+        EXIT WHEN frontier IS NULL;
+        seen := seen || frontier;
+
+        RETURN QUERY SELECT unnest(frontier), level;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+
+-- =========================================================
+-- Closure manifest: root plus every transitive dependency,
+-- one row per file (no content), optional file type filter
+-- =========================================================
+CREATE OR REPLACE FUNCTION resolve_package_closure(
+    p_owner TEXT,
+    p_parameter TEXT,
+    p_selector TEXT,
+    p_file_types TEXT[] DEFAULT NULL
+)
+RETURNS TABLE (
+    depth INTEGER,
+    owner TEXT,
+    parameter TEXT,
+    version INTEGER,
+    is_dev BOOLEAN,
+    file_type TEXT,
+    file_version INTEGER,
+    path TEXT,
+    content_hash TEXT
+) AS $$
+DECLARE
+    pid  INTEGER;
+    pvid INTEGER;
+BEGIN
+    pid := resolve_parameter(p_owner, p_parameter);
+    pvid := resolve_parameter_version(pid, p_selector);
+
+    RETURN QUERY
+    SELECT
+        c.depth,
+        o.username,
+        p.name,
+        pv.version,
+        pv.is_dev,
+        ft.name,
+        m.file_version,
+        f.path,
+        f.content_hash
+    FROM resolve_dependency_closure(pvid) c
+    JOIN parameter_versions pv ON pv.id = c.parameter_version_id
+    JOIN parameters p ON p.id = pv.parameter_id
+    JOIN owners o ON o.id = p.owner_id
+    CROSS JOIN LATERAL resolve_effective_file_map(c.parameter_version_id) m
+    JOIN file_types ft ON ft.id = m.file_type_id
+    JOIN files f ON
+        f.parameter_id = pv.parameter_id
+        AND f.file_type_id = m.file_type_id
+        AND f.version = m.file_version
+    WHERE (p_file_types IS NULL OR ft.name = ANY(p_file_types))
+    ORDER BY c.depth, o.username, p.name, ft.name;
 END;
 $$ LANGUAGE plpgsql STABLE;
 
@@ -143,11 +246,18 @@ $$ LANGUAGE plpgsql STABLE;
 -- =========================================================
 -- Prevent cyclic dependencies
 -- =========================================================
+-- A bulk load that checks its whole batch of dependencies at once sets
+-- registry.defer_cycle_check = on for its transaction to skip this
+-- per-row check (see load_parameters_bulk).
 CREATE OR REPLACE FUNCTION check_cyclic_dependency()
 RETURNS TRIGGER AS $$
 DECLARE
     cycle_exists BOOLEAN;
 BEGIN
+    IF current_setting('registry.defer_cycle_check', TRUE) = 'on' THEN
+        RETURN NEW;
+    END IF;
+
     -- Check if adding this dependency would create a cycle
     WITH RECURSIVE dep_chain AS (
         -- Start from the dependency target
@@ -187,4 +297,158 @@ FOR EACH ROW
 EXECUTE FUNCTION check_cyclic_dependency();
 
 
+-- =========================================================
+-- Materialized dependency closure of stable versions
+-- =========================================================
+-- One row per (stable version, version in its transitive closure),
+-- the version itself included at depth 0, with the shallowest depth
+-- at which it is reached. Frozen dependencies of a stable version do
+-- not change, so its closure is built once, when it is published or
+-- loaded, and full-tree queries become one index scan. Only versions
+-- whose whole closure is stable have rows: a closure that reaches a
+-- dev version can change under it, so it is walked on every query
+-- (see resolve_dependency_closure).
+CREATE TABLE parameter_version_closure (
+    ancestor_id INTEGER NOT NULL
+        REFERENCES parameter_versions(id) ON DELETE CASCADE,
+    descendant_id INTEGER NOT NULL
+        REFERENCES parameter_versions(id) ON DELETE CASCADE,
+    depth INTEGER NOT NULL,
+
+    PRIMARY KEY (ancestor_id, descendant_id)
+);
+
+-- The closures containing a version, for invalidation
+CREATE INDEX idx_pvc_descendant
+    ON parameter_version_closure(descendant_id);
+
+
+-- Builds a stable version's closure from its direct dependencies'
+-- closures, materializing those first. Returns FALSE (and writes
+-- nothing for this version) if the closure reaches a dev version or a
+-- stable version that does not exist. Relies on the dependency graph
+-- being acyclic, so callers that defer the cycle check must run it
+-- first.
+CREATE OR REPLACE FUNCTION materialize_dependency_closure(
+    p_parameter_version_id INTEGER
+)
+RETURNS BOOLEAN AS $$
+DECLARE
+    dep RECORD;
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM parameter_version_closure
+        WHERE ancestor_id = p_parameter_version_id
+          AND descendant_id = p_parameter_version_id
+    ) THEN
+        RETURN TRUE;
+    END IF;
+
+    IF NOT EXISTS (
+        SELECT 1 FROM parameter_versions
+        WHERE id = p_parameter_version_id AND is_dev = FALSE
+    ) THEN
+        RETURN FALSE;
+    END IF;
+
+    FOR dep IN
+        SELECT pvd.depends_on_is_dev, target.id AS target_id
+        FROM parameter_version_dependencies pvd
+        LEFT JOIN parameter_versions target ON
+            target.parameter_id = pvd.depends_on_parameter_id
+            AND target.is_dev = FALSE
+            AND target.version = pvd.depends_on_version
+        WHERE pvd.parameter_version_id = p_parameter_version_id
+    LOOP
+        IF dep.depends_on_is_dev OR dep.target_id IS NULL
+           OR NOT materialize_dependency_closure(dep.target_id) THEN
+            RETURN FALSE;
+        END IF;
+    END LOOP;
+
+    -- A concurrent publish may be materializing the same shared
+    -- dependency; the rows are identical either way
+    INSERT INTO parameter_version_closure (ancestor_id, descendant_id, depth)
+    SELECT p_parameter_version_id, p_parameter_version_id, 0
+
+    UNION ALL
+
+    SELECT p_parameter_version_id, c.descendant_id, MIN(c.depth) + 1
+    FROM parameter_version_dependencies pvd
+    JOIN parameter_versions target ON
+        target.parameter_id = pvd.depends_on_parameter_id
+        AND target.is_dev = FALSE
+        AND target.version = pvd.depends_on_version
+    JOIN parameter_version_closure c ON c.ancestor_id = target.id
+    WHERE pvd.parameter_version_id = p_parameter_version_id
+    GROUP BY c.descendant_id
+    ON CONFLICT DO NOTHING;
+
+    RETURN TRUE;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- Dependencies of an existing stable version can still change (a reload
+-- of Parameters/ relinks v1), so any change drops the closure of every
+-- version that reaches the changed one and rebuilds it from the new
+-- graph. While the cycle check is deferred the graph may be mid-merge
+-- (and cyclic), so only the drop happens here; the bulk loader rebuilds
+-- the closures of the loaded versions and of everything that depends on
+-- them once its own cycle check has passed.
+CREATE OR REPLACE FUNCTION invalidate_dependency_closure()
+RETURNS TRIGGER AS $$
+DECLARE
+    stale INTEGER[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(DISTINCT c.ancestor_id) INTO stale
+        FROM parameter_version_closure c
+        WHERE c.descendant_id IN (SELECT parameter_version_id FROM new_rows);
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(DISTINCT c.ancestor_id) INTO stale
+        FROM parameter_version_closure c
+        WHERE c.descendant_id IN (SELECT parameter_version_id FROM old_rows);
+    ELSE
+        SELECT array_agg(DISTINCT c.ancestor_id) INTO stale
+        FROM parameter_version_closure c
+        WHERE c.descendant_id IN (
+            SELECT parameter_version_id FROM new_rows
+            UNION
+            SELECT parameter_version_id FROM old_rows
+        );
+    END IF;
+
+    IF stale IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    DELETE FROM parameter_version_closure WHERE ancestor_id = ANY(stale);
+
+    IF current_setting('registry.defer_cycle_check', TRUE) IS DISTINCT FROM 'on' THEN
+        PERFORM materialize_dependency_closure(a) FROM unnest(stale) AS a;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_closure_insert
+AFTER INSERT ON parameter_version_dependencies
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION invalidate_dependency_closure();
+
+CREATE TRIGGER trg_closure_update
+AFTER UPDATE ON parameter_version_dependencies
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION invalidate_dependency_closure();
+
+CREATE TRIGGER trg_closure_delete
+AFTER DELETE ON parameter_version_dependencies
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION invalidate_dependency_closure();
+
+
 COMMIT;
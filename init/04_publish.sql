@@ -5,8 +5,14 @@ BEGIN;
 -- =========================================================
 -- Merges the dev file map over latest (same logic the resolver
 -- uses when you query :dev), freezes that into a new stable
--- parameter_version, and copies + freezes any dependencies.
+-- parameter_version, copies + freezes any dependencies and
+-- materializes its dependency closure.
 -- Returns the new version number.
+--
+-- Takes the parameter's row lock first, so concurrent publishes
+-- and file version writes of one parameter (which take the same
+-- lock) run one after another and each sees the versions the one
+-- before it committed.
 -- =========================================================
 CREATE OR REPLACE FUNCTION publish_parameter(
     p_parameter_id INTEGER
@@ -18,6 +24,9 @@ DECLARE
     new_version INTEGER;
     new_pvid    INTEGER;
 BEGIN
+    -- 0. Queue behind other writers of this parameter
+    PERFORM 1 FROM parameters WHERE id = p_parameter_id FOR NO KEY UPDATE;
+
     -- 1. A dev version must exist
     SELECT id INTO dev_pvid
     FROM parameter_versions
@@ -83,7 +92,11 @@ BEGIN
     FROM parameter_version_dependencies d
     WHERE d.parameter_version_id = dev_pvid;
 
-    -- 7. Clear dev file mappings — dev is now clean until next edit
+    -- 7. Materialize the new version's dependency closure (skipped
+    --    when it reaches a dev version)
+    PERFORM materialize_dependency_closure(new_pvid);
+
+    -- 8. Clear dev file mappings — dev is now clean until next edit
     DELETE FROM parameter_version_files
     WHERE parameter_version_id = dev_pvid;
 
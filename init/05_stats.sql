@@ -0,0 +1,214 @@
+BEGIN;
+
+-- =========================================================
+-- Registry counters (constant-time GET /stats)
+-- =========================================================
+-- Row counts are kept up to date by statement-level triggers, so
+-- reading them never scans the counted tables. Each counter is split
+-- across shards picked by backend pid, so concurrent writers bump
+-- different rows instead of queueing on one. A counter's value is the
+-- sum of its shards. Shard -1 belongs to reconcile_registry_counters().
+--
+-- Safe to run more than once, e.g. to add the counters to an existing
+-- database:
+--
+--   psql -d mydb -f init/05_stats.sql
+-- =========================================================
+CREATE TABLE IF NOT EXISTS registry_counters (
+    name TEXT NOT NULL,
+    shard SMALLINT NOT NULL,
+    delta BIGINT NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (name, shard)
+);
+
+
+-- Adds a batch of (counter, delta) changes to this backend's shards.
+-- A session that holds its transactions open for long (such as a
+-- parallel replay worker) can pick its own shard with
+-- SET registry.counter_shard = 0..7, so that it does not share one
+-- with another long writer.
+CREATE OR REPLACE FUNCTION bump_registry_counters(p_names TEXT[], p_deltas BIGINT[])
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO registry_counters (name, shard, delta)
+    SELECT c.name,
+           COALESCE(NULLIF(current_setting('registry.counter_shard', TRUE), '')::SMALLINT % 8,
+                    pg_backend_pid() % 8),
+           c.delta
+    FROM unnest(p_names, p_deltas) AS c(name, delta)
+    WHERE c.delta <> 0
+    ORDER BY c.name
+    ON CONFLICT (name, shard)
+    DO UPDATE SET delta = registry_counters.delta + EXCLUDED.delta;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- One trigger function for every counted table. Transition tables hold
+-- the rows a statement inserted (new_rows) or deleted (old_rows);
+-- updates are counted as old rows out, new rows in.
+CREATE OR REPLACE FUNCTION count_registry_rows()
+RETURNS TRIGGER AS $$
+DECLARE
+    added   BIGINT := 0;
+    removed BIGINT := 0;
+    dev_delta    BIGINT := 0;
+    stable_delta BIGINT := 0;
+BEGIN
+    IF TG_TABLE_NAME = 'parameter_versions' THEN
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            SELECT COUNT(*) FILTER (WHERE is_dev), COUNT(*) FILTER (WHERE NOT is_dev)
+            INTO dev_delta, stable_delta
+            FROM new_rows;
+        END IF;
+        IF TG_OP IN ('DELETE', 'UPDATE') THEN
+            SELECT dev_delta - COUNT(*) FILTER (WHERE is_dev),
+                   stable_delta - COUNT(*) FILTER (WHERE NOT is_dev)
+            INTO dev_delta, stable_delta
+            FROM old_rows;
+        END IF;
+        PERFORM bump_registry_counters(
+            ARRAY['dev_versions', 'stable_versions'],
+            ARRAY[dev_delta, stable_delta]
+        );
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP = 'INSERT' THEN
+        SELECT COUNT(*) INTO added FROM new_rows;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT COUNT(*) INTO removed FROM old_rows;
+    END IF;
+
+    PERFORM bump_registry_counters(
+        ARRAY[CASE TG_TABLE_NAME
+            WHEN 'parameter_version_dependencies' THEN 'dependencies'
+            ELSE TG_TABLE_NAME
+        END],
+        ARRAY[added - removed]
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- A trigger with transition tables handles a single event, so every
+-- table gets one insert and one delete trigger
+DO $$
+DECLARE
+    t TEXT;
+BEGIN
+    FOREACH t IN ARRAY ARRAY[
+        'owners', 'parameters', 'parameter_versions', 'files', 'parameter_version_dependencies'
+    ] LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_count_insert ON %I', t);
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_count_delete ON %I', t);
+        EXECUTE format(
+            'CREATE TRIGGER trg_count_insert AFTER INSERT ON %I '
+            'REFERENCING NEW TABLE AS new_rows '
+            'FOR EACH STATEMENT EXECUTE FUNCTION count_registry_rows()', t);
+        EXECUTE format(
+            'CREATE TRIGGER trg_count_delete AFTER DELETE ON %I '
+            'REFERENCING OLD TABLE AS old_rows '
+            'FOR EACH STATEMENT EXECUTE FUNCTION count_registry_rows()', t);
+    END LOOP;
+END;
+$$;
+
+-- is_dev decides which counter a version lands in
+DROP TRIGGER IF EXISTS trg_count_update ON parameter_versions;
+CREATE TRIGGER trg_count_update
+AFTER UPDATE ON parameter_versions
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION count_registry_rows();
+
+-- TRUNCATE skips row triggers; start that table's counters over
+CREATE OR REPLACE FUNCTION reset_registry_counters()
+RETURNS TRIGGER AS $$
+BEGIN
+    DELETE FROM registry_counters
+    WHERE name = ANY (CASE TG_TABLE_NAME
+        WHEN 'parameter_versions' THEN ARRAY['dev_versions', 'stable_versions']
+        WHEN 'parameter_version_dependencies' THEN ARRAY['dependencies']
+        ELSE ARRAY[TG_TABLE_NAME]
+    END);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    t TEXT;
+BEGIN
+    FOREACH t IN ARRAY ARRAY[
+        'owners', 'parameters', 'parameter_versions', 'files', 'parameter_version_dependencies'
+    ] LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_count_truncate ON %I', t);
+        EXECUTE format(
+            'CREATE TRIGGER trg_count_truncate AFTER TRUNCATE ON %I '
+            'FOR EACH STATEMENT EXECUTE FUNCTION reset_registry_counters()', t);
+    END LOOP;
+END;
+$$;
+
+
+-- =========================================================
+-- Reconciliation: compare counters with true counts
+-- =========================================================
+-- True counts and counter sums are read in one statement, so they come
+-- from the same snapshot. Writes that commit later change both by the
+-- same amount, so adding the drift to shard -1 is exact even while the
+-- registry is being written. Runs are serialized with an advisory lock.
+-- Returns every counter; drift <> 0 marks a counter that was off (and,
+-- with p_repair, has been corrected).
+-- =========================================================
+CREATE OR REPLACE FUNCTION reconcile_registry_counters(p_repair BOOLEAN DEFAULT TRUE)
+RETURNS TABLE (
+    name    TEXT,
+    counted BIGINT,
+    actual  BIGINT,
+    drift   BIGINT
+) AS $$
+#variable_conflict use_column
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('reconcile_registry_counters'));
+
+    RETURN QUERY
+    WITH actual (name, n) AS (
+        SELECT 'owners', COUNT(*) FROM owners
+        UNION ALL SELECT 'parameters', COUNT(*) FROM parameters
+        UNION ALL SELECT 'stable_versions', COUNT(*) FROM parameter_versions WHERE is_dev = FALSE
+        UNION ALL SELECT 'dev_versions', COUNT(*) FROM parameter_versions WHERE is_dev = TRUE
+        UNION ALL SELECT 'files', COUNT(*) FROM files
+        UNION ALL SELECT 'dependencies', COUNT(*) FROM parameter_version_dependencies
+    ),
+    counted AS (
+        SELECT c.name, SUM(c.delta)::BIGINT AS n
+        FROM registry_counters c
+        GROUP BY c.name
+    ),
+    compared AS (
+        SELECT a.name, COALESCE(c.n, 0) AS counted, a.n AS actual
+        FROM actual a
+        LEFT JOIN counted c ON c.name = a.name
+    ),
+    repaired AS (
+        INSERT INTO registry_counters AS rc (name, shard, delta)
+        SELECT d.name, -1, d.actual - d.counted
+        FROM compared d
+        WHERE p_repair AND d.actual <> d.counted
+        ON CONFLICT (name, shard)
+        DO UPDATE SET delta = rc.delta + EXCLUDED.delta
+    )
+    SELECT d.name, d.counted, d.actual, d.actual - d.counted
+    FROM compared d
+    ORDER BY d.name;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Seed the counters from whatever is already in the tables
+SELECT * FROM reconcile_registry_counters();
+
+COMMIT;
@@ -0,0 +1,209 @@
+BEGIN;
+
+-- =========================================================
+-- Full-text search over parameters (GET /search)
+-- =========================================================
+-- One row per parameter holds a weighted tsvector over:
+--   A  name, also split at case changes (CANBus -> CAN Bus), indexed
+--      with both the english and the simple configuration so names
+--      stay searchable by stop words such as "can"
+--   B  description
+--   C  newest readme content
+--   D  newest py content
+-- "Newest" is the highest file version of that type, i.e. what :dev
+-- resolves to: edits are searchable as soon as they are pushed, and
+-- publishing only freezes content that is already indexed.
+--
+-- Triggers on parameters and files keep the rows current, so every
+-- writer (API, loader, fork) is covered. Safe to run more than once;
+-- the last statement (re)builds the index for all parameters:
+--
+--   psql -d mydb -f init/06_search.sql
+-- =========================================================
+CREATE TABLE IF NOT EXISTS parameter_search (
+    parameter_id INTEGER PRIMARY KEY REFERENCES parameters(id) ON DELETE CASCADE,
+    readme_hash TEXT REFERENCES blobs(hash),
+    py_hash TEXT REFERENCES blobs(hash),
+    document TSVECTOR NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_parameter_search_document
+    ON parameter_search USING GIN (document);
+
+
+-- Rebuilds the search rows of the given parameters
+CREATE OR REPLACE FUNCTION refresh_parameter_search(p_parameter_ids INTEGER[])
+RETURNS VOID AS $$
+BEGIN
+    -- Lock existing rows first: the upsert below then takes its snapshot
+    -- after any concurrent refresh of the same parameter has committed,
+    -- and cannot overwrite newer content with older.
+    PERFORM 1 FROM parameter_search
+    WHERE parameter_id = ANY (p_parameter_ids)
+    ORDER BY parameter_id
+    FOR UPDATE;
+
+    INSERT INTO parameter_search AS ps (parameter_id, readme_hash, py_hash, document, updated_at)
+    SELECT
+        p.id,
+        readme.content_hash,
+        py.content_hash,
+        setweight(to_tsvector('english', n.words), 'A')
+        || setweight(to_tsvector('simple', n.words), 'A')
+        || setweight(to_tsvector('english', COALESCE(p.description, '')), 'B')
+        -- a tsvector is capped at 1 MB; the first 256 kB of a file is plenty
+        || setweight(to_tsvector('english', left(COALESCE(rb.content, ''), 262144)), 'C')
+        || setweight(to_tsvector('english', left(COALESCE(pb.content, ''), 262144)), 'D'),
+        NOW()
+    FROM parameters p
+    CROSS JOIN LATERAL (
+        SELECT p.name || ' ' || regexp_replace(
+                   regexp_replace(p.name, '([a-z0-9])([A-Z])', '\1 \2', 'g'),
+                   '([A-Z])([A-Z][a-z])', '\1 \2', 'g') AS words
+    ) n
+    LEFT JOIN LATERAL (
+        SELECT f.content_hash
+        FROM files f
+        JOIN file_types ft ON ft.id = f.file_type_id
+        WHERE f.parameter_id = p.id AND ft.name = 'readme'
+        ORDER BY f.version DESC
+        LIMIT 1
+    ) readme ON TRUE
+    LEFT JOIN blobs rb ON rb.hash = readme.content_hash
+    LEFT JOIN LATERAL (
+        SELECT f.content_hash
+        FROM files f
+        JOIN file_types ft ON ft.id = f.file_type_id
+        WHERE f.parameter_id = p.id AND ft.name = 'py'
+        ORDER BY f.version DESC
+        LIMIT 1
+    ) py ON TRUE
+    LEFT JOIN blobs pb ON pb.hash = py.content_hash
+    WHERE p.id = ANY (p_parameter_ids)
+    ON CONFLICT (parameter_id) DO UPDATE SET
+        readme_hash = EXCLUDED.readme_hash,
+        py_hash = EXCLUDED.py_hash,
+        document = EXCLUDED.document,
+        updated_at = EXCLUDED.updated_at;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- New or renamed parameters
+CREATE OR REPLACE FUNCTION index_parameters_for_search()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM refresh_parameter_search(ARRAY(SELECT id FROM new_rows));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- New file versions; only readme and py content is indexed
+CREATE OR REPLACE FUNCTION index_files_for_search()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM refresh_parameter_search(ARRAY(
+        SELECT DISTINCT n.parameter_id
+        FROM new_rows n
+        JOIN file_types ft ON ft.id = n.file_type_id
+        WHERE ft.name IN ('readme', 'py')
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_search_insert ON parameters;
+CREATE TRIGGER trg_search_insert
+AFTER INSERT ON parameters
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION index_parameters_for_search();
+
+DROP TRIGGER IF EXISTS trg_search_update ON parameters;
+CREATE TRIGGER trg_search_update
+AFTER UPDATE ON parameters
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION index_parameters_for_search();
+
+DROP TRIGGER IF EXISTS trg_search_insert ON files;
+CREATE TRIGGER trg_search_insert
+AFTER INSERT ON files
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION index_files_for_search();
+
+-- load_parameters.py upserts file content in place
+DROP TRIGGER IF EXISTS trg_search_update ON files;
+CREATE TRIGGER trg_search_update
+AFTER UPDATE ON files
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION index_files_for_search();
+
+
+-- =========================================================
+-- Search: ranked matches with highlighted snippets
+-- =========================================================
+-- p_query uses web search syntax: words, "quoted phrases", OR, -not.
+-- It is parsed with both configurations, like the names.
+-- Snippets are built only for the returned page, from the description
+-- and readme, falling back to py content.
+-- =========================================================
+CREATE OR REPLACE FUNCTION search_parameters(
+    p_query  TEXT,
+    p_owner  TEXT DEFAULT NULL,
+    p_limit  INTEGER DEFAULT 20,
+    p_offset INTEGER DEFAULT 0
+)
+RETURNS TABLE (
+    owner       TEXT,
+    name        TEXT,
+    description TEXT,
+    rank        REAL,
+    snippet     TEXT
+) AS $$
+#variable_conflict use_column
+DECLARE
+    q TSQUERY := websearch_to_tsquery('english', p_query) || websearch_to_tsquery('simple', p_query);
+BEGIN
+    RETURN QUERY
+    WITH hits AS (
+        SELECT ps.parameter_id, ps.readme_hash, ps.py_hash,
+               ts_rank(ps.document, q) AS rank
+        FROM parameter_search ps
+        WHERE ps.document @@ q
+          AND (p_owner IS NULL OR ps.parameter_id IN (
+                  SELECT p.id FROM parameters p
+                  JOIN owners o ON o.id = p.owner_id
+                  WHERE o.username = p_owner))
+        ORDER BY rank DESC, ps.parameter_id
+        LIMIT p_limit OFFSET p_offset
+    )
+    SELECT
+        o.username,
+        p.name,
+        p.description,
+        h.rank,
+        ts_headline('english',
+            CASE
+                WHEN to_tsvector('english', COALESCE(p.description, '') || ' ' || left(COALESCE(rb.content, ''), 262144)) @@ q
+                    THEN COALESCE(p.description, '') || E'\n' || left(COALESCE(rb.content, ''), 262144)
+                ELSE left(COALESCE(pb.content, ''), 262144)
+            END,
+            q, 'MaxFragments=2, MaxWords=20, MinWords=5, StartSel=<b>, StopSel=</b>')
+    FROM hits h
+    JOIN parameters p ON p.id = h.parameter_id
+    JOIN owners o ON o.id = p.owner_id
+    LEFT JOIN blobs rb ON rb.hash = h.readme_hash
+    LEFT JOIN blobs pb ON pb.hash = h.py_hash
+    ORDER BY h.rank DESC, h.parameter_id;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- Build (or rebuild) the index for every existing parameter
+SELECT refresh_parameter_search(ARRAY(SELECT id FROM parameters));
+
+COMMIT;
@@ -0,0 +1,100 @@
+BEGIN;
+
+-- =========================================================
+-- Fuzzy name lookup (GET /suggest, "did you mean" on 404)
+-- =========================================================
+-- Trigram GiST indexes on lower-cased owner and parameter names. GiST
+-- (unlike GIN) can return rows in distance order, so the nearest names
+-- come straight off the index without scoring every row.
+--
+-- Names are compared with word similarity: the best match of the
+-- typed text against any stretch of a name. A prefix ("neo") or a
+-- fragment ("scara") scores high against a long name
+-- ("NeoPixelArray", "GRBLScara"), as does a name with a typo in it.
+--
+-- pg_trgm ships with the standard PostgreSQL contrib modules (included
+-- in the postgres Docker image). Safe to run more than once:
+--
+--   psql -d mydb -f init/07_suggest.sql
+-- =========================================================
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_parameters_name_trgm
+    ON parameters USING GIST (lower(name) gist_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_owners_username_trgm
+    ON owners USING GIST (lower(username) gist_trgm_ops);
+
+
+-- =========================================================
+-- Parameter suggestions
+-- =========================================================
+-- Takes the p_limit * 5 nearest names from the index, then re-ranks them.
+-- If p_owner is given, the score blends in how close each candidate's owner
+-- is to it, so "evezr/GRBLScra" suggests evezor/GRBLScara first while other
+-- owners' GRBLScara still show up. Matches below p_min_score are dropped.
+-- =========================================================
+CREATE OR REPLACE FUNCTION suggest_parameters(
+    p_name      TEXT,
+    p_owner     TEXT DEFAULT NULL,
+    p_limit     INTEGER DEFAULT 10,
+    p_min_score REAL DEFAULT 0.3
+)
+RETURNS TABLE (
+    owner TEXT,
+    name  TEXT,
+    score REAL
+) AS $$
+#variable_conflict use_column
+BEGIN
+    RETURN QUERY
+    SELECT c.owner, c.name, c.score
+    FROM (
+        SELECT
+            o.username AS owner,
+            k.name,
+            ((1 - k.distance) * CASE
+                WHEN p_owner IS NULL THEN 1
+                ELSE 0.8 + 0.2 * similarity(lower(o.username), lower(p_owner))
+            END)::REAL AS score
+        FROM (
+            SELECT p.owner_id, p.name, lower(p_name) <<-> lower(p.name) AS distance
+            FROM parameters p
+            ORDER BY lower(p_name) <<-> lower(p.name)
+            LIMIT p_limit * 5
+        ) k
+        JOIN owners o ON o.id = k.owner_id
+    ) c
+    WHERE c.score >= p_min_score
+    ORDER BY c.score DESC, c.owner, c.name
+    LIMIT p_limit;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+
+-- Owner suggestions, nearest usernames first
+CREATE OR REPLACE FUNCTION suggest_owners(
+    p_username  TEXT,
+    p_limit     INTEGER DEFAULT 10,
+    p_min_score REAL DEFAULT 0.3
+)
+RETURNS TABLE (
+    username TEXT,
+    score    REAL
+) AS $$
+#variable_conflict use_column
+BEGIN
+    RETURN QUERY
+    SELECT k.username, k.score
+    FROM (
+        SELECT o.username, (1 - (lower(p_username) <<-> lower(o.username)))::REAL AS score
+        FROM owners o
+        ORDER BY lower(p_username) <<-> lower(o.username)
+        LIMIT p_limit
+    ) k
+    WHERE k.score >= p_min_score
+    ORDER BY k.score DESC, k.username;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+COMMIT;
@@ -0,0 +1,29 @@
+BEGIN;
+
+-- =========================================================
+-- Load manifest (incremental POST /load)
+-- =========================================================
+-- One row per file the incremental loader has ingested from a
+-- parameter directory: its content hash and the size and modification
+-- time it had on disk. A directory whose files all still match their
+-- rows is skipped without being read. A file whose content hash moved
+-- on becomes a new dev file version, like a POST .../file-versions.
+--
+-- Safe to run more than once, e.g. to add the table to an existing
+-- database:
+--
+--   psql -d mydb -f init/08_load_manifest.sql
+-- =========================================================
+CREATE TABLE IF NOT EXISTS load_manifest (
+    owner_id INTEGER NOT NULL REFERENCES owners(id) ON DELETE CASCADE,
+    parameter TEXT NOT NULL,        -- directory name under Parameters/
+    path TEXT NOT NULL,             -- file name within the directory
+    content_hash TEXT NOT NULL,     -- sha256 hex of the loaded content
+    size BIGINT NOT NULL,
+    mtime_ns BIGINT NOT NULL,
+    loaded_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+
+    PRIMARY KEY (owner_id, parameter, path)
+);
+
+COMMIT;
@@ -0,0 +1,73 @@
+-- =========================================================
+-- Migration 0001: content-addressed file storage
+-- =========================================================
+-- Moves files.content into the deduplicated blobs table and replaces it
+-- with a files.content_hash pointer. Only needed for databases created
+-- before blobs existed; fresh databases get the new layout from
+-- 01_initdb.sql. Safe to run more than once.
+--
+--   psql -d mydb -f init/migrations/0001_content_addressed_files.sql
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    content TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE OR REPLACE FUNCTION store_blob(p_content TEXT)
+RETURNS TEXT AS $$
+DECLARE
+    h TEXT := encode(sha256(convert_to(p_content, 'UTF8')), 'hex');
+BEGIN
+    INSERT INTO blobs (hash, content, size)
+    VALUES (h, p_content, octet_length(p_content))
+    ON CONFLICT (hash) DO NOTHING;
+
+    RETURN h;
+END;
+$$ LANGUAGE plpgsql;
+
+ALTER TABLE files ADD COLUMN IF NOT EXISTS content_hash TEXT;
+
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = current_schema()
+          AND table_name = 'files'
+          AND column_name = 'content'
+    ) THEN
+        -- One blob per distinct content
+        INSERT INTO blobs (hash, content, size)
+        SELECT DISTINCT ON (h.hash) h.hash, h.content, octet_length(h.content)
+        FROM (
+            SELECT encode(sha256(convert_to(content, 'UTF8')), 'hex') AS hash, content
+            FROM files
+        ) h
+        ON CONFLICT (hash) DO NOTHING;
+
+        UPDATE files
+        SET content_hash = encode(sha256(convert_to(content, 'UTF8')), 'hex')
+        WHERE content_hash IS NULL;
+
+        ALTER TABLE files DROP COLUMN content;
+    END IF;
+
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint WHERE conname = 'files_content_hash_fkey'
+    ) THEN
+        ALTER TABLE files
+            ADD CONSTRAINT files_content_hash_fkey
+            FOREIGN KEY (content_hash) REFERENCES blobs(hash);
+    END IF;
+END $$;
+
+ALTER TABLE files ALTER COLUMN content_hash SET NOT NULL;
+
+COMMIT;
+
+-- Reload the resolver functions so they read content through blobs
+\ir ../02_resolver.sql
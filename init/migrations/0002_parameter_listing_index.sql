@@ -0,0 +1,12 @@
+-- =========================================================
+-- Migration 0002: index for paginated parameter listing
+-- =========================================================
+-- GET /parameters pages through (owner, name) in byte order and filters
+-- by name prefix. Fresh databases get this index from 01_initdb.sql.
+-- Safe to run more than once; CONCURRENTLY keeps the table writable, so
+-- run it outside a transaction:
+--
+--   psql -d mydb -f init/migrations/0002_parameter_listing_index.sql
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_parameters_owner_name_c
+    ON parameters(owner_id, name COLLATE "C");
@@ -0,0 +1,59 @@
+-- =========================================================
+-- Migration 0003: bulk loader support
+-- =========================================================
+-- load_parameters_bulk inserts all dependencies of a tree in one
+-- statement. The per-row check_cyclic_dependency() trigger then walks the
+-- graph once per row, with a plan that scans the whole dependency table,
+-- so large loads became quadratic. The loader now checks its batch in one
+-- pass and sets registry.defer_cycle_check = on to skip the trigger, and
+-- the cycle walk gets an index on parameter_versions(parameter_id) (the
+-- existing ones are partial on is_dev). Fresh databases get both from
+-- 01_initdb.sql and 03_dependencies.sql. Safe to run more than once;
+-- CONCURRENTLY keeps the table writable, so run it outside a transaction:
+--
+--   psql -d mydb -f init/migrations/0003_bulk_load.sql
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_parameter_versions_parameter
+    ON parameter_versions(parameter_id);
+
+CREATE OR REPLACE FUNCTION check_cyclic_dependency()
+RETURNS TRIGGER AS $$
+DECLARE
+    cycle_exists BOOLEAN;
+BEGIN
+    IF current_setting('registry.defer_cycle_check', TRUE) = 'on' THEN
+        RETURN NEW;
+    END IF;
+
+    -- Check if adding this dependency would create a cycle
+    WITH RECURSIVE dep_chain AS (
+        -- Start from the dependency target
+        SELECT
+            NEW.depends_on_parameter_id AS param_id,
+            ARRAY[NEW.parameter_version_id] AS visited
+
+        UNION ALL
+
+        SELECT
+            pvd.depends_on_parameter_id,
+            dc.visited || pv.id
+        FROM dep_chain dc
+        JOIN parameter_versions pv ON pv.parameter_id = dc.param_id
+        JOIN parameter_version_dependencies pvd ON pvd.parameter_version_id = pv.id
+        WHERE NOT (pv.id = ANY(dc.visited))
+          AND array_length(dc.visited, 1) < 50
+    )
+    SELECT EXISTS (
+        SELECT 1
+        FROM dep_chain dc
+        JOIN parameter_versions pv ON pv.parameter_id = dc.param_id
+        WHERE pv.id = NEW.parameter_version_id
+    ) INTO cycle_exists;
+
+    IF cycle_exists THEN
+        RAISE EXCEPTION 'Cyclic dependency detected';
+    END IF;
+
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
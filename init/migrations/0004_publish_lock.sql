@@ -0,0 +1,97 @@
+-- =========================================================
+-- Migration 0004: per-parameter write lock in publish_parameter()
+-- =========================================================
+-- publish_parameter() numbered the new stable version from
+-- MAX(version) + 1 without a lock, so concurrent publishes of one
+-- parameter collided on the unique index. It now takes the parameter's
+-- row lock first, the same lock the API takes before writing file
+-- versions. Fresh databases get it from 04_publish.sql. Safe to run more
+-- than once:
+--
+--   psql -d mydb -f init/migrations/0004_publish_lock.sql
+
+CREATE OR REPLACE FUNCTION publish_parameter(
+    p_parameter_id INTEGER
+)
+RETURNS INTEGER AS $$
+DECLARE
+    dev_pvid    INTEGER;
+    latest_pvid INTEGER;
+    new_version INTEGER;
+    new_pvid    INTEGER;
+BEGIN
+    -- 0. Queue behind other writers of this parameter
+    PERFORM 1 FROM parameters WHERE id = p_parameter_id FOR NO KEY UPDATE;
+
+    -- 1. A dev version must exist
+    SELECT id INTO dev_pvid
+    FROM parameter_versions
+    WHERE parameter_id = p_parameter_id AND is_dev = TRUE;
+
+    IF dev_pvid IS NULL THEN
+        RAISE EXCEPTION 'No dev version exists for parameter %', p_parameter_id;
+    END IF;
+
+    -- 2. Next stable version number
+    SELECT COALESCE(MAX(version), 0) + 1 INTO new_version
+    FROM parameter_versions
+    WHERE parameter_id = p_parameter_id AND is_dev = FALSE;
+
+    -- 3. Current latest stable (NULL if this will be v1)
+    SELECT id INTO latest_pvid
+    FROM parameter_versions
+    WHERE parameter_id = p_parameter_id AND is_dev = FALSE
+    ORDER BY version DESC
+    LIMIT 1;
+
+    -- 4. Create the new stable version row
+    INSERT INTO parameter_versions (parameter_id, version, is_dev)
+    VALUES (p_parameter_id, new_version, FALSE)
+    RETURNING id INTO new_pvid;
+
+    -- 5. Snapshot merged file map: dev wins, latest fills gaps
+    INSERT INTO parameter_version_files (parameter_version_id, file_type_id, file_version)
+    SELECT new_pvid, file_type_id, file_version FROM (
+        SELECT file_type_id, file_version
+        FROM parameter_version_files
+        WHERE parameter_version_id = dev_pvid
+
+        UNION ALL
+
+        SELECT file_type_id, file_version
+        FROM parameter_version_files
+        WHERE parameter_version_id = latest_pvid
+          AND latest_pvid IS NOT NULL
+          AND file_type_id NOT IN (
+              SELECT file_type_id FROM parameter_version_files
+              WHERE parameter_version_id = dev_pvid
+          )
+    ) merged;
+
+    -- 6. Freeze dependencies from dev: resolve any :latest refs
+    --    to the actual version number at this moment in time
+    INSERT INTO parameter_version_dependencies
+        (parameter_version_id, depends_on_parameter_id,
+         depends_on_version, depends_on_is_dev, original_selector)
+    SELECT
+        new_pvid,
+        d.depends_on_parameter_id,
+        CASE
+            WHEN d.depends_on_is_dev THEN NULL
+            ELSE (SELECT MAX(pv.version)
+                  FROM parameter_versions pv
+                  WHERE pv.parameter_id = d.depends_on_parameter_id
+                    AND pv.is_dev = FALSE)
+        END,
+        d.depends_on_is_dev,
+        d.original_selector
+    FROM parameter_version_dependencies d
+    WHERE d.parameter_version_id = dev_pvid;
+
+    -- 7. Clear dev file mappings — dev is now clean until next edit
+    DELETE FROM parameter_version_files
+    WHERE parameter_version_id = dev_pvid;
+
+    RETURN new_version;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,351 @@
+-- =========================================================
+-- Migration 0005: materialized dependency closure
+-- =========================================================
+-- resolve_dependency_tree walked the graph with a recursive CTE on every
+-- /dependencies call, following every path, so diamond-shaped graphs
+-- produced each shared dependency once per path. Stable versions now
+-- keep their transitive closure in parameter_version_closure, built at
+-- publish and load time and dropped by triggers when dependencies change.
+-- resolve_dependency_closure reads it when present and walks the graph
+-- breadth-first otherwise; resolve_dependency_tree reports each version
+-- once, at its shallowest depth. Existing stable versions are backfilled.
+-- Fresh databases get all of this from 03_dependencies.sql and
+-- 04_publish.sql. Safe to run more than once:
+--
+--   psql -d mydb -f init/migrations/0005_dependency_closure.sql
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS parameter_version_closure (
+    ancestor_id INTEGER NOT NULL
+        REFERENCES parameter_versions(id) ON DELETE CASCADE,
+    descendant_id INTEGER NOT NULL
+        REFERENCES parameter_versions(id) ON DELETE CASCADE,
+    depth INTEGER NOT NULL,
+
+    PRIMARY KEY (ancestor_id, descendant_id)
+);
+
+-- The closures containing a version, for invalidation
+CREATE INDEX IF NOT EXISTS idx_pvc_descendant
+    ON parameter_version_closure(descendant_id);
+
+
+-- Builds a stable version's closure from its direct dependencies'
+-- closures, materializing those first. Returns FALSE (and writes
+-- nothing for this version) if the closure reaches a dev version or a
+-- stable version that does not exist. Relies on the dependency graph
+-- being acyclic, so callers that defer the cycle check must run it
+-- first.
+CREATE OR REPLACE FUNCTION materialize_dependency_closure(
+    p_parameter_version_id INTEGER
+)
+RETURNS BOOLEAN AS $$
+DECLARE
+    dep RECORD;
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM parameter_version_closure
+        WHERE ancestor_id = p_parameter_version_id
+          AND descendant_id = p_parameter_version_id
+    ) THEN
+        RETURN TRUE;
+    END IF;
+
+    IF NOT EXISTS (
+        SELECT 1 FROM parameter_versions
+        WHERE id = p_parameter_version_id AND is_dev = FALSE
+    ) THEN
+        RETURN FALSE;
+    END IF;
+
+    FOR dep IN
+        SELECT pvd.depends_on_is_dev, target.id AS target_id
+        FROM parameter_version_dependencies pvd
+        LEFT JOIN parameter_versions target ON
+            target.parameter_id = pvd.depends_on_parameter_id
+            AND target.is_dev = FALSE
+            AND target.version = pvd.depends_on_version
+        WHERE pvd.parameter_version_id = p_parameter_version_id
+    LOOP
+        IF dep.depends_on_is_dev OR dep.target_id IS NULL
+           OR NOT materialize_dependency_closure(dep.target_id) THEN
+            RETURN FALSE;
+        END IF;
+    END LOOP;
+
+    -- A concurrent publish may be materializing the same shared
+    -- dependency; the rows are identical either way
+    INSERT INTO parameter_version_closure (ancestor_id, descendant_id, depth)
+    SELECT p_parameter_version_id, p_parameter_version_id, 0
+
+    UNION ALL
+
+    SELECT p_parameter_version_id, c.descendant_id, MIN(c.depth) + 1
+    FROM parameter_version_dependencies pvd
+    JOIN parameter_versions target ON
+        target.parameter_id = pvd.depends_on_parameter_id
+        AND target.is_dev = FALSE
+        AND target.version = pvd.depends_on_version
+    JOIN parameter_version_closure c ON c.ancestor_id = target.id
+    WHERE pvd.parameter_version_id = p_parameter_version_id
+    GROUP BY c.descendant_id
+    ON CONFLICT DO NOTHING;
+
+    RETURN TRUE;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- Dependencies of an existing stable version can still change (a reload
+-- of Parameters/ relinks v1), so any change drops the closure of every
+-- version that reaches the changed one. They are rebuilt by the next
+-- materialize_dependency_closure() that needs them; until then queries
+-- walk the graph.
+CREATE OR REPLACE FUNCTION invalidate_dependency_closure()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        DELETE FROM parameter_version_closure
+        WHERE ancestor_id IN (
+            SELECT c.ancestor_id FROM parameter_version_closure c
+            WHERE c.descendant_id IN (SELECT parameter_version_id FROM new_rows)
+        );
+    END IF;
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        DELETE FROM parameter_version_closure
+        WHERE ancestor_id IN (
+            SELECT c.ancestor_id FROM parameter_version_closure c
+            WHERE c.descendant_id IN (SELECT parameter_version_id FROM old_rows)
+        );
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_closure_insert ON parameter_version_dependencies;
+CREATE TRIGGER trg_closure_insert
+AFTER INSERT ON parameter_version_dependencies
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION invalidate_dependency_closure();
+
+DROP TRIGGER IF EXISTS trg_closure_update ON parameter_version_dependencies;
+CREATE TRIGGER trg_closure_update
+AFTER UPDATE ON parameter_version_dependencies
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION invalidate_dependency_closure();
+
+DROP TRIGGER IF EXISTS trg_closure_delete ON parameter_version_dependencies;
+CREATE TRIGGER trg_closure_delete
+AFTER DELETE ON parameter_version_dependencies
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION invalidate_dependency_closure();
+
+
+CREATE OR REPLACE FUNCTION resolve_dependency_closure(
+    p_parameter_version_id INTEGER
+)
+RETURNS TABLE (
+    parameter_version_id INTEGER,
+    depth INTEGER
+) AS $$
+#variable_conflict use_column
+DECLARE
+    seen     INTEGER[] := ARRAY[p_parameter_version_id];
+    frontier INTEGER[] := ARRAY[p_parameter_version_id];
+    level    INTEGER := 0;
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM parameter_version_closure c
+        WHERE c.ancestor_id = p_parameter_version_id
+          AND c.descendant_id = p_parameter_version_id
+    ) THEN
+        RETURN QUERY
+        SELECT c.descendant_id, c.depth
+        FROM parameter_version_closure c
+        WHERE c.ancestor_id = p_parameter_version_id
+        ORDER BY c.depth;
+        RETURN;
+    END IF;
+
+    parameter_version_id := p_parameter_version_id;
+    depth := 0;
+    RETURN NEXT;
+
+    LOOP
+        level := level + 1;
+
+        SELECT array_agg(DISTINCT target.id) INTO frontier
+        FROM parameter_version_dependencies pvd
+        JOIN parameter_versions target ON
+            target.parameter_id = pvd.depends_on_parameter_id
+            AND target.is_dev = pvd.depends_on_is_dev
+            AND (pvd.depends_on_is_dev OR target.version = pvd.depends_on_version)
+        WHERE pvd.parameter_version_id = ANY(frontier)
+          AND NOT (target.id = ANY(seen));
+
+        EXIT WHEN frontier IS NULL;
+        seen := seen || frontier;
+
+        RETURN QUERY SELECT unnest(frontier), level;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+
+CREATE OR REPLACE FUNCTION resolve_dependency_tree(
+    p_owner TEXT,
+    p_parameter TEXT,
+    p_selector TEXT
+)
+RETURNS TABLE (
+    depth INTEGER,
+    owner TEXT,
+    parameter TEXT,
+    version INTEGER,
+    is_dev BOOLEAN
+) AS $$
+DECLARE
+    pid INTEGER;
+    pvid INTEGER;
+BEGIN
+    pid := resolve_parameter(p_owner, p_parameter);
+    pvid := resolve_parameter_version(pid, p_selector);
+
+    -- Joined to the closure table directly, the planner looks up each
+    -- row by key; behind a function scan it hashes whole tables
+    IF EXISTS (
+        SELECT 1 FROM parameter_version_closure c
+        WHERE c.ancestor_id = pvid AND c.descendant_id = pvid
+    ) THEN
+        RETURN QUERY
+        SELECT
+            c.depth,
+            o.username,
+            p.name,
+            pv.version,
+            pv.is_dev
+        FROM parameter_version_closure c
+        JOIN parameter_versions pv ON pv.id = c.descendant_id
+        JOIN parameters p ON p.id = pv.parameter_id
+        JOIN owners o ON o.id = p.owner_id
+        WHERE c.ancestor_id = pvid
+        ORDER BY c.depth, o.username, p.name;
+        RETURN;
+    END IF;
+
+    RETURN QUERY
+    SELECT
+        c.depth,
+        o.username,
+        p.name,
+        pv.version,
+        pv.is_dev
+    FROM resolve_dependency_closure(pvid) c
+    JOIN parameter_versions pv ON pv.id = c.parameter_version_id
+    JOIN parameters p ON p.id = pv.parameter_id
+    JOIN owners o ON o.id = p.owner_id
+    ORDER BY c.depth, o.username, p.name;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+
+CREATE OR REPLACE FUNCTION publish_parameter(
+    p_parameter_id INTEGER
+)
+RETURNS INTEGER AS $$
+DECLARE
+    dev_pvid    INTEGER;
+    latest_pvid INTEGER;
+    new_version INTEGER;
+    new_pvid    INTEGER;
+BEGIN
+    -- 0. Queue behind other writers of this parameter
+    PERFORM 1 FROM parameters WHERE id = p_parameter_id FOR NO KEY UPDATE;
+
+    -- 1. A dev version must exist
+    SELECT id INTO dev_pvid
+    FROM parameter_versions
+    WHERE parameter_id = p_parameter_id AND is_dev = TRUE;
+
+    IF dev_pvid IS NULL THEN
+        RAISE EXCEPTION 'No dev version exists for parameter %', p_parameter_id;
+    END IF;
+
+    -- 2. Next stable version number
+    SELECT COALESCE(MAX(version), 0) + 1 INTO new_version
+    FROM parameter_versions
+    WHERE parameter_id = p_parameter_id AND is_dev = FALSE;
+
+    -- 3. Current latest stable (NULL if this will be v1)
+    SELECT id INTO latest_pvid
+    FROM parameter_versions
+    WHERE parameter_id = p_parameter_id AND is_dev = FALSE
+    ORDER BY version DESC
+    LIMIT 1;
+
+    -- 4. Create the new stable version row
+    INSERT INTO parameter_versions (parameter_id, version, is_dev)
+    VALUES (p_parameter_id, new_version, FALSE)
+    RETURNING id INTO new_pvid;
+
+    -- 5. Snapshot merged file map: dev wins, latest fills gaps
+    INSERT INTO parameter_version_files (parameter_version_id, file_type_id, file_version)
+    SELECT new_pvid, file_type_id, file_version FROM (
+        SELECT file_type_id, file_version
+        FROM parameter_version_files
+        WHERE parameter_version_id = dev_pvid
+
+        UNION ALL
+
+        SELECT file_type_id, file_version
+        FROM parameter_version_files
+        WHERE parameter_version_id = latest_pvid
+          AND latest_pvid IS NOT NULL
+          AND file_type_id NOT IN (
+              SELECT file_type_id FROM parameter_version_files
+              WHERE parameter_version_id = dev_pvid
+          )
+    ) merged;
+
+    -- 6. Freeze dependencies from dev: resolve any :latest refs
+    --    to the actual version number at this moment in time
+    INSERT INTO parameter_version_dependencies
+        (parameter_version_id, depends_on_parameter_id,
+         depends_on_version, depends_on_is_dev, original_selector)
+    SELECT
+        new_pvid,
+        d.depends_on_parameter_id,
+        CASE
+            WHEN d.depends_on_is_dev THEN NULL
+            ELSE (SELECT MAX(pv.version)
+                  FROM parameter_versions pv
+                  WHERE pv.parameter_id = d.depends_on_parameter_id
+                    AND pv.is_dev = FALSE)
+        END,
+        d.depends_on_is_dev,
+        d.original_selector
+    FROM parameter_version_dependencies d
+    WHERE d.parameter_version_id = dev_pvid;
+
+    -- 7. Materialize the new version's dependency closure (skipped
+    --    when it reaches a dev version)
+    PERFORM materialize_dependency_closure(new_pvid);
+
+    -- 8. Clear dev file mappings — dev is now clean until next edit
+    DELETE FROM parameter_version_files
+    WHERE parameter_version_id = dev_pvid;
+
+    RETURN new_version;
+END;
+$$ LANGUAGE plpgsql;
+
+
+SELECT COUNT(*) FILTER (WHERE materialize_dependency_closure(id)) AS materialized
+FROM parameter_versions
+WHERE is_dev = FALSE;
+
+COMMIT;
@@ -0,0 +1,14 @@
+-- =========================================================
+-- Migration 0006: owner index for paginated parameter listing
+-- =========================================================
+-- GET /parameters orders pages by owner username in byte order. Without
+-- an index in that order every page past the cursor sorts all remaining
+-- owners; with it the owners are walked in order and the walk stops once
+-- the page is full. Fresh databases get this index from 01_initdb.sql.
+-- Safe to run more than once; CONCURRENTLY keeps the table writable, so
+-- run it outside a transaction:
+--
+--   psql -d mydb -f init/migrations/0006_owner_listing_index.sql
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_owners_username_c
+    ON owners(username COLLATE "C");
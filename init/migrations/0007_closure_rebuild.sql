@@ -0,0 +1,63 @@
+-- =========================================================
+-- Migration 0007: rebuild invalidated dependency closures
+-- =========================================================
+-- The closure triggers from 0005 dropped the closure of every version
+-- reaching a changed dependency but never rebuilt it, so after a reload
+-- of Parameters/ those versions fell back to walking the graph for good.
+-- The trigger now rebuilds what it drops (the bulk loader rebuilds after
+-- its deferred cycle check), and closures dropped before this migration
+-- are backfilled. Fresh databases get this from 03_dependencies.sql.
+-- Safe to run more than once:
+--
+--   psql -d mydb -f init/migrations/0007_closure_rebuild.sql
+
+BEGIN;
+
+-- Dependencies of an existing stable version can still change (a reload
+-- of Parameters/ relinks v1), so any change drops the closure of every
+-- version that reaches the changed one and rebuilds it from the new
+-- graph. While the cycle check is deferred the graph may be mid-merge
+-- (and cyclic), so only the drop happens here; the bulk loader rebuilds
+-- the closures of the loaded versions and of everything that depends on
+-- them once its own cycle check has passed.
+CREATE OR REPLACE FUNCTION invalidate_dependency_closure()
+RETURNS TRIGGER AS $$
+DECLARE
+    stale INTEGER[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(DISTINCT c.ancestor_id) INTO stale
+        FROM parameter_version_closure c
+        WHERE c.descendant_id IN (SELECT parameter_version_id FROM new_rows);
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(DISTINCT c.ancestor_id) INTO stale
+        FROM parameter_version_closure c
+        WHERE c.descendant_id IN (SELECT parameter_version_id FROM old_rows);
+    ELSE
+        SELECT array_agg(DISTINCT c.ancestor_id) INTO stale
+        FROM parameter_version_closure c
+        WHERE c.descendant_id IN (
+            SELECT parameter_version_id FROM new_rows
+            UNION
+            SELECT parameter_version_id FROM old_rows
+        );
+    END IF;
+
+    IF stale IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    DELETE FROM parameter_version_closure WHERE ancestor_id = ANY(stale);
+
+    IF current_setting('registry.defer_cycle_check', TRUE) IS DISTINCT FROM 'on' THEN
+        PERFORM materialize_dependency_closure(a) FROM unnest(stale) AS a;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT COUNT(*) FILTER (WHERE materialize_dependency_closure(id)) AS materialized
+FROM parameter_versions
+WHERE is_dev = FALSE;
+
+COMMIT;